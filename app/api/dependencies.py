@@ -0,0 +1,16 @@
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+from app.services.batch_scheduler import BatchScheduler
+from app.services.face_service import FaceService
+
+def get_face_service(connection: HTTPConnection) -> FaceService:
+    """FaceService dùng chung được tạo trong lifespan của ứng dụng"""
+    face_service = connection.app.state.face_service
+    if not face_service.qdrant_service.ready:
+        raise HTTPException(status_code=503, detail="Qdrant chưa sẵn sàng, vui lòng thử lại sau")
+    return face_service
+
+def get_search_scheduler(connection: HTTPConnection) -> BatchScheduler:
+    """Scheduler gom batch frame real-time, cũng chỉ nhận frame khi Qdrant đã sẵn sàng"""
+    get_face_service(connection)
+    return connection.app.state.search_scheduler
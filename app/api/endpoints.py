@@ -1,58 +1,147 @@
-from fastapi import APIRouter, UploadFile, File, Form
-from app.models.user import User, UserCreate, UserSearch
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.user import User, UserBatchCreate, UserBatchDelete
+from app.models.attendance import AttendanceEvent, AttendanceSummary
+from app.api.dependencies import get_face_service
 from app.services.face_service import FaceService
-from typing import List
+from app.services.enrollment_service import enrollment_jobs
+from app.services.worker_pool import worker_pool
+from app.config import config
+from app.utils.metrics import timed
+from typing import List, Optional
+import hashlib
 import os
-import uuid
+import re
 
 router = APIRouter()
-face_service = FaceService()
 
-# Tạo thư mục tạm để lưu ảnh
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Tên job dùng làm tên file checkpoint nên chỉ cho phép ký tự an toàn
+JOB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def _state_path(job_name: str) -> str:
+    """Đường dẫn file checkpoint của job, luôn nằm trong ENROLL_STATE_DIR"""
+    if not JOB_NAME_PATTERN.fullmatch(job_name):
+        raise HTTPException(status_code=400, detail="job_name chỉ gồm chữ, số, '_' hoặc '-' (tối đa 64 ký tự)")
+    state_dir = os.path.realpath(config.ENROLL_STATE_DIR)
+    state_path = os.path.realpath(os.path.join(state_dir, f"{job_name}.jsonl"))
+    if os.path.dirname(state_path) != state_dir:
+        raise HTTPException(status_code=400, detail="job_name không hợp lệ")
+    return state_path
 
 @router.post("/users/", response_model=User)
 async def create_user(
     name: str = Form(...),
-    image_path: UploadFile = File(...)
+    image_path: UploadFile = File(...),
+    face_service: FaceService = Depends(get_face_service)
 ):
-    # Lưu file tạm
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{image_path.filename}")
-    with open(file_path, "wb") as buffer:
+    # Giải mã ảnh trực tiếp từ bộ nhớ, không ghi ra đĩa
+    with timed("upload_read"):
         content = await image_path.read()
-        buffer.write(content)
-    
-    try:
-        # Tạo user
-        user_data = UserCreate(name=name, image_path=file_path)
-        return await face_service.create_user(user_data)
-    finally:
-        # Xóa file tạm
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    return await face_service.create_user_from_image(name, content)
+
+@router.post("/users/batch", response_model=List[User])
+async def create_users_batch(batch: UserBatchCreate, face_service: FaceService = Depends(get_face_service)):
+    return await face_service.add_users(batch.users)
+
+@router.post("/users/{user_id}/templates")
+async def add_template(
+    user_id: str,
+    image_path: UploadFile = File(...),
+    face_service: FaceService = Depends(get_face_service)
+):
+    # Thêm một ảnh mới làm template cho user đã có, không thay đổi các template cũ
+    content = await image_path.read()
+    return await face_service.add_template(user_id, content)
+
+@router.post("/users/batch-delete")
+async def delete_users_batch(batch: UserBatchDelete, face_service: FaceService = Depends(get_face_service)):
+    return await face_service.delete_users(batch.user_ids)
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: str):
+async def delete_user(user_id: str, face_service: FaceService = Depends(get_face_service)):
     return await face_service.delete_user(user_id)
 
 @router.post("/users/search")
-async def search_user(image_path: UploadFile = File(...)):
-    # Lưu file tạm
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{image_path.filename}")
-    with open(file_path, "wb") as buffer:
+async def search_user(image_path: UploadFile = File(...), face_service: FaceService = Depends(get_face_service)):
+    with timed("upload_read"):
         content = await image_path.read()
-        buffer.write(content)
-    
-    try:
-        # Tìm kiếm user
-        search_data = UserSearch(image_path=file_path)
-        return await face_service.search_user(search_data)
-    finally:
-        # Xóa file tạm
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-@router.get("/users/", response_model=List[User])
-async def list_users():
-    return await face_service.list_users() 
\ No newline at end of file
+    result = await face_service.search_user_image(content)
+    with timed("serialize"):
+        return JSONResponse(result)
+
+@router.get("/users/", response_model=List[User], response_model_exclude_none=True)
+async def list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    with_vectors: bool = False,
+    face_service: FaceService = Depends(get_face_service)
+):
+    # Phân trang theo cursor, cursor trang tiếp theo nằm trong header X-Next-Cursor
+    users, next_cursor = await face_service.list_users(limit, cursor, with_vectors)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users 
+
+@router.post("/users/bulk")
+async def bulk_enroll(
+    archive: UploadFile = File(...),
+    job_name: Optional[str] = Form(None),
+    face_service: FaceService = Depends(get_face_service)
+):
+    """Enroll hàng loạt từ file zip upload (mỗi thư mục con là một người).
+
+    Gửi lại cùng file (hoặc cùng job_name) sẽ chạy tiếp từ checkpoint, bỏ qua người đã enroll.
+    Enroll từ thư mục trên server dùng lệnh `python -m app.cli enroll`.
+    """
+    if job_name is not None:
+        _state_path(job_name)
+    os.makedirs(config.ENROLL_STATE_DIR, exist_ok=True)
+
+    # File zip có thể rất lớn nên được chép ra đĩa thay vì giữ trong bộ nhớ,
+    # mỗi lần ghi chạy trong thread pool để không chặn event loop
+    digest = hashlib.sha256()
+    upload_path = os.path.join(config.ENROLL_STATE_DIR, f"upload_{os.urandom(8).hex()}.zip")
+    with open(upload_path, "wb") as f:
+        while chunk := await archive.read(1024 * 1024):
+            digest.update(chunk)
+            await worker_pool.run_io(f.write, chunk)
+    job_name = job_name or digest.hexdigest()[:16]
+
+    state_path = _state_path(job_name)
+    job_id = enrollment_jobs.start(face_service.qdrant_service, upload_path, state_path, upload_path)
+    return {"job_id": job_id, "job_name": job_name}
+
+@router.get("/users/bulk/{job_id}")
+async def bulk_enroll_status(job_id: str):
+    progress = enrollment_jobs.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return progress
+
+@router.get("/users/export")
+async def export_users(with_vectors: bool = True, face_service: FaceService = Depends(get_face_service)):
+    """Xuất toàn bộ template (mỗi phần tử có user_id) dạng mảng JSON streaming, không giữ cả gallery trong bộ nhớ"""
+    return StreamingResponse(face_service.export_users_json(with_vectors), media_type="application/json")
+
+@router.get("/attendance", response_model=List[AttendanceEvent])
+async def list_attendance(
+    response: Response,
+    user_id: Optional[str] = None,
+    day: Optional[str] = Query(None, description="Ngày theo giờ địa phương, dạng YYYY-MM-DD"),
+    start: Optional[float] = Query(None, description="Timestamp bắt đầu (tính cả)"),
+    end: Optional[float] = Query(None, description="Timestamp kết thúc (không tính)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    face_service: FaceService = Depends(get_face_service)
+):
+    # Sự kiện theo thứ tự thời gian, cursor trang tiếp theo nằm trong header X-Next-Cursor
+    events, next_cursor = await face_service.list_attendance(user_id, day, start, end, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return events
+
+@router.get("/attendance/summary/{day}", response_model=List[AttendanceSummary])
+async def attendance_summary(day: str, face_service: FaceService = Depends(get_face_service)):
+    """Lần vào đầu tiên, lần cuối và số sự kiện của từng người trong ngày"""
+    return await face_service.attendance_summary(day)
@@ -1,72 +1,171 @@
-from fastapi import APIRouter, UploadFile, File, Form
-from app.models.user import User, UserCreate, UserSearch
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
+from app.api.dependencies import get_face_service, get_search_scheduler
+from app.models.user import User
 from app.services.face_service import FaceService
-from typing import List, Dict, Any
-import os
-import uuid
+from app.services.batch_scheduler import BatchScheduler
+from app.services.face_tracker import FaceTracker
+from app.services.motion_gate import SKIPPED, MotionGate
+from app.config import config
+from app.utils.logger import get_logger
+from app.utils.metrics import Gauge, timed
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
 
 router = APIRouter()
-face_service = FaceService()
 
-# Tạo thư mục tạm để lưu ảnh
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+logger = get_logger(__name__)
+
+scheduler_queue_depth = Gauge("face_scheduler_queue_depth", "Số frame real-time đang chờ được gom batch")
+
+def create_search_scheduler(face_service: FaceService) -> BatchScheduler:
+    """Gom các frame real-time từ nhiều kiosk thành batch, mỗi frame là (ảnh, tracker của phiên hoặc None, vùng phát hiện hoặc None)"""
+    async def search_frames(frames: List[tuple]) -> List[Any]:
+        images, trackers, regions = zip(*frames)
+        return await face_service.search_faces_batch(list(images), list(trackers), list(regions))
+
+    scheduler = BatchScheduler(search_frames)
+    scheduler_queue_depth.set_function(lambda: scheduler.queue_depth)
+    return scheduler
+
+def format_faces(faces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chuyển bbox (top, right, bottom, left) thành dạng dùng để vẽ trên web"""
+    return [{
+        "top": face["bbox"][0],
+        "right": face["bbox"][1],
+        "bottom": face["bbox"][2],
+        "left": face["bbox"][3],
+        "name": face["name"],
+        "score": face["score"],
+        "track_id": face.get("track_id"),
+        "rejected": face.get("rejected")
+    } for face in faces]
 
 @router.post("/web/users/", response_model=User)
 async def web_create_user(
     name: str = Form(...),
-    image_path: UploadFile = File(...)
+    image_path: UploadFile = File(...),
+    face_service: FaceService = Depends(get_face_service)
 ):
-    # Lưu file tạm
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{image_path.filename}")
-    with open(file_path, "wb") as buffer:
+    # Giải mã ảnh trực tiếp từ bộ nhớ, không ghi ra đĩa
+    with timed("upload_read"):
         content = await image_path.read()
-        buffer.write(content)
-    
-    try:
-        # Tạo user
-        user_data = UserCreate(name=name, image_path=file_path)
-        return await face_service.create_user(user_data)
-    finally:
-        # Xóa file tạm
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    return await face_service.create_user_from_image(name, content)
 
 @router.post("/web/users/search")
-async def web_search_user(image_path: UploadFile = File(...)):
-    # Lưu file tạm
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{image_path.filename}")
-    with open(file_path, "wb") as buffer:
+async def web_search_user(
+    image_path: UploadFile = File(...),
+    search_scheduler: BatchScheduler = Depends(get_search_scheduler)
+):
+    # Tìm kiếm faces trên ảnh giải mã từ bộ nhớ, gom batch với các frame khác
+    with timed("upload_read"):
         content = await image_path.read()
-        buffer.write(content)
+    faces = await search_scheduler.submit((content, None, None))
     
+    if not faces:
+        return {"message": "Không tìm thấy khuôn mặt"}
+    
+    # Format kết quả
+    with timed("serialize"):
+        return JSONResponse({"faces": format_faces(faces)})
+
+@router.websocket("/web/ws/recognize")
+async def web_recognize_stream(
+    websocket: WebSocket,
+    search_scheduler: BatchScheduler = Depends(get_search_scheduler)
+):
+    """Nhận luồng frame JPEG (binary) và trả về khuôn mặt nhận diện được cho từng frame đã xử lý.
+
+    Message dạng text làm kết nối bị đóng với mã 1003 (kiểu dữ liệu không hỗ trợ).
+
+    Khi server xử lý chậm hơn tốc độ gửi, chỉ frame mới nhất được giữ lại,
+    các frame cũ hơn bị bỏ qua để độ trễ không tăng theo FPS.
+    Frame không thay đổi so với frame đã xử lý trước đó được trả lời ngay bằng kết quả cũ.
+    """
+    await websocket.accept()
+    # Theo dõi khuôn mặt trong phiên để không encode lại người đã nhận diện
+    tracker = FaceTracker()
+    motion_gate = MotionGate() if config.MOTION_GATE_ENABLED else None
+    latest = {"frame": None, "dropped": 0}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = message.get("bytes")
+            if frame is None:
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA, reason="Chỉ nhận frame JPEG dạng binary")
+                return
+            if latest["frame"] is not None:
+                latest["dropped"] += 1
+            latest["frame"] = frame
+            frame_ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
     try:
-        # Tìm kiếm faces
-        faces = await face_service.search_faces(file_path)
-        
-        if not faces:
-            return {"message": "Không tìm thấy khuôn mặt"}
-        
-        # Format kết quả
-        return {
-            "faces": [{
-                "top": face["bbox"][0],
-                "right": face["bbox"][1],
-                "bottom": face["bbox"][2],
-                "left": face["bbox"][3],
-                "name": face["name"],
-                "score": face["score"]
-            } for face in faces]
-        }
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                break
+
+            frame_ready.clear()
+            frame, latest["frame"] = latest["frame"], None
+            try:
+                decision = motion_gate.check(frame) if motion_gate else None
+                if decision is not None and decision.kind == SKIPPED:
+                    faces = motion_gate.faces
+                else:
+                    faces = await search_scheduler.submit((frame, tracker, decision.region if decision else None))
+                    if motion_gate:
+                        motion_gate.update(decision, faces)
+                if receiver.done():
+                    # Kết nối đã đóng trong lúc xử lý frame
+                    break
+                with timed("serialize"):
+                    message = json.dumps({
+                        "faces": format_faces(faces),
+                        "dropped_frames": latest["dropped"]
+                    }, ensure_ascii=False)
+                await websocket.send_text(message)
+            except HTTPException as e:
+                await websocket.send_json({"error": e.detail, "status_code": e.status_code})
+    except WebSocketDisconnect:
+        pass
     finally:
-        # Xóa file tạm
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        receiver.cancel()
+        # Lấy kết quả task nhận frame để lỗi của nó được ghi log thay vì bị bỏ qua
+        await asyncio.wait({receiver})
+        error = None if receiver.cancelled() else receiver.exception()
+        if error is not None and not isinstance(error, WebSocketDisconnect):
+            logger.warning("Lỗi khi nhận frame WebSocket: %s", error)
+
+@router.get("/web/scheduler/stats")
+async def web_scheduler_stats(search_scheduler: BatchScheduler = Depends(get_search_scheduler)):
+    return search_scheduler.stats.snapshot(search_scheduler.queue_depth)
 
-@router.get("/web/users/", response_model=List[User])
-async def web_list_users():
-    return await face_service.list_users()
+@router.get("/web/cache/stats")
+async def web_cache_stats(face_service: FaceService = Depends(get_face_service)):
+    return face_service.encoding_cache.stats()
+
+@router.get("/web/users/", response_model=List[User], response_model_exclude_none=True)
+async def web_list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    with_vectors: bool = False,
+    face_service: FaceService = Depends(get_face_service)
+):
+    # Phân trang theo cursor, cursor trang tiếp theo nằm trong header X-Next-Cursor
+    users, next_cursor = await face_service.list_users(limit, cursor, with_vectors)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 @router.delete("/web/users/{user_id}")
-async def web_delete_user(user_id: str):
+async def web_delete_user(user_id: str, face_service: FaceService = Depends(get_face_service)):
     return await face_service.delete_user(user_id) 
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""Công cụ dòng lệnh cho các tác vụ quản trị.
+
+Ví dụ:
+    python -m app.cli enroll path/to/department --state enrollment_state/department.jsonl
+    QDRANT_QUANTIZATION=int8 python -m app.cli migrate-collection
+    python -m app.cli export-snapshot backups/gallery && python -m app.cli import-snapshot backups/gallery --replace
+    python -m app.cli process-video recordings/gate-2024-03-01.mp4 --sample-fps 2
+"""
+import argparse
+import json
+import os
+import sys
+
+from app.config import config
+
+
+def connect_qdrant():
+    """QdrantService đã kết nối; lệnh CLI dừng ngay thay vì thử lại như API server"""
+    from app.services.qdrant_service import QDRANT_HELP, QdrantService
+
+    qdrant_service = QdrantService()
+    try:
+        qdrant_service.connect()
+    except Exception as e:
+        raise SystemExit(f"Không thể kết nối đến Qdrant server: {e}\n{QDRANT_HELP}\n4. Chạy lại lệnh")
+    return qdrant_service
+
+
+def enroll(args):
+    from app.services.enrollment_service import BulkEnrollment
+
+    state_path = args.state or os.path.join(
+        config.ENROLL_STATE_DIR,
+        f"{os.path.splitext(os.path.basename(os.path.abspath(args.source)))[0]}.jsonl"
+    )
+
+    def on_progress(progress):
+        print(
+            f"\r{progress['processed']} đã xử lý | {progress['enrolled']} đã enroll | "
+            f"{progress['skipped']} bỏ qua | {len(progress['failed'])} lỗi | {progress['elapsed_seconds']}s",
+            end="",
+            flush=True
+        )
+
+    enrollment = BulkEnrollment(connect_qdrant(), state_path, processes=args.processes, chunk_size=args.chunk_size)
+    progress = enrollment.run(args.source, on_progress)
+    print()
+    for key, error in sorted(progress["failed"].items()):
+        print(f"⚠️ {key}: {error}")
+    print(f"Checkpoint: {state_path}")
+    return 1 if progress["failed"] else 0
+
+
+def migrate(args):
+    from app.services.collection_migration import migrate_collection
+
+    def on_progress(copied):
+        print(f"\r{copied} point đã chép", end="", flush=True)
+
+    result = migrate_collection(connect_qdrant(), batch_size=args.batch_size, keep_old=args.keep_old, on_progress=on_progress)
+    print()
+    print(f"Collection: {result['collection']} ({result['copied']} point, {result['elapsed_seconds']}s)")
+    if result["previous_collection"]:
+        print(f"Collection cũ được giữ lại: {result['previous_collection']}")
+    return 0
+
+
+def export_snapshot(args):
+    from app.services.gallery_snapshot import export_snapshot
+
+    def on_progress(count):
+        print(f"\r{count} template đã xuất", end="", flush=True)
+
+    result = export_snapshot(connect_qdrant(), args.path, batch_size=args.batch_size, on_progress=on_progress)
+    print()
+    print(f"Snapshot: {result['path']} ({result['templates']} template, {result['elapsed_seconds']}s)")
+    return 0
+
+
+def import_snapshot(args):
+    from app.services.gallery_snapshot import import_snapshot
+
+    def on_progress(count):
+        print(f"\r{count} template đã nạp", end="", flush=True)
+
+    result = import_snapshot(
+        connect_qdrant(),
+        args.path,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+        replace=args.replace,
+        on_progress=on_progress
+    )
+    print()
+    print(f"Collection: {result['collection']} ({result['templates']} template, {result['elapsed_seconds']}s)")
+    return 0
+
+
+def process_video(args):
+    from app.services.video_worker import VideoRecognizer, read_frames
+
+    output = args.output or os.path.join(
+        config.VIDEO_TIMELINE_DIR,
+        f"{os.path.splitext(os.path.basename(args.source.rstrip('/')))[0] or 'stream'}.jsonl"
+    )
+    output_dir = os.path.dirname(output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def on_progress(progress):
+        print(
+            f"\r{progress['frames']} frame | {progress['video_seconds']:.0f}s video | {progress['faces']} khuôn mặt | "
+            f"{progress['segments']} đoạn | {progress['fps']} frame/s",
+            end="",
+            flush=True
+        )
+
+    recognizer = VideoRecognizer(
+        connect_qdrant(),
+        processes=args.processes,
+        batch_size=args.batch_size,
+        gap_seconds=args.gap
+    )
+    with open(output, "w") as f:
+        def on_segment(segment):
+            f.write(json.dumps(segment, ensure_ascii=False) + "\n")
+            f.flush()
+
+        try:
+            progress = recognizer.run(read_frames(args.source, args.sample_fps), on_segment, on_progress)
+        except (RuntimeError, ValueError) as e:
+            raise SystemExit(str(e))
+    print()
+    print(
+        f"Timeline: {output} ({progress['segments']} đoạn, {progress['matched_faces']}/{progress['faces']} khuôn mặt nhận diện được, "
+        f"{progress['rejected_faces']} bị loại, {progress['failed_frames']} frame lỗi)"
+    )
+    print(f"{progress['frames']} frame trong {progress['elapsed_seconds']}s: {progress['fps']} frame/s")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enroll_parser = commands.add_parser("enroll", help="Enroll hàng loạt từ cây thư mục theo người hoặc file zip")
+    enroll_parser.add_argument("source", help="Thư mục gốc (mỗi thư mục con là một người) hoặc file zip")
+    enroll_parser.add_argument("--state", help="File checkpoint để chạy tiếp khi bị gián đoạn")
+    enroll_parser.add_argument("--processes", type=int, default=config.ENROLL_PROCESSES)
+    enroll_parser.add_argument("--chunk-size", type=int, default=config.ENROLL_CHUNK_SIZE)
+    enroll_parser.set_defaults(handler=enroll)
+
+    migrate_parser = commands.add_parser(
+        "migrate-collection",
+        help="Dựng lại collection với cấu hình lưu trữ hiện tại (quantization, HNSW, on-disk) rồi chuyển alias",
+        description=(
+            "Lần chạy đầu tiên khóa ghi của toàn bộ Qdrant server (lock_storage, mọi collection) trong lúc xóa "
+            "collection cũ. Nếu bị gián đoạn, chạy lại lệnh này để hoàn tất việc tạo alias."
+        )
+    )
+    migrate_parser.add_argument("--batch-size", type=int, default=1000)
+    migrate_parser.add_argument("--keep-old", action="store_true", help="Không xóa collection cũ sau khi chuyển alias")
+    migrate_parser.set_defaults(handler=migrate)
+
+    export_parser = commands.add_parser("export-snapshot", help="Xuất gallery ra thư mục snapshot (embeddings.npy + index.jsonl)")
+    export_parser.add_argument("path", help="Thư mục snapshot")
+    export_parser.add_argument("--batch-size", type=int, default=5000)
+    export_parser.set_defaults(handler=export_snapshot)
+
+    import_parser = commands.add_parser("import-snapshot", help="Nạp snapshot vào collection hiện tại")
+    import_parser.add_argument("path", help="Thư mục snapshot")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.add_argument("--parallel", type=int, default=4, help="Số request upsert chạy song song")
+    import_parser.add_argument("--replace", action="store_true", help="Xóa toàn bộ dữ liệu hiện có trước khi nạp")
+    import_parser.set_defaults(handler=import_snapshot)
+
+    video_parser = commands.add_parser("process-video", help="Nhận diện offline file video hoặc luồng RTSP, ghi timeline theo người")
+    video_parser.add_argument("source", help="Đường dẫn file video hoặc URL rtsp://")
+    video_parser.add_argument("--output", help="File timeline JSON lines (mặc định trong VIDEO_TIMELINE_DIR)")
+    video_parser.add_argument("--sample-fps", type=float, default=config.VIDEO_SAMPLE_FPS, help="Số frame xử lý mỗi giây video, 0 = mọi frame")
+    video_parser.add_argument("--batch-size", type=int, default=config.VIDEO_BATCH_SIZE)
+    video_parser.add_argument("--processes", type=int, default=config.VIDEO_PROCESSES)
+    video_parser.add_argument("--gap", type=float, default=config.VIDEO_SEGMENT_GAP_SECONDS, help="Gộp các lần xuất hiện cách nhau không quá số giây này")
+    video_parser.set_defaults(handler=process_video)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,130 @@ class Config:
     QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
     QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "face_encodings")
+    # Xóa không kiểm tra ID có tồn tại (idempotent, một request duy nhất)
+    QDRANT_FAST_WRITES = os.getenv("QDRANT_FAST_WRITES", "false").lower() == "true"
+    # Giao thức tới Qdrant: "rest" (HTTP/JSON) hoặc "grpc" (protobuf, cổng QDRANT_GRPC_PORT)
+    QDRANT_TRANSPORT = os.getenv("QDRANT_TRANSPORT", "rest")
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+    # Timeout (giây) cho mỗi lời gọi; lỗi tạm thời được thử lại tối đa QDRANT_RETRIES lần, backoff tăng gấp đôi
+    QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", 5.0))
+    QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", 2))
+    QDRANT_RETRY_BACKOFF_MS = float(os.getenv("QDRANT_RETRY_BACKOFF_MS", 100))
+    # Tìm kiếm qua AsyncQdrantClient trên event loop thay vì client đồng bộ trên thread pool
+    QDRANT_ASYNC = os.getenv("QDRANT_ASYNC", "false").lower() == "true"
+    # Chu kỳ (giây) probe kiểm tra kết nối Qdrant, 0 = tắt
+    QDRANT_HEALTH_INTERVAL = float(os.getenv("QDRANT_HEALTH_INTERVAL", 10))
+    # Cấu hình lưu trữ khi tạo collection; collection đã có dùng lệnh migrate-collection để áp dụng
+    # Lượng tử hóa vector: "none" (float32) hoặc "int8" (scalar, giảm 4 lần bộ nhớ)
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")
+    QDRANT_QUANTIZATION_ALWAYS_RAM = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+    # Lưu vector gốc và payload trên đĩa thay vì trong RAM
+    QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false").lower() == "true"
+    # Index payload name để lọc theo tên
+    QDRANT_NAME_INDEX = os.getenv("QDRANT_NAME_INDEX", "true").lower() == "true"
+    # ef khi tìm kiếm (0 = mặc định của server); chấm lại điểm bằng vector gốc khi dùng lượng tử hóa
+    QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", 0))
+    QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+    # Mức log (DEBUG/INFO/WARNING/ERROR) và định dạng ("text" hoặc "json" cho log có cấu trúc)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
     API_PORT = int(os.getenv("API_PORT", 8000))
+    # Giữ bản sao collection trong bộ nhớ để tìm kiếm không cần gọi Qdrant
+    LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "false").lower() == "true"
+    # Chu kỳ nạp lại local index từ Qdrant (0 = không nạp lại). Thay đổi từ uvicorn worker khác,
+    # `cli enroll` hay import-snapshot chỉ được thấy sau tối đa khoảng thời gian này
+    LOCAL_INDEX_REFRESH_SECONDS = float(os.getenv("LOCAL_INDEX_REFRESH_SECONDS", 30))
+    # Mỗi user lưu tối đa số template này (một vector cho mỗi ảnh enroll)
+    MAX_TEMPLATES_PER_USER = int(os.getenv("MAX_TEMPLATES_PER_USER", 10))
+    # Số template gần nhất lấy về cho mỗi truy vấn trước khi gộp điểm theo user
+    SEARCH_TEMPLATE_K = int(os.getenv("SEARCH_TEMPLATE_K", 20))
+    # Cách gộp điểm các template của một user: "max" hoặc "mean" (trung bình k template tốt nhất)
+    SEARCH_AGGREGATION = os.getenv("SEARCH_AGGREGATION", "max")
+    SEARCH_AGGREGATION_K = int(os.getenv("SEARCH_AGGREGATION_K", 3))
+    # Process pool cho detect/encode (0 = chạy trong thread pool của tiến trình chính)
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))
+    # Số job được phép chờ thêm khi tất cả worker đang bận
+    WORKER_QUEUE_DEPTH = int(os.getenv("WORKER_QUEUE_DEPTH", 32))
+    # Khi hàng đợi đầy: "reject" trả về 503, "queue" chờ đến khi có chỗ
+    WORKER_OVERLOAD_POLICY = os.getenv("WORKER_OVERLOAD_POLICY", "reject")
+    # Thread pool cho các lời gọi Qdrant đồng bộ
+    QDRANT_THREADS = int(os.getenv("QDRANT_THREADS", 8))
+    # Gom các frame real-time đến trong cùng cửa sổ thời gian thành một batch
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+    BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 15))
+    BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", 256))
+    # Theo dõi khuôn mặt giữa các frame của một phiên real-time
+    TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", 0.4))
+    # Encode và tìm kiếm lại sau số frame này dù khuôn mặt vẫn được theo dõi
+    TRACK_REFRESH_FRAMES = int(os.getenv("TRACK_REFRESH_FRAMES", 15))
+    # Dưới độ chính xác này danh tính không được dùng lại
+    TRACK_MIN_SCORE = float(os.getenv("TRACK_MIN_SCORE", 0.9))
+    TRACK_MAX_MISSED = int(os.getenv("TRACK_MAX_MISSED", 5))
+    # Bỏ qua frame real-time không thay đổi so với frame đã xử lý trước đó của cùng phiên
+    MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "true").lower() == "true"
+    # Chiều rộng ảnh xám thu nhỏ dùng để so sánh và chênh lệch mức xám để coi là một điểm thay đổi
+    MOTION_GRID = int(os.getenv("MOTION_GRID", 64))
+    MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", 20))
+    # Tỉ lệ điểm thay đổi dưới ngưỡng này: dùng lại kết quả trước
+    MOTION_MIN_CHANGED = float(os.getenv("MOTION_MIN_CHANGED", 0.003))
+    # Vùng thay đổi (đã nới thêm MOTION_ROI_MARGIN mỗi phía) lớn hơn tỉ lệ diện tích này thì phát hiện trên cả frame
+    MOTION_MAX_ROI = float(os.getenv("MOTION_MAX_ROI", 0.5))
+    MOTION_ROI_MARGIN = float(os.getenv("MOTION_ROI_MARGIN", 0.1))
+    # Xử lý đầy đủ ít nhất một lần sau số frame này dù không có thay đổi
+    MOTION_REFRESH_FRAMES = int(os.getenv("MOTION_REFRESH_FRAMES", 50))
+    # Backend phát hiện khuôn mặt: "hog" (nhanh, CPU) hoặc "cnn" (chính xác hơn, nên có GPU)
+    FACE_DETECTOR = os.getenv("FACE_DETECTOR", "hog")
+    # Số frame mỗi lần gọi CNN khi phát hiện theo batch
+    FACE_DETECTOR_BATCH_SIZE = int(os.getenv("FACE_DETECTOR_BATCH_SIZE", 32))
+    # Số lần biến đổi ảnh khi encode (chính xác hơn, chậm hơn tương ứng) và model landmark ("small"/"large")
+    FACE_ENCODER_JITTERS = int(os.getenv("FACE_ENCODER_JITTERS", 1))
+    FACE_LANDMARK_MODEL = os.getenv("FACE_LANDMARK_MODEL", "small")
+    # Kiểm tra chất lượng trước khi encode khi nhận diện: khuôn mặt không đạt không được encode/tìm kiếm
+    FACE_QUALITY_ENABLED = os.getenv("FACE_QUALITY_ENABLED", "true").lower() == "true"
+    # Cạnh ngắn tối thiểu của bbox (pixel trên ảnh đã giải mã), 0 = không kiểm tra
+    FACE_QUALITY_MIN_SIZE = int(os.getenv("FACE_QUALITY_MIN_SIZE", 40))
+    # Phương sai Laplacian tối thiểu của khuôn mặt (thu về 64x64, thang xám 0-255), 0 = không kiểm tra
+    FACE_QUALITY_MIN_SHARPNESS = float(os.getenv("FACE_QUALITY_MIN_SHARPNESS", 15))
+    # Độ lệch tối đa của mũi so với giữa hai mắt, tính theo khoảng cách hai mắt (mặt quay ngang), 0 = không kiểm tra
+    FACE_QUALITY_MAX_YAW = float(os.getenv("FACE_QUALITY_MAX_YAW", 0.5))
+    # Phát hiện trên ảnh thu nhỏ theo tỉ lệ này, encode trên ảnh gốc
+    DETECTION_SCALE = float(os.getenv("DETECTION_SCALE", 1.0))
+    DETECTION_UPSAMPLE = int(os.getenv("DETECTION_UPSAMPLE", 1))
+    # Ảnh có cạnh dài hơn giá trị này được thu nhỏ một lần khi giải mã (0 = không giới hạn)
+    MAX_INPUT_SIZE = int(os.getenv("MAX_INPUT_SIZE", 1920))
+    # Cache kết quả detect/encode theo hash nội dung ảnh (0 = tắt tầng bộ nhớ)
+    ENCODING_CACHE_MB = int(os.getenv("ENCODING_CACHE_MB", 64))
+    # Thư mục cho tầng cache trên đĩa (để trống = không dùng)
+    ENCODING_CACHE_DIR = os.getenv("ENCODING_CACHE_DIR", "")
+    ENCODING_CACHE_DISK_MB = int(os.getenv("ENCODING_CACHE_DISK_MB", 512))
+    # Ghi nhận chấm công từ kết quả nhận diện vào SQLite (tắt mặc định, bật cho triển khai chấm công)
+    ATTENDANCE_ENABLED = os.getenv("ATTENDANCE_ENABLED", "false").lower() == "true"
+    ATTENDANCE_DB = os.getenv("ATTENDANCE_DB", "attendance/attendance.db")
+    # Cùng một người chỉ được ghi một lần trong cửa sổ này (giây)
+    ATTENDANCE_DEDUP_SECONDS = float(os.getenv("ATTENDANCE_DEDUP_SECONDS", 300))
+    # Kết quả có độ chính xác thấp hơn không được tính là chấm công
+    ATTENDANCE_MIN_SCORE = float(os.getenv("ATTENDANCE_MIN_SCORE", 0.9))
+    # Thread ghi nền gom tối đa số sự kiện này hoặc chờ tối đa số ms này rồi ghi một lần
+    ATTENDANCE_FLUSH_SIZE = int(os.getenv("ATTENDANCE_FLUSH_SIZE", 500))
+    ATTENDANCE_FLUSH_MS = float(os.getenv("ATTENDANCE_FLUSH_MS", 1000))
+    ATTENDANCE_QUEUE_SIZE = int(os.getenv("ATTENDANCE_QUEUE_SIZE", 100000))
+    # Xử lý video/RTSP offline: số tiến trình detect/encode, số frame mỗi job, số frame lấy mỗi giây video
+    VIDEO_PROCESSES = int(os.getenv("VIDEO_PROCESSES", os.cpu_count() or 1))
+    VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", 4))
+    VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", 2.0))
+    # Hai lần xuất hiện cùng một người cách nhau không quá số giây này được gộp thành một đoạn
+    VIDEO_SEGMENT_GAP_SECONDS = float(os.getenv("VIDEO_SEGMENT_GAP_SECONDS", 3.0))
+    VIDEO_TIMELINE_DIR = os.getenv("VIDEO_TIMELINE_DIR", "timelines")
+    # Enroll hàng loạt: số tiến trình encode, số user mỗi lần upsert, nơi lưu checkpoint
+    ENROLL_PROCESSES = int(os.getenv("ENROLL_PROCESSES", os.cpu_count() or 1))
+    ENROLL_CHUNK_SIZE = int(os.getenv("ENROLL_CHUNK_SIZE", 64))
+    ENROLL_STATE_DIR = os.getenv("ENROLL_STATE_DIR", "enrollment_state")
+    # Job enroll chạy trong server dùng chung CPU với WorkerPool phục vụ request nên mặc định chỉ một tiến trình
+    ENROLL_API_PROCESSES = int(os.getenv("ENROLL_API_PROCESSES", 1))
+    # Tiến độ job enroll đã kết thúc được giữ để tra cứu trong số giây này rồi bị xóa
+    ENROLL_JOB_TTL_SECONDS = float(os.getenv("ENROLL_JOB_TTL_SECONDS", 3600))
 
 config = Config() 
\ No newline at end of file
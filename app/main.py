@@ -1,14 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.api.endpoints import router as api_router
-from app.api.web_endpoints import router as web_router
+from app.api.web_endpoints import router as web_router, create_search_scheduler
 from app.config import config
+from app.services.face_service import FaceService
+from app.services.worker_pool import worker_pool
+from app.utils.face_utils import warm_up
+from app.utils.logger import get_logger
+from app.utils.metrics import render_metrics
+
+logger = get_logger(__name__)
+
+async def warm_up_workers(app: FastAPI):
+    """Nạp model dlib trên các worker để request đầu tiên không chịu thời gian khởi động"""
+    try:
+        durations = await worker_pool.warm_up(warm_up)
+        logger.info("Đã khởi động %d worker trong %.2f giây", len(durations), max(durations))
+        app.state.warmed_up = True
+    except Exception as e:
+        logger.error("Không thể khởi động model nhận diện: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Một FaceService (một client Qdrant, một local index) dùng chung cho mọi router
+    face_service = FaceService()
+    face_service.qdrant_service.start()
+    if face_service.attendance is not None:
+        # Khôi phục cửa sổ chống trùng từ SQLite ngoài event loop
+        await worker_pool.run_io(face_service.attendance.start)
+    app.state.face_service = face_service
+    app.state.search_scheduler = create_search_scheduler(face_service)
+    app.state.warmed_up = False
+    warm_up_task = asyncio.create_task(warm_up_workers(app))
+    yield
+    warm_up_task.cancel()
+    await app.state.search_scheduler.stop()
+    await face_service.qdrant_service.close()
+    if face_service.attendance is not None:
+        # Ghi nốt các sự kiện chấm công còn trong hàng đợi
+        await worker_pool.run_io(face_service.attendance.stop)
+    worker_pool.shutdown()
 
 app = FastAPI(
     title="Face Recognition API",
     description="API cho hệ thống chấm công bằng nhận diện khuôn mặt",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Mount static files
@@ -21,6 +62,36 @@ templates = Jinja2Templates(directory="app/templates")
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(web_router, prefix="/api/v1")
 
+@app.get("/health")
+async def health(request: Request):
+    # Kết quả của probe định kỳ, không gọi Qdrant trong request
+    qdrant_service = request.app.state.face_service.qdrant_service
+    return {
+        "qdrant": "ok" if qdrant_service.healthy else "unavailable",
+        "last_check": qdrant_service.last_health_check
+    }
+
+@app.get("/health/live")
+async def health_live():
+    # Tiến trình còn phục vụ request, không phụ thuộc Qdrant
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready(request: Request):
+    # Chỉ nhận traffic khi đã kết nối Qdrant và nạp xong model
+    qdrant_service = request.app.state.face_service.qdrant_service
+    checks = {
+        "qdrant": "ok" if qdrant_service.ready and qdrant_service.healthy else "unavailable",
+        "models": "ok" if request.app.state.warmed_up else "loading"
+    }
+    ready = all(value == "ok" for value in checks.values())
+    return JSONResponse({"status": "ok" if ready else "unavailable", **checks}, status_code=200 if ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Định dạng text exposition của Prometheus
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Root route to serve the web interface
 @app.get("/")
 async def root(request: Request):
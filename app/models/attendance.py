@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+class AttendanceEvent(BaseModel):
+    event_id: int
+    user_id: str
+    name: str
+    timestamp: float
+    score: float
+    # "search" (ảnh đơn), "frame" (nhiều khuôn mặt) hoặc "live" (luồng real-time)
+    source: str
+
+class AttendanceSummary(BaseModel):
+    user_id: str
+    name: str
+    first_seen: float
+    last_seen: float
+    events: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class UserBase(BaseModel):
     name: str
@@ -12,7 +12,18 @@ class UserSearch(BaseModel):
 
 class User(UserBase):
     user_id: str
-    face_encoding: List[float]
+    # Chỉ có khi tạo user hoặc khi liệt kê với with_vectors=true
+    face_encoding: Optional[List[float]] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class UserEncoding(UserBase):
+    face_encoding: List[float]
+    user_id: Optional[str] = None
+
+class UserBatchCreate(BaseModel):
+    users: List[UserEncoding]
+
+class UserBatchDelete(BaseModel):
+    user_ids: List[str]
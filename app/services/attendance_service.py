@@ -0,0 +1,253 @@
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import config
+from app.utils.logger import get_logger
+from app.utils.metrics import Counter, Gauge
+
+logger = get_logger(__name__)
+
+attendance_events = Counter(
+    "face_attendance_events_total",
+    "Sự kiện chấm công theo kết quả (recorded, duplicate, dropped, failed)",
+    ["result"]
+)
+attendance_queue_depth = Gauge("face_attendance_queue_depth", "Số sự kiện chấm công đang chờ ghi")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ts REAL NOT NULL,
+    score REAL NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attendance_user_ts ON attendance (user_id, ts);
+CREATE INDEX IF NOT EXISTS attendance_ts ON attendance (ts);
+"""
+
+# Một sự kiện: (user_id, name, timestamp, score, source)
+Event = Tuple[str, str, float, float, str]
+
+def day_range(day: str) -> Tuple[float, float]:
+    """Khoảng timestamp [đầu ngày, đầu ngày hôm sau) theo giờ địa phương của ngày YYYY-MM-DD"""
+    start = datetime.datetime.strptime(day, "%Y-%m-%d")
+    return start.timestamp(), (start + datetime.timedelta(days=1)).timestamp()
+
+class AttendanceStore:
+    """Sự kiện chấm công trong SQLite (WAL), chỉ thêm không sửa.
+
+    Index (user_id, ts) cho truy vấn theo người và (ts) cho truy vấn theo ngày/khoảng thời gian;
+    phân trang bằng cursor (ts, id) nên chi phí mỗi trang không tăng theo số sự kiện.
+    Mỗi thread dùng một kết nối riêng: thread ghi nền và các thread đọc không chặn nhau.
+    """
+
+    def __init__(self, path: str = config.ATTENDANCE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: mất tối đa các batch cuối khi mất điện, không hỏng dữ liệu
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def append_many(self, events: List[Event]):
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO attendance (user_id, name, ts, score, source) VALUES (?, ?, ?, ?, ?)",
+                events
+            )
+
+    def query(
+        self,
+        user_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Sự kiện theo thứ tự thời gian trong [start, end), lọc theo user nếu có; trả về (events, cursor tiếp theo)"""
+        conditions, params = [], []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if start is not None:
+            conditions.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("ts < ?")
+            params.append(end)
+        if cursor:
+            last_ts, last_id = cursor.split(":")
+            conditions.append("(ts, id) > (?, ?)")
+            params.extend([float(last_ts), int(last_id)])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT id, user_id, name, ts, score, source FROM attendance {where} ORDER BY ts, id LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        events = [
+            {"event_id": row[0], "user_id": row[1], "name": row[2], "timestamp": row[3], "score": row[4], "source": row[5]}
+            for row in rows[:limit]
+        ]
+        next_cursor = f"{rows[limit - 1][3]!r}:{rows[limit - 1][0]}" if len(rows) > limit else None
+        return events, next_cursor
+
+    def daily_summary(self, day: str) -> List[dict]:
+        """Mỗi user có mặt trong ngày: lần vào đầu tiên, lần cuối và số sự kiện"""
+        start, end = day_range(day)
+        rows = self._connection().execute(
+            "SELECT user_id, MAX(name), MIN(ts), MAX(ts), COUNT(*) FROM attendance "
+            "WHERE ts >= ? AND ts < ? GROUP BY user_id ORDER BY MIN(ts)",
+            (start, end)
+        ).fetchall()
+        return [
+            {"user_id": row[0], "name": row[1], "first_seen": row[2], "last_seen": row[3], "events": row[4]}
+            for row in rows
+        ]
+
+    def last_seen(self, since: float) -> Dict[str, float]:
+        """Lần chấm công gần nhất của mỗi user kể từ since, dùng để khôi phục cửa sổ chống trùng"""
+        rows = self._connection().execute(
+            "SELECT user_id, MAX(ts) FROM attendance WHERE ts >= ? GROUP BY user_id",
+            (since,)
+        ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+class AttendanceRecorder:
+    """Ghi nhận chấm công từ kết quả nhận diện với cửa sổ chống trùng theo user.
+
+    record() chỉ kiểm tra cửa sổ và đưa sự kiện vào hàng đợi, không chạm SQLite, nên có thể gọi
+    trên event loop; start() (đọc SQLite) phải được gọi một lần ngoài event loop, sự kiện đưa vào
+    trước đó được ghi khi thread nền chạy. Thread nền gom sự kiện và ghi theo batch (flush_size
+    sự kiện hoặc sau flush_interval giây).
+    Khi hàng đợi đầy, sự kiện mới bị bỏ và được đếm trong metric thay vì chặn nhận diện.
+    """
+
+    def __init__(
+        self,
+        store: AttendanceStore = None,
+        dedup_seconds: float = config.ATTENDANCE_DEDUP_SECONDS,
+        min_score: float = config.ATTENDANCE_MIN_SCORE,
+        flush_size: int = config.ATTENDANCE_FLUSH_SIZE,
+        flush_interval: float = config.ATTENDANCE_FLUSH_MS / 1000,
+        queue_size: int = config.ATTENDANCE_QUEUE_SIZE
+    ):
+        self.store = store or AttendanceStore()
+        self.dedup_seconds = dedup_seconds
+        self.min_score = min_score
+        self.flush_size = max(flush_size, 1)
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._last_seen: Dict[str, float] = {}
+        self._last_prune = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        """Khôi phục cửa sổ chống trùng từ store rồi chạy thread ghi nền"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._last_seen.update(self.store.last_seen(time.time() - self.dedup_seconds))
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+            self._thread.start()
+        attendance_queue_depth.set_function(lambda: self.queue_depth)
+
+    def record(self, user_id: str, name: str, score: float, source: str, timestamp: float = None) -> bool:
+        """Đưa một lần nhận diện vào hàng đợi ghi; False nếu điểm thấp, trùng trong cửa sổ hoặc hàng đợi đầy"""
+        if user_id is None or score < self.min_score:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            last = self._last_seen.get(user_id)
+            if last is not None and timestamp - last < self.dedup_seconds:
+                attendance_events.inc(result="duplicate")
+                return False
+            self._last_seen[user_id] = timestamp
+        try:
+            self._queue.put_nowait((user_id, name, timestamp, score, source))
+        except queue.Full:
+            attendance_events.inc(result="dropped")
+            return False
+        return True
+
+    def _prune(self, now: float):
+        # Bỏ các user đã ra khỏi cửa sổ để bảng không tăng theo tổng số người từng chấm công
+        if now - self._last_prune < self.dedup_seconds:
+            return
+        with self._lock:
+            self._last_seen = {
+                user_id: seen for user_id, seen in self._last_seen.items()
+                if now - seen < self.dedup_seconds
+            }
+        self._last_prune = now
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.store.append_many(batch)
+                attendance_events.inc(len(batch), result="recorded")
+            except Exception as e:
+                attendance_events.inc(len(batch), result="failed")
+                logger.error("Không ghi được %d sự kiện chấm công: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            self._prune(time.time())
+
+    def flush(self):
+        """Chờ đến khi mọi sự kiện đã đưa vào hàng đợi được ghi xong"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Ghi nốt hàng đợi rồi dừng thread nền"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.store.close()
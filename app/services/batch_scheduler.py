@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List
+from fastapi import HTTPException
+from app.config import config
+
+# Biên trên của các bucket histogram kích thước batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+class BatchStats:
+    """Thống kê hàng đợi và kích thước batch để tinh chỉnh BATCH_MAX_SIZE/BATCH_MAX_WAIT_MS"""
+
+    def __init__(self):
+        self.batches = 0
+        self.frames = 0
+        self.max_queue_depth = 0
+        self.total_wait_ms = 0.0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_overflow = 0
+
+    def record_batch(self, size: int, wait_ms: float):
+        self.batches += 1
+        self.frames += size
+        self.total_wait_ms += wait_ms
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                break
+        else:
+            self.batch_size_overflow += 1
+
+    def record_queue_depth(self, depth: int):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        return {
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "mean_wait_ms": self.total_wait_ms / self.frames if self.frames else 0.0,
+            "batch_size_histogram": {
+                **{f"le_{bucket}": count for bucket, count in self.batch_size_histogram.items()},
+                "overflow": self.batch_size_overflow
+            }
+        }
+
+class BatchScheduler:
+    """Gom các request đến trong cửa sổ max_wait_ms thành batch và trả kết quả về đúng request.
+
+    process_batch nhận danh sách item và trả về danh sách kết quả cùng thứ tự;
+    phần tử là Exception sẽ được raise cho riêng request tương ứng.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = config.BATCH_MAX_SIZE,
+        max_wait_ms: float = config.BATCH_MAX_WAIT_MS,
+        queue_size: int = config.BATCH_QUEUE_SIZE
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000
+        self.queue_size = queue_size
+        self.stats = BatchStats()
+        self._queue: asyncio.Queue = None
+        self._collector: asyncio.Task = None
+        self._running = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self):
+        # Khởi tạo trong event loop đang chạy, không phải lúc import module
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._collector = asyncio.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_started()
+        if self._queue.full():
+            raise HTTPException(status_code=503, detail="Server đang quá tải, vui lòng thử lại sau")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        self.stats.record_queue_depth(self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            now = time.perf_counter()
+            self.stats.record_batch(len(batch), sum((now - queued_at) * 1000 for _, _, queued_at in batch))
+            # Không chờ batch xong để batch tiếp theo có thể chạy song song trên worker khác
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list):
+        # Bỏ qua các request đã bị hủy (client ngắt kết nối) trước khi xử lý
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+        for task in list(self._running):
+            task.cancel()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import time
+from typing import Callable, Optional
+import numpy as np
+from qdrant_client.http import models
+from app.services.qdrant_service import collection_params
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def _fingerprint(point) -> bytes:
+    """Dấu vân tay nội dung point; vector được làm tròn để bản đã chuẩn hóa lại (cosine) ở target vẫn khớp"""
+    # + 0.0 đưa -0.0 về 0.0 sau khi làm tròn
+    vector = np.round(np.asarray(point.vector, dtype=np.float32), 5) + 0.0
+    payload = json.dumps(point.payload, sort_keys=True).encode()
+    return hashlib.blake2b(payload + vector.tobytes(), digest_size=16).digest()
+
+def _scan_changes(client, source: str, batch_size: int, synced: dict, on_changed: Callable[[list], None]) -> list:
+    """Duyệt source theo từng trang scroll, gọi on_changed với các (point, dấu vân tay) mới hoặc đã đổi so với synced.
+
+    Trả về ID có trong synced nhưng không còn trong source (đã bị xóa trong lúc migrate).
+    """
+    seen = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        changed = []
+        for point in points:
+            seen.add(point.id)
+            fingerprint = _fingerprint(point)
+            if synced.get(point.id) != fingerprint:
+                changed.append((point, fingerprint))
+        if changed:
+            on_changed(changed)
+        if offset is None:
+            return [point_id for point_id in synced if point_id not in seen]
+
+def _upsert(client, target: str, points: list):
+    client.upsert(
+        collection_name=target,
+        points=[models.PointStruct(id=point.id, vector=point.vector, payload=point.payload) for point in points],
+        wait=True
+    )
+
+def _delete(client, target: str, point_ids: list):
+    client.delete(collection_name=target, points_selector=models.PointIdsList(points=point_ids), wait=True)
+
+def _sync_points(client, source: str, target: str, batch_size: int, synced: dict, on_progress: Callable[[int], None] = None) -> int:
+    """Đưa target về đúng nội dung source khi target chưa nhận ghi từ ứng dụng.
+
+    Point mới hoặc đã đổi được chép (cả vector và payload), point không còn trong source bị xóa;
+    synced ghi lại dấu vân tay của những gì target đang có. Trả về số point đã thay đổi ở target.
+    """
+    changes = 0
+
+    def apply(changed: list):
+        nonlocal changes
+        _upsert(client, target, [point for point, _ in changed])
+        synced.update((point.id, fingerprint) for point, fingerprint in changed)
+        changes += len(changed)
+        if on_progress:
+            on_progress(changes)
+
+    removed = _scan_changes(client, source, batch_size, synced, apply)
+    if removed:
+        _delete(client, target, removed)
+        for point_id in removed:
+            del synced[point_id]
+    return changes + len(removed)
+
+def _replay_changes(client, target: str, changed: list, removed: list, synced: dict) -> int:
+    """Áp dụng lên target (đã nhận ghi qua alias) các thay đổi cuối cùng của source.
+
+    Point mà ứng dụng đã ghi đè hoặc xóa trên target sau khi chuyển alias được giữ nguyên vì đó là dữ liệu mới hơn.
+    """
+    point_ids = [point.id for point, _ in changed] + removed
+    if not point_ids:
+        return 0
+    current = {
+        point.id: _fingerprint(point)
+        for point in client.retrieve(target, ids=point_ids, with_payload=True, with_vectors=True)
+    }
+    upserts = [point for point, _ in changed if current.get(point.id) == synced.get(point.id)]
+    deletes = [point_id for point_id in removed if current.get(point_id) == synced.get(point_id)]
+    if upserts:
+        _upsert(client, target, upserts)
+    if deletes:
+        _delete(client, target, deletes)
+    return len(upserts) + len(deletes)
+
+def _lock_reason(source: str) -> str:
+    return f"Đang migrate collection '{source}'"
+
+def _lock_writes(client, source: str) -> bool:
+    """Khóa ghi của Qdrant server trong lúc đọc thay đổi cuối và xóa collection cũ; Qdrant cục bộ không hỗ trợ khóa.
+
+    Khóa áp dụng cho toàn bộ server: mọi collection trên server đều không nhận ghi cho tới khi mở khóa.
+    """
+    try:
+        client.lock_storage(reason=_lock_reason(source))
+        return True
+    except Exception as e:
+        logger.warning("Không khóa được ghi (%s): point ghi vào '%s' ngay trước khi xóa có thể bị mất", e, source)
+        return False
+
+def _release_stale_lock(client, source: str):
+    """Mở khóa do lần migrate bị gián đoạn để lại; khóa của người khác được giữ nguyên"""
+    try:
+        locks = client.get_locks()
+    except Exception:
+        return
+    if locks.write and locks.error_message == _lock_reason(source):
+        logger.warning("Mở khóa ghi do lần migrate trước để lại")
+        client.unlock_storage()
+
+def _pending_alias(alias: str) -> str:
+    """Alias đánh dấu collection đích của lần migrate đầu tiên, tạo trước khi xóa collection cũ"""
+    return f"{alias}_migrating"
+
+def migrate_collection(
+    qdrant_service,
+    batch_size: int = 1000,
+    keep_old: bool = False,
+    on_progress: Callable[[int], None] = None,
+    sync_passes: int = 3
+) -> dict:
+    """Dựng lại collection với cấu hình lưu trữ hiện tại mà ứng dụng vẫn đọc/ghi trong lúc chạy.
+
+    Tên QDRANT_COLLECTION trở thành alias trỏ tới collection vật lý `<tên>_<timestamp>`.
+    Dữ liệu được chép sang collection mới, rồi đồng bộ lại tối đa sync_passes lượt (thêm, sửa
+    và xóa) cho tới khi không còn thay đổi. Sau khi alias được chuyển trong một thao tác nguyên tử,
+    các thay đổi cuối cùng của collection cũ được áp dụng nếu ứng dụng chưa ghi đè chúng qua alias.
+    Lần migrate đầu tiên (tên vẫn là collection thật) phải xóa collection cũ trước khi tạo alias
+    cùng tên. Trong lúc đọc thay đổi cuối và xóa, ghi bị khóa bằng lock_storage; khóa này áp dụng
+    cho toàn bộ Qdrant server chứ không riêng collection này, nên các ứng dụng khác dùng chung
+    server cũng không ghi được trong khoảng đó.
+
+    Trước khi xóa, collection đích được đánh dấu bằng alias `<tên>_migrating`. Nếu tiến trình dừng
+    giữa lệnh xóa và lệnh tạo alias, chạy lại sẽ tiếp tục với collection đích này: point mà ứng dụng
+    đã ghi vào collection rỗng tự tạo lại dưới cùng tên được chép sang, rồi alias mới được tạo.
+    """
+    client = qdrant_service.client
+    alias = qdrant_service.collection_name
+    pending = _pending_alias(alias)
+    aliases = {item.alias_name: item.collection_name for item in client.get_aliases().aliases}
+    resumed = pending in aliases and alias not in aliases
+    start = time.perf_counter()
+
+    if resumed:
+        target = aliases[pending]
+        collections = {collection.name for collection in client.get_collections().collections}
+        # Collection cùng tên lúc này là bản gốc (dừng trước khi xóa) hoặc bản rỗng ứng dụng tạo lại
+        source: Optional[str] = alias if alias in collections else None
+        logger.warning("Tiếp tục lần migrate bị gián đoạn sang '%s'", target)
+        _release_stale_lock(client, alias)
+    else:
+        source = aliases.get(alias, alias)
+        target = f"{alias}_{int(time.time() * 1000)}"
+        logger.info("Đang tạo collection '%s' với cấu hình mới", target)
+        client.create_collection(collection_name=target, **collection_params())
+        qdrant_service.ensure_payload_indexes(target)
+
+    synced = {}
+    copied = 0
+    if source is not None:
+        # Khi tiếp tục, synced bắt đầu rỗng nên point đã có ở đích không bị xóa, chỉ được ghi đè
+        copied = _sync_points(client, source, target, batch_size, synced, on_progress)
+        for _ in range(sync_passes):
+            changes = _sync_points(client, source, target, batch_size, synced)
+            copied += changes
+            if not changes:
+                break
+
+    changed, removed = [], []
+    if alias in aliases:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))
+        ])
+        # Collection cũ không còn nhận ghi qua alias nên lần duyệt này thấy mọi thay đổi còn lại
+        removed = _scan_changes(client, source, batch_size, synced, changed.extend)
+        if not keep_old:
+            client.delete_collection(source)
+    else:
+        if source is not None:
+            if not resumed:
+                client.update_collection_aliases(change_aliases_operations=[
+                    models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=pending))
+                ])
+            # Không thể giữ collection cũ vì alias phải dùng đúng tên của nó
+            locked = _lock_writes(client, source)
+            try:
+                removed = _scan_changes(client, source, batch_size, synced, changed.extend)
+                client.delete_collection(source)
+            finally:
+                if locked:
+                    client.unlock_storage()
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=pending)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))
+        ])
+        source = None
+    caught_up = _replay_changes(client, target, changed, removed, synced)
+
+    logger.info("Alias '%s' đã trỏ tới '%s'", alias, target)
+    return {
+        "alias": alias,
+        "collection": target,
+        "previous_collection": source if keep_old else None,
+        "copied": copied + caught_up,
+        "elapsed_seconds": round(time.perf_counter() - start, 2)
+    }
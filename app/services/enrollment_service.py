@@ -0,0 +1,216 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+from app.config import config
+from app.utils.face_utils import detect_and_encode_faces_batch, first_face_encodings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Một người cần enroll: (khóa duy nhất trong nguồn, tên, nội dung các ảnh)
+Person = Tuple[str, str, List[bytes]]
+
+def iter_people(source: str) -> Iterator[Person]:
+    """Duyệt cây thư mục hoặc file zip; mỗi thư mục chứa ảnh là một người, tên là tên thư mục"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            groups = defaultdict(list)
+            for entry in archive.namelist():
+                if entry.lower().endswith(IMAGE_EXTENSIONS) and not entry.startswith("__MACOSX/"):
+                    groups[os.path.dirname(entry)].append(entry)
+            for key in sorted(groups):
+                if not key:
+                    continue
+                yield key, os.path.basename(key), [archive.read(entry) for entry in sorted(groups[key])]
+        return
+
+    if not os.path.isdir(source):
+        raise ValueError(f"Không tìm thấy thư mục hoặc file zip: {source}")
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        image_files = sorted(f for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        key = os.path.relpath(root, source)
+        if not image_files or key == ".":
+            continue
+        images = []
+        for filename in image_files:
+            with open(os.path.join(root, filename), "rb") as f:
+                images.append(f.read())
+        yield key.replace(os.sep, "/"), os.path.basename(root), images
+
+def encode_person(key: str, name: str, images: List[bytes]) -> Tuple[str, str, Optional[List[list[float]]], Optional[str]]:
+    """Chạy trong worker process: các template (một encoding mỗi ảnh) của một người hoặc thông báo lỗi"""
+    try:
+        encodings = first_face_encodings(detect_and_encode_faces_batch(images[:config.MAX_TEMPLATES_PER_USER]))
+        return key, name, encodings, None
+    except HTTPException as e:
+        return key, name, None, e.detail
+    except Exception as e:
+        return key, name, None, str(e)
+
+def person_user_id(collection_name: str, key: str) -> str:
+    """ID cố định theo nguồn để chạy lại sau khi gián đoạn không tạo user trùng"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{collection_name}/{key}"))
+
+class BulkEnrollment:
+    """Enroll hàng loạt: encode song song trên nhiều process, upsert theo chunk, ghi checkpoint để chạy tiếp.
+
+    Checkpoint là file JSON lines, mỗi dòng là một người đã được upsert thành công;
+    khi chạy lại với cùng file, những người này được bỏ qua.
+    """
+
+    def __init__(
+        self,
+        qdrant_service,
+        state_path: str,
+        processes: int = config.ENROLL_PROCESSES,
+        chunk_size: int = config.ENROLL_CHUNK_SIZE
+    ):
+        self.qdrant_service = qdrant_service
+        self.state_path = state_path
+        self.processes = max(processes, 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.progress = {
+            "status": "pending",
+            "processed": 0,
+            "enrolled": 0,
+            "skipped": 0,
+            "failed": {},
+            "elapsed_seconds": 0.0
+        }
+
+    def _load_done(self) -> set:
+        if not os.path.exists(self.state_path):
+            return set()
+        with open(self.state_path) as f:
+            return {json.loads(line)["key"] for line in f if line.strip()}
+
+    def _flush(self, chunk: List[dict], state_file):
+        if not chunk:
+            return
+        self.qdrant_service.add_users(chunk)
+        for user in chunk:
+            state_file.write(json.dumps({"key": user["key"], "user_id": user["user_id"], "name": user["name"]}, ensure_ascii=False) + "\n")
+        state_file.flush()
+        self.progress["enrolled"] += len(chunk)
+        chunk.clear()
+
+    def run(self, source: str, on_progress: Callable[[dict], None] = None) -> dict:
+        start = time.perf_counter()
+        done = self._load_done()
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self.progress["status"] = "running"
+
+        def report():
+            self.progress["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+            if on_progress:
+                on_progress(self.progress)
+
+        chunk = []
+        try:
+            with open(self.state_path, "a") as state_file, ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                pending = set()
+                people = iter_people(source)
+
+                def collect(futures):
+                    for future in futures:
+                        key, name, encodings, error = future.result()
+                        self.progress["processed"] += 1
+                        if error:
+                            self.progress["failed"][key] = error
+                        else:
+                            chunk.append({
+                                "key": key,
+                                "user_id": person_user_id(self.qdrant_service.collection_name, key),
+                                "name": name,
+                                "face_encodings": encodings
+                            })
+                            if len(chunk) >= self.chunk_size:
+                                self._flush(chunk, state_file)
+                        report()
+
+                for key, name, images in people:
+                    if key in done:
+                        self.progress["skipped"] += 1
+                        continue
+                    # Giới hạn số người đang xử lý để bộ nhớ không tăng theo kích thước nguồn
+                    if len(pending) >= self.processes * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(finished)
+                    pending.add(executor.submit(encode_person, key, name, images))
+
+                finished, _ = wait(pending)
+                collect(finished)
+                self._flush(chunk, state_file)
+            self.progress["status"] = "completed"
+        except Exception as e:
+            self.progress["status"] = "failed"
+            self.progress["error"] = str(e)
+            raise
+        finally:
+            report()
+        return self.progress
+
+class EnrollmentJobs:
+    """Chạy các job enroll hàng loạt trong thread nền và lưu tiến độ để API tra cứu.
+
+    Mỗi job dùng ENROLL_API_PROCESSES tiến trình encode thay vì ENROLL_PROCESSES của CLI
+    để không tranh CPU với WorkerPool của server. Job đã kết thúc quá ttl giây bị xóa khỏi bộ nhớ.
+    """
+
+    def __init__(self, ttl: float = config.ENROLL_JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs: Dict[str, dict] = {}
+        # job_id -> thời điểm kết thúc, chỉ job đã kết thúc mới bị xóa
+        self._finished: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.monotonic()
+        with self._lock:
+            for job_id in [job_id for job_id, finished in self._finished.items() if now - finished >= self.ttl]:
+                del self._finished[job_id]
+                self._jobs.pop(job_id, None)
+
+    def start(self, qdrant_service, source: str, state_path: str, cleanup_path: str = None) -> str:
+        self._prune()
+        job_id = str(uuid.uuid4())
+        enrollment = BulkEnrollment(qdrant_service, state_path, processes=config.ENROLL_API_PROCESSES)
+        with self._lock:
+            self._jobs[job_id] = enrollment.progress
+
+        def run():
+            try:
+                enrollment.run(source)
+            except Exception as e:
+                logger.error("Lỗi khi enroll hàng loạt (job %s): %s", job_id, e)
+            finally:
+                if cleanup_path and os.path.exists(cleanup_path):
+                    os.remove(cleanup_path)
+                with self._lock:
+                    self._finished[job_id] = time.monotonic()
+
+        threading.Thread(target=run, name=f"enroll-{job_id}", daemon=True).start()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        self._prune()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+enrollment_jobs = EnrollmentJobs()
@@ -1,85 +1,409 @@
-from app.utils.face_utils import get_average_face_encoding, detect_faces
+from app.utils.face_utils import (
+    detect_and_encode_faces_batch, detection_params, average_first_faces, first_face_encodings,
+    read_image_files, ImageSource
+)
+from app.utils.encoding_cache import encoding_cache
+from app.utils.face_backends import detector_batches
+from app.utils.face_quality import default_quality_gate
+from app.utils.metrics import faces_per_frame, face_matches, faces_encoded, quality_rejections, timed
 from app.services.qdrant_service import QdrantService
-from app.models.user import User, UserCreate, UserSearch
+from app.services.worker_pool import worker_pool
+from app.services.face_tracker import FaceTracker
+from app.services.attendance_service import AttendanceRecorder, day_range
+from app.config import config
+from app.models.user import User, UserCreate, UserSearch, UserEncoding
+from app.models.attendance import AttendanceEvent, AttendanceSummary
 from fastapi import HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+import asyncio
+import json
 
 class FaceService:
     def __init__(self):
         self.qdrant_service = QdrantService()
+        # Detect/encode và Qdrant chạy ngoài event loop
+        self.worker_pool = worker_pool
+        self.encoding_cache = encoding_cache
+        # Ghi nhận chấm công từ mọi kết quả nhận diện, ghi xuống đĩa trên thread nền
+        self.attendance = AttendanceRecorder() if config.ATTENDANCE_ENABLED else None
+
+    async def _detect_and_encode(
+        self,
+        images: List[ImageSource],
+        tracked_boxes: List[Optional[list]] = None,
+        quality: bool = False,
+        regions: List[Optional[tuple]] = None,
+        partial: bool = False
+    ) -> List[Any]:
+        """Detect/encode nhiều ảnh song song trên các worker, ảnh đã gặp được lấy từ cache.
+
+        Mỗi ảnh là một job để các worker cùng xử lý một batch; riêng detector CNN nhận cả batch
+        trong một job vì phát hiện nhiều frame một lần nhanh hơn. Job bị từ chối (pool đầy) hoặc
+        lỗi được raise sau khi các job khác xong; với partial=True lỗi đó chỉ thay cho kết quả
+        của các ảnh trong job, các ảnh đã được nhận vẫn có kết quả.
+
+        Mỗi phần tử là (face_locations, encodings, tracked, rejected) hoặc None nếu ảnh lỗi.
+        Frame có bbox đang theo dõi không dùng cache vì chỉ một phần khuôn mặt được encode;
+        frame có khuôn mặt bị loại (quality=True) cũng không được cache vì cache không lưu lý do loại.
+        regions[i] (từ motion gate) giới hạn vùng phát hiện của frame i; frame này cũng không dùng cache.
+        """
+        if tracked_boxes is None:
+            tracked_boxes = [None] * len(images)
+        if regions is None:
+            regions = [None] * len(images)
+        params = detection_params()
+        if quality:
+            params = f"{params};{default_quality_gate().params()}"
+        keys = [
+            self.encoding_cache.make_key(bytes(image), params)
+            if self.encoding_cache.enabled and isinstance(image, (bytes, bytearray)) and not boxes and region is None
+            else None
+            for image, boxes, region in zip(images, tracked_boxes, regions)
+        ]
+
+        cached = [self.encoding_cache.get_memory(key) if key else None for key in keys]
+        disk_lookups = [i for i, key in enumerate(keys) if key and cached[i] is None]
+        if disk_lookups:
+            values = await self._cache_io(lambda: [self.encoding_cache.get_disk(keys[i]) for i in disk_lookups])
+            for i, value in zip(disk_lookups, values):
+                cached[i] = value
+        results = [
+            (value[0], value[1], [None] * len(value[0]), [None] * len(value[0])) if value else None
+            for value in cached
+        ]
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            jobs = [misses] if detector_batches(config.FACE_DETECTOR) else [[i] for i in misses]
+            job_results = await asyncio.gather(*(
+                self.worker_pool.run_cpu(
+                    detect_and_encode_faces_batch,
+                    [images[i] for i in job],
+                    [tracked_boxes[i] for i in job],
+                    config.TRACK_IOU_THRESHOLD,
+                    quality,
+                    [regions[i] for i in job]
+                )
+                for job in jobs
+            ), return_exceptions=True)
+            errors = [job_result for job_result in job_results if isinstance(job_result, Exception)]
+            if errors and not partial:
+                raise errors[0]
+            detections = [
+                detection
+                for job, job_result in zip(jobs, job_results)
+                for detection in (job_result if not isinstance(job_result, Exception) else [job_result] * len(job))
+            ]
+            disk_writes = []
+            for i, detection in zip(misses, detections):
+                results[i] = detection
+                if detection is None or isinstance(detection, Exception):
+                    continue
+                faces_encoded.inc(sum(1 for encoding in detection[1] if encoding is not None))
+                for reason in detection[3]:
+                    if reason is not None:
+                        quality_rejections.inc(reason=reason)
+                if keys[i] and not any(detection[3]):
+                    self.encoding_cache.put_memory(keys[i], (detection[0], detection[1]))
+                    disk_writes.append((keys[i], (detection[0], detection[1])))
+            if disk_writes:
+                await self._cache_io(lambda: [self.encoding_cache.put_disk(key, value) for key, value in disk_writes])
+        return results
+
+    async def _cache_io(self, fn):
+        """Tầng đĩa của cache đọc/ghi file nên chạy trên thread I/O, không chặn event loop"""
+        if self.encoding_cache.disk_dir:
+            return await self.worker_pool.run_io(fn)
+        return fn()
+
+    async def _read_images(self, image: ImageSource) -> List[ImageSource]:
+        return await self.worker_pool.run_io(read_image_files, image) if isinstance(image, str) else [image]
+
+    async def _encode_user_images(self, image: ImageSource) -> list[float]:
+        """Encoding trung bình từ một ảnh hoặc tất cả ảnh trong thư mục (dùng làm truy vấn)"""
+        return average_first_faces(await self._detect_and_encode(await self._read_images(image)))
+
+    async def _encode_user_templates(self, image: ImageSource) -> List[list[float]]:
+        """Mỗi ảnh (trong thư mục) cho một template, tối đa MAX_TEMPLATES_PER_USER"""
+        images = (await self._read_images(image))[:config.MAX_TEMPLATES_PER_USER]
+        return first_face_encodings(await self._detect_and_encode(images))
 
     async def create_user(self, user_data: UserCreate) -> User:
+        # Enroll từ đường dẫn file hoặc thư mục ảnh
+        return await self.create_user_from_image(user_data.name, user_data.image_path)
+
+    async def create_user_from_image(self, name: str, image: ImageSource) -> User:
         try:
-            face_encoding = get_average_face_encoding(user_data.image_path)
-            user_id = self.qdrant_service.add_user(user_data.name, face_encoding)
+            face_encodings = await self._encode_user_templates(image)
+            user_id = await self.worker_pool.run_io(self.qdrant_service.add_user, name, face_encodings)
             return User(
                 user_id=user_id,
-                name=user_data.name,
-                face_encoding=face_encoding
+                name=name,
+                face_encoding=face_encodings[0]
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def add_template(self, user_id: str, image: ImageSource) -> dict:
+        """Thêm template từ ảnh mới cho user đã enroll (kính, ánh sáng, tuổi tác khác)"""
+        try:
+            face_encodings = await self._encode_user_templates(image)
+            result = await self.worker_pool.run_io(self.qdrant_service.add_templates, user_id, face_encodings)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail="Không tìm thấy user")
+        return result
+
     async def delete_user(self, user_id: str) -> dict:
-        success = self.qdrant_service.delete_user(user_id)
+        success = await self.worker_pool.run_io(self.qdrant_service.delete_user, user_id)
         if not success:
             raise HTTPException(status_code=404, detail="Không tìm thấy user")
         return {"message": "User đã được xóa thành công"}
 
+    async def add_users(self, users: List[UserEncoding]) -> List[User]:
+        """Thêm nhiều user đã có encoding (công cụ quản trị) trong một request tới Qdrant"""
+        try:
+            user_ids = await self.worker_pool.run_io(
+                self.qdrant_service.add_users,
+                [user.model_dump() for user in users]
+            )
+            return [
+                User(user_id=user_id, name=user.name, face_encoding=user.face_encoding)
+                for user_id, user in zip(user_ids, users)
+            ]
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def delete_users(self, user_ids: List[str]) -> dict:
+        try:
+            deleted = await self.worker_pool.run_io(self.qdrant_service.delete_users, user_ids)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {
+            "deleted": deleted,
+            "not_found": [user_id for user_id in user_ids if user_id not in set(deleted)]
+        }
+
+    def _use_async_search(self) -> bool:
+        # Local index tìm kiếm trong tiến trình nên vẫn chạy trên thread pool
+        return self.qdrant_service.async_client is not None and self.qdrant_service.local_index is None
+
+    async def _search_user(self, face_encoding: list[float]) -> Optional[dict]:
+        if self._use_async_search():
+            return await self.qdrant_service.search_user_async(face_encoding)
+        return await self.worker_pool.run_io(self.qdrant_service.search_user, face_encoding)
+
+    async def _search_users(self, face_encodings: List[list[float]]) -> List[Optional[dict]]:
+        if self._use_async_search():
+            return await self.qdrant_service.search_users_batch_async(face_encodings)
+        return await self.worker_pool.run_io(self.qdrant_service.search_users_batch, face_encodings)
+
     async def search_user(self, user_search: UserSearch) -> dict:
+        return await self.search_user_image(user_search.image_path)
+
+    async def search_user_image(self, image: ImageSource) -> dict:
         try:
-            face_encoding = get_average_face_encoding(user_search.image_path)
-            result = self.qdrant_service.search_user(face_encoding)
+            face_encoding = await self._encode_user_images(image)
+            with timed("vector_search"):
+                result = await self._search_user(face_encoding)
+            face_matches.inc(result="match" if result else "unknown")
             
+            if result:
+                self._record_attendance(result["user_id"], result["name"], result["score"], "search")
             if not result:
                 return {"message": "Không tìm thấy user phù hợp"}
             
             return result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def search_faces(self, image_path: str) -> List[Dict[str, Any]]:
+    async def search_faces(self, image: ImageSource) -> List[Dict[str, Any]]:
         try:
-            # Phát hiện khuôn mặt trong ảnh
-            face_locations = detect_faces(image_path)
+            # Giải mã ảnh, phát hiện và encode tất cả khuôn mặt trong một lần
+            detection = (await self._detect_and_encode([image], quality=config.FACE_QUALITY_ENABLED))[0]
+            if detection is None:
+                raise HTTPException(status_code=400, detail="Lỗi khi phát hiện khuôn mặt")
+            face_locations, face_encodings, _, rejected = detection
             if not face_locations:
-                return []
-
-            faces = []
-            for face_location in face_locations:
-                # Lấy encoding của khuôn mặt
-                face_encoding = get_average_face_encoding(image_path, face_location)
-                
-                # Tìm kiếm user phù hợp
-                result = self.qdrant_service.search_user(face_encoding)
-                
-                if result:
-                    faces.append({
-                        "bbox": face_location,
-                        "name": result["name"],
-                        "score": result["score"]
-                    })
-                else:
-                    faces.append({
-                        "bbox": face_location,
-                        "name": "Unknown",
-                        "score": 0.0
-                    })
-            
-            return faces
+                return self._record_faces([], "frame")
+
+            # Tìm kiếm user phù hợp cho tất cả khuôn mặt đạt chất lượng trong một request
+            with timed("vector_search"):
+                matches = iter(await self._search_users([encoding for encoding in face_encodings if encoding is not None]))
+            results = [next(matches) if encoding is not None else None for encoding in face_encodings]
+
+            return self._record_faces(self._format_faces(face_locations, results, rejected), "frame")
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def list_users(self) -> list[User]:
+    async def search_faces_batch(
+        self,
+        images: List[ImageSource],
+        trackers: List[Optional[FaceTracker]] = None,
+        regions: List[Optional[tuple]] = None
+    ) -> List[Any]:
+        """Nhận diện nhiều frame: detect/encode song song từng frame và một lần tìm kiếm vector cho cả batch.
+
+        Frame có tracker chỉ encode các khuôn mặt chưa được theo dõi với danh tính tin cậy;
+        khuôn mặt mới không đạt chất lượng được trả về kèm lý do, không encode và không tạo track.
+        regions[i] (roi, carried) chỉ phát hiện lại trong roi, các bbox carried được giữ nguyên.
+        Trả về danh sách khuôn mặt cho từng frame, hoặc exception (HTTPException) cho frame lỗi/bị từ chối.
+        """
+        if trackers is None:
+            trackers = [None] * len(images)
+        reusable = [tracker.reusable_tracks() if tracker else [] for tracker in trackers]
+        detections = await self._detect_and_encode(
+            images,
+            [[track.bbox for track in tracks] for tracks in reusable],
+            config.FACE_QUALITY_ENABLED,
+            regions,
+            partial=True
+        )
+        all_encodings = [
+            face_encoding
+            for detection in detections if detection and not isinstance(detection, Exception)
+            for face_encoding in detection[1] if face_encoding is not None
+        ]
+        with timed("vector_search"):
+            matches = iter(await self._search_users(all_encodings))
+
+        results = []
+        for detection, tracker, tracks in zip(detections, trackers, reusable):
+            if detection is None:
+                results.append(HTTPException(status_code=400, detail="Lỗi khi phát hiện khuôn mặt"))
+                continue
+            if isinstance(detection, Exception):
+                # Frame bị từ chối khi pool đầy (503) không làm hỏng các frame khác trong batch
+                results.append(detection)
+                continue
+            face_locations, face_encodings, tracked, rejected = detection
+            frame_matches = [next(matches) if face_encoding is not None else None for face_encoding in face_encodings]
+            if tracker is None:
+                faces = self._format_faces(face_locations, frame_matches, rejected)
+            else:
+                accepted = [i for i, reason in enumerate(rejected) if reason is None]
+                reused_tracks = [tracks[tracked[i]] if tracked[i] is not None else None for i in accepted]
+                tracked_faces = iter(tracker.update(
+                    [face_locations[i] for i in accepted],
+                    reused_tracks,
+                    [frame_matches[i] for i in accepted]
+                ))
+                rejected_faces = iter(self._format_faces(
+                    [face_locations[i] for i, reason in enumerate(rejected) if reason is not None],
+                    [None] * (len(rejected) - len(accepted)),
+                    [reason for reason in rejected if reason is not None]
+                ))
+                faces = [next(tracked_faces) if reason is None else next(rejected_faces) for reason in rejected]
+            results.append(self._record_faces(faces, "frame" if tracker is None else "live"))
+        return results
+
+    def _record_attendance(self, user_id: Optional[str], name: str, score: float, source: str):
+        if self.attendance is not None:
+            self.attendance.record(user_id, name, score, source)
+
+    def _record_faces(self, faces: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+        """Cập nhật metric số khuôn mặt mỗi frame, số khuôn mặt nhận diện được/không và ghi chấm công"""
+        faces_per_frame.observe(len(faces))
+        for face in faces:
+            if face.get("rejected"):
+                face_matches.inc(result="rejected")
+                continue
+            face_matches.inc(result="unknown" if face["name"] == "Unknown" else "match")
+            self._record_attendance(face.get("user_id"), face["name"], face["score"], source)
+        return faces
+
+    @staticmethod
+    def _format_faces(face_locations: list, results: list, rejected: list = None) -> List[Dict[str, Any]]:
+        faces = []
+        for i, (face_location, result) in enumerate(zip(face_locations, results)):
+            if rejected and rejected[i]:
+                # Không encode/tìm kiếm: trả về lý do để client có thể yêu cầu ảnh tốt hơn
+                faces.append({
+                    "bbox": face_location,
+                    "user_id": None,
+                    "name": "Unknown",
+                    "score": 0.0,
+                    "rejected": rejected[i]
+                })
+            elif result:
+                faces.append({
+                    "bbox": face_location,
+                    "user_id": result["user_id"],
+                    "name": result["name"],
+                    "score": result["score"]
+                })
+            else:
+                faces.append({
+                    "bbox": face_location,
+                    "user_id": None,
+                    "name": "Unknown",
+                    "score": 0.0
+                })
+        return faces
+
+    async def list_users(self, limit: int = 100, cursor: Optional[str] = None, with_vectors: bool = False) -> tuple[List[User], Optional[str]]:
         try:
-            users_data = self.qdrant_service.list_users()
+            users_data, next_cursor = await self.worker_pool.run_io(
+                self.qdrant_service.list_users, limit, cursor, with_vectors
+            )
             return [
                 User(
                     user_id=user["user_id"],
                     name=user["name"],
-                    face_encoding=user["face_encoding"]
+                    face_encoding=user.get("face_encoding")
                 )
                 for user in users_data
-            ]
+            ], next_cursor
+        except HTTPException:
+            raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def _attendance_store(self):
+        if self.attendance is None:
+            raise HTTPException(status_code=404, detail="Chức năng chấm công chưa được bật")
+        return self.attendance.store
+
+    async def list_attendance(
+        self,
+        user_id: Optional[str] = None,
+        day: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> tuple[List[AttendanceEvent], Optional[str]]:
+        """Sự kiện chấm công theo user và/hoặc theo ngày (YYYY-MM-DD) hay khoảng timestamp [start, end)"""
+        store = self._attendance_store()
+        try:
+            if day is not None:
+                day_start, day_end = day_range(day)
+                start, end = max(start or day_start, day_start), min(end or day_end, day_end)
+            events, next_cursor = await self.worker_pool.run_io(store.query, user_id, start, end, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Tham số không hợp lệ: {e}")
+        return [AttendanceEvent(**event) for event in events], next_cursor
+
+    async def attendance_summary(self, day: str) -> List[AttendanceSummary]:
+        store = self._attendance_store()
+        try:
+            rows = await self.worker_pool.run_io(store.daily_summary, day)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Ngày không hợp lệ: {e}")
+        return [AttendanceSummary(**row) for row in rows]
+
+    def export_users_json(self, with_vectors: bool = True) -> Iterator[str]:
+        """Sinh mảng JSON của toàn bộ template (kèm user_id) theo từng phần để trả về dạng streaming"""
+        yield "["
+        for i, template in enumerate(self.qdrant_service.iter_templates(with_vectors=with_vectors)):
+            yield ("," if i else "") + json.dumps(template, ensure_ascii=False)
+        yield "]"
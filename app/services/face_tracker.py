@@ -0,0 +1,103 @@
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import config
+from app.utils.box_utils import match_boxes
+
+class Track:
+    """Một khuôn mặt được theo dõi qua các frame cùng danh tính đã nhận diện gần nhất"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, bbox: Tuple[int, int, int, int]):
+        self.track_id = next(self._ids)
+        self.bbox = bbox
+        self.user_id = None
+        self.name = "Unknown"
+        self.score = 0.0
+        self.frames_since_encode = 0
+        self.missed = 0
+
+class FaceTracker:
+    """Theo dõi khuôn mặt trong một phiên real-time để không encode lại người đã nhận diện.
+
+    Một khuôn mặt chỉ được encode và tìm kiếm lại khi là track mới, khi đã dùng
+    lại danh tính quá refresh_frames frame, hoặc khi độ chính xác thấp hơn min_score.
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = config.TRACK_IOU_THRESHOLD,
+        refresh_frames: int = config.TRACK_REFRESH_FRAMES,
+        min_score: float = config.TRACK_MIN_SCORE,
+        max_missed: int = config.TRACK_MAX_MISSED
+    ):
+        self.iou_threshold = iou_threshold
+        self.refresh_frames = refresh_frames
+        self.min_score = min_score
+        self.max_missed = max_missed
+        self.tracks: List[Track] = []
+        self.encoded_faces = 0
+        self.reused_faces = 0
+
+    def reusable_tracks(self) -> List[Track]:
+        """Các track có danh tính đủ mới và đủ tin cậy để dùng lại ở frame tiếp theo"""
+        return [
+            track for track in self.tracks
+            if track.user_id is not None
+            and track.frames_since_encode < self.refresh_frames
+            and track.score >= self.min_score
+        ]
+
+    def update(
+        self,
+        face_locations: List[Tuple[int, int, int, int]],
+        reused_tracks: List[Optional[Track]],
+        results: List[Optional[dict]]
+    ) -> List[Dict[str, Any]]:
+        """Cập nhật track theo kết quả của frame mới.
+
+        reused_tracks[i] là track được dùng lại cho khuôn mặt i (không encode),
+        ngược lại results[i] là kết quả tìm kiếm mới (None nếu không khớp user nào).
+        """
+        claimed = {id(track) for track in reused_tracks if track is not None}
+        free_tracks = [track for track in self.tracks if id(track) not in claimed]
+        new_indices = [i for i, track in enumerate(reused_tracks) if track is None]
+        matches = match_boxes(
+            [face_locations[i] for i in new_indices],
+            [track.bbox for track in free_tracks],
+            self.iou_threshold
+        )
+
+        assigned = list(reused_tracks)
+        for i, match in zip(new_indices, matches):
+            assigned[i] = free_tracks[match] if match is not None else Track(face_locations[i])
+
+        faces = []
+        for i, (face_location, track) in enumerate(zip(face_locations, assigned)):
+            track.bbox = face_location
+            track.missed = 0
+            if reused_tracks[i] is not None:
+                track.frames_since_encode += 1
+                self.reused_faces += 1
+            else:
+                result = results[i]
+                track.user_id = result["user_id"] if result else None
+                track.name = result["name"] if result else "Unknown"
+                track.score = result["score"] if result else 0.0
+                track.frames_since_encode = 0
+                self.encoded_faces += 1
+            faces.append({
+                "bbox": face_location,
+                "user_id": track.user_id,
+                "name": track.name,
+                "score": track.score,
+                "track_id": track.track_id
+            })
+
+        active = {id(track) for track in assigned}
+        for track in self.tracks:
+            if id(track) not in active:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if id(track) in active or track.missed <= self.max_missed]
+        self.tracks.extend(track for track in assigned if track not in self.tracks)
+        return faces
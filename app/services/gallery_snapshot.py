@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+import numpy as np
+from qdrant_client.http import models
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.jsonl"
+
+# Mỗi dòng của index tương ứng một hàng của embeddings: [template_id, user_id, name, primary]
+IndexRow = Tuple[str, str, str, bool]
+
+def export_snapshot(
+    qdrant_service,
+    path: str,
+    batch_size: int = 5000,
+    on_progress: Callable[[int], None] = None
+) -> dict:
+    """Ghi toàn bộ template ra thư mục snapshot: embeddings.npy (float32, mmap được) và index.jsonl.
+
+    Vector được ghi nối tiếp ra file tạm theo từng trang scroll nên bộ nhớ chỉ giữ một trang;
+    header .npy được ghi khi đã biết số hàng.
+    """
+    os.makedirs(path, exist_ok=True)
+    start = time.perf_counter()
+    raw_path = os.path.join(path, EMBEDDINGS_FILE + ".part")
+    count = 0
+    dim = None
+    offset = None
+    with open(raw_path, "wb") as raw, open(os.path.join(path, INDEX_FILE), "w", encoding="utf-8") as index:
+        while True:
+            points, offset = qdrant_service.client.scroll(
+                collection_name=qdrant_service.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["user_id", "name", "primary"],
+                with_vectors=True
+            )
+            if points:
+                vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+                dim = vectors.shape[1]
+                raw.write(vectors.tobytes())
+                for point in points:
+                    payload = point.payload or {}
+                    row = [
+                        str(point.id),
+                        qdrant_service._point_user_id(point),
+                        payload.get("name", "Unknown"),
+                        payload.get("primary", True)
+                    ]
+                    index.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += len(points)
+                if on_progress:
+                    on_progress(count)
+            if offset is None:
+                break
+
+    dim = dim or 128
+    with open(os.path.join(path, EMBEDDINGS_FILE), "wb") as f, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(f, {"descr": "<f4", "fortran_order": False, "shape": (count, dim)})
+        shutil.copyfileobj(raw, f, 16 * 1024 * 1024)
+    os.remove(raw_path)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "collection": qdrant_service.collection_name,
+        "templates": count,
+        "dim": dim,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Đã xuất %d templates ra '%s'", count, path)
+    return {**manifest, "path": path, "elapsed_seconds": round(time.perf_counter() - start, 2)}
+
+def read_snapshot(path: str) -> Tuple[dict, List[IndexRow], np.ndarray]:
+    """Đọc snapshot: (manifest, các dòng index, embeddings dạng memmap chỉ đọc)"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Phiên bản snapshot không được hỗ trợ: {manifest.get('version')}")
+    with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as f:
+        rows = [tuple(json.loads(line)) for line in f if line.strip()]
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    if len(rows) != len(embeddings):
+        raise ValueError(f"Snapshot hỏng: {len(rows)} dòng index nhưng {len(embeddings)} vector")
+    return manifest, rows, embeddings
+
+def _add_rows(local_index, rows: List[IndexRow], embeddings: np.ndarray, batch_size: int = 50000):
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        local_index.add_many(
+            [row[0] for row in batch],
+            [row[2] for row in batch],
+            embeddings[start:start + batch_size],
+            [row[1] for row in batch]
+        )
+
+def load_snapshot_index(local_index, path: str) -> int:
+    """Nạp snapshot vào một LocalFaceIndex mà không cần gọi Qdrant, trả về số template"""
+    _, rows, embeddings = read_snapshot(path)
+    local_index.clear()
+    _add_rows(local_index, rows, embeddings)
+    return len(rows)
+
+def import_snapshot(
+    qdrant_service,
+    path: str,
+    batch_size: int = 5000,
+    parallel: int = 4,
+    replace: bool = False,
+    on_progress: Callable[[int], None] = None
+) -> dict:
+    """Upsert toàn bộ snapshot vào collection hiện tại theo các batch lớn, nhiều request song song.
+
+    replace xóa mọi point hiện có trước khi nạp; mặc định snapshot được gộp vào dữ liệu đang có
+    (template trùng ID bị ghi đè). Local index được cập nhật thẳng từ file thay vì scroll lại Qdrant.
+    """
+    manifest, rows, embeddings = read_snapshot(path)
+    start = time.perf_counter()
+    client = qdrant_service.client
+    if replace:
+        logger.info("Đang xóa dữ liệu hiện có của collection '%s'", qdrant_service.collection_name)
+        client.delete(
+            collection_name=qdrant_service.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter()),
+            wait=True
+        )
+
+    def upsert(batch_start: int) -> int:
+        batch = rows[batch_start:batch_start + batch_size]
+        client.upsert(
+            collection_name=qdrant_service.collection_name,
+            points=models.Batch(
+                ids=[qdrant_service._parse_cursor(row[0]) for row in batch],
+                vectors=np.asarray(embeddings[batch_start:batch_start + batch_size]).tolist(),
+                payloads=[{"user_id": row[1], "name": row[2], "primary": row[3]} for row in batch]
+            ),
+            wait=True
+        )
+        return len(batch)
+
+    imported = 0
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as executor:
+        for count in executor.map(upsert, range(0, len(rows), batch_size)):
+            imported += count
+            if on_progress:
+                on_progress(imported)
+
+    if qdrant_service.local_index is not None:
+        # Sau upsert collection gồm dữ liệu cũ (nếu không replace) cộng snapshot, index cập nhật giống vậy
+        if replace:
+            qdrant_service.local_index.clear()
+        _add_rows(qdrant_service.local_index, rows, embeddings)
+    logger.info("Đã nạp %d templates từ '%s'", imported, path)
+    return {
+        "collection": qdrant_service.collection_name,
+        "source_collection": manifest["collection"],
+        "templates": imported,
+        "elapsed_seconds": round(time.perf_counter() - start, 2)
+    }
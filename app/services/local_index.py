@@ -0,0 +1,180 @@
+import threading
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+
+def aggregate_by_user(hits: Iterable[Tuple[str, str, float]], method: str = "max", k: int = 3) -> List[dict]:
+    """Gộp các template gần nhất (đã sắp giảm dần theo score) thành một điểm cho mỗi user.
+
+    "max" lấy template tốt nhất, "mean" lấy trung bình k template tốt nhất của user.
+    """
+    groups = {}
+    for user_id, name, score in hits:
+        group = groups.setdefault(user_id, {"user_id": user_id, "name": name, "scores": []})
+        group["scores"].append(float(score))
+    users = []
+    for group in groups.values():
+        scores = group.pop("scores")
+        group["score"] = float(np.mean(scores[:k])) if method == "mean" else scores[0]
+        users.append(group)
+    users.sort(key=lambda user: user["score"], reverse=True)
+    return users
+
+class LocalFaceIndex:
+    """Bản sao trong bộ nhớ của collection khuôn mặt, tìm kiếm cosine bằng phép nhân ma trận.
+
+    Mỗi hàng là một template; một user có thể có nhiều template và kết quả tìm kiếm
+    được gộp theo user giống như khi tìm trên Qdrant. Qdrant vẫn là nơi lưu trữ chính;
+    index này chỉ được nạp lại từ Qdrant và cập nhật theo các thao tác của QdrantService.
+    """
+
+    def __init__(
+        self,
+        dim: int = 128,
+        initial_capacity: int = 1024,
+        template_k: int = 20,
+        aggregation: str = "max",
+        aggregation_k: int = 3
+    ):
+        self.dim = dim
+        self.template_k = template_k
+        self.aggregation = aggregation
+        self.aggregation_k = aggregation_k
+        self._lock = threading.RLock()
+        # Ma trận float32 liên tục, mỗi hàng là một encoding đã chuẩn hóa
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._user_ids: List[str] = []
+        self._names: List[str] = []
+        self._rows: dict[str, int] = {}
+        self._templates: dict[str, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return str(user_id) in self._templates
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, size: int):
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:len(self._ids)] = self._vectors[:len(self._ids)]
+        self._vectors = vectors
+
+    def clear(self):
+        with self._lock:
+            self._ids = []
+            self._user_ids = []
+            self._names = []
+            self._rows = {}
+            self._templates = {}
+
+    def user_count(self) -> int:
+        return len(self._templates)
+
+    def template_count(self, user_id: str) -> int:
+        return len(self._templates.get(str(user_id), ()))
+
+    def add_many(self, template_ids: List[str], names: List[str], encodings, user_ids: List[str] = None) -> None:
+        """Thêm hoặc cập nhật nhiều template; không có user_ids thì mỗi template là một user"""
+        if not template_ids:
+            return
+        if user_ids is None:
+            user_ids = template_ids
+        vectors = self._normalize(np.asarray(encodings, dtype=np.float32).reshape(len(template_ids), self.dim))
+        with self._lock:
+            self._reserve(len(self._ids) + len(template_ids))
+            for template_id, user_id, name, vector in zip(template_ids, user_ids, names, vectors):
+                template_id, user_id = str(template_id), str(user_id)
+                row = self._rows.get(template_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(template_id)
+                    self._user_ids.append(user_id)
+                    self._names.append(name)
+                    self._rows[template_id] = row
+                else:
+                    self._discard_template(self._user_ids[row], template_id)
+                    self._user_ids[row] = user_id
+                    self._names[row] = name
+                self._templates.setdefault(user_id, set()).add(template_id)
+                self._vectors[row] = vector
+
+    def add(self, template_id: str, name: str, encoding, user_id: str = None) -> None:
+        self.add_many([template_id], [name], [encoding], None if user_id is None else [user_id])
+
+    def _discard_template(self, user_id: str, template_id: str):
+        templates = self._templates.get(user_id)
+        if templates is not None:
+            templates.discard(template_id)
+            if not templates:
+                del self._templates[user_id]
+
+    def remove(self, template_id: str) -> bool:
+        """Xóa template, chuyển hàng cuối vào vị trí bị xóa để ma trận luôn liên tục"""
+        with self._lock:
+            row = self._rows.pop(str(template_id), None)
+            if row is None:
+                return False
+            self._discard_template(self._user_ids[row], str(template_id))
+            last = len(self._ids) - 1
+            if row != last:
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = self._ids[last]
+                self._user_ids[row] = self._user_ids[last]
+                self._names[row] = self._names[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._user_ids.pop()
+            self._names.pop()
+            return True
+
+    def remove_user(self, user_id: str) -> int:
+        """Xóa tất cả template của user, trả về số template đã xóa"""
+        with self._lock:
+            templates = list(self._templates.get(str(user_id), ()))
+            for template_id in templates:
+                self.remove(template_id)
+            return len(templates)
+
+    def search(self, encodings, top_k: int = 1) -> List[List[dict]]:
+        """Tìm top_k user gần nhất theo cosine cho từng encoding.
+
+        Chỉ xét template_k template gần nhất rồi gộp theo user, giống truy vấn trên Qdrant.
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if queries.shape[0] == 0:
+            return []
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return [[] for _ in range(queries.shape[0])]
+            scores = self._normalize(queries) @ self._vectors[:size].T
+            k = min(max(top_k, self.template_k), size)
+            if k < size:
+                candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.tile(np.arange(size), (queries.shape[0], 1))
+            results = []
+            for query_scores, rows in zip(scores, candidates):
+                rows = rows[np.argsort(-query_scores[rows])]
+                users = aggregate_by_user(
+                    ((self._user_ids[row], self._names[row], query_scores[row]) for row in rows),
+                    self.aggregation,
+                    self.aggregation_k
+                )
+                results.append(users[:top_k])
+            return results
+
+    def search_one(self, encoding) -> Optional[dict]:
+        matches = self.search([encoding], top_k=1)[0]
+        return matches[0] if matches else None
@@ -0,0 +1,128 @@
+import io
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from app.config import config
+from app.utils.metrics import Counter, timed
+
+Box = Tuple[int, int, int, int]
+
+# Vùng cần phát hiện lại và các bbox ngoài vùng được giữ nguyên, theo toạ độ ảnh gốc
+Region = Tuple[Box, List[Box]]
+
+motion_frames = Counter(
+    "face_motion_frames_total",
+    "Frame real-time theo quyết định của motion gate (skipped: dùng lại kết quả, roi: chỉ phát hiện vùng thay đổi, full)",
+    ["decision"]
+)
+
+SKIPPED = "skipped"
+ROI = "roi"
+FULL = "full"
+
+def thumbnail(frame: bytes, width: int) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """Ảnh xám rộng width pixel và kích thước (width, height) của ảnh gốc.
+
+    JPEG được giải mã trực tiếp ở 1/8 độ phân giải nên rẻ hơn nhiều so với giải mã đầy đủ.
+    """
+    try:
+        with Image.open(io.BytesIO(frame)) as image:
+            size = image.size
+            image.draft("L", (max(size[0] // 8, width), max(size[1] // 8, 1)))
+            height = max(round(width * size[1] / size[0]), 1)
+            return np.asarray(image.convert("L").resize((width, height), Image.BILINEAR), dtype=np.int16), size
+    except Exception:
+        return None, (0, 0)
+
+def _intersects(box_a: Box, box_b: Box) -> bool:
+    return box_a[0] < box_b[2] and box_b[0] < box_a[2] and box_a[3] < box_b[1] and box_b[3] < box_a[1]
+
+class MotionDecision:
+    def __init__(self, kind: str, thumb: Optional[np.ndarray], region: Optional[Region] = None):
+        self.kind = kind
+        self.thumb = thumb
+        self.region = region
+
+class MotionGate:
+    """So sánh frame mới của một phiên real-time với frame đã xử lý gần nhất trên ảnh xám thu nhỏ.
+
+    Không có thay đổi: trả về ngay kết quả trước đó mà không giải mã đầy đủ hay phát hiện.
+    Thay đổi cục bộ: chỉ phát hiện trong vùng thay đổi (nới thêm lề và bao trọn các khuôn mặt
+    cũ chạm vào vùng), khuôn mặt cũ ngoài vùng được giữ nguyên bbox để tracker dùng lại danh tính.
+    Thay đổi lớn (chuyển cảnh) hoặc đã quá refresh_frames frame: xử lý cả frame.
+    """
+
+    def __init__(
+        self,
+        grid: int = config.MOTION_GRID,
+        pixel_threshold: int = config.MOTION_PIXEL_THRESHOLD,
+        min_changed: float = config.MOTION_MIN_CHANGED,
+        max_roi: float = config.MOTION_MAX_ROI,
+        roi_margin: float = config.MOTION_ROI_MARGIN,
+        refresh_frames: int = config.MOTION_REFRESH_FRAMES
+    ):
+        self.grid = grid
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_roi = max_roi
+        self.roi_margin = roi_margin
+        self.refresh_frames = refresh_frames
+        self.faces: Optional[List[Dict[str, Any]]] = None
+        self._reference: Optional[np.ndarray] = None
+        self._frames_since_full = 0
+        self.counts = {SKIPPED: 0, ROI: 0, FULL: 0}
+
+    def check(self, frame: bytes) -> MotionDecision:
+        with timed("motion"):
+            decision = self._decide(frame)
+        self.counts[decision.kind] += 1
+        motion_frames.inc(decision=decision.kind)
+        if decision.kind == SKIPPED:
+            self._frames_since_full += 1
+        return decision
+
+    def _decide(self, frame: bytes) -> MotionDecision:
+        thumb, size = thumbnail(frame, self.grid)
+        if (
+            thumb is None
+            or self._reference is None
+            or self._reference.shape != thumb.shape
+            or self.faces is None
+            or self._frames_since_full >= self.refresh_frames
+        ):
+            return MotionDecision(FULL, thumb)
+
+        changed = np.abs(thumb - self._reference) > self.pixel_threshold
+        if changed.mean() < self.min_changed:
+            return MotionDecision(SKIPPED, thumb)
+
+        # Bbox vùng thay đổi trên ảnh thu nhỏ, quy về ảnh gốc và nới thêm lề
+        rows, cols = np.nonzero(changed)
+        scale_x, scale_y = size[0] / thumb.shape[1], size[1] / thumb.shape[0]
+        margin_x, margin_y = self.roi_margin * size[0], self.roi_margin * size[1]
+        roi = (
+            max(int(rows.min() * scale_y - margin_y), 0),
+            min(int((cols.max() + 1) * scale_x + margin_x), size[0]),
+            min(int((rows.max() + 1) * scale_y + margin_y), size[1]),
+            max(int(cols.min() * scale_x - margin_x), 0)
+        )
+        # Nới vùng đến khi bao trọn mọi khuôn mặt cũ chạm vào nó
+        boxes = [tuple(face["bbox"]) for face in self.faces]
+        expanded = True
+        while expanded:
+            expanded = False
+            for box in boxes:
+                union = (min(roi[0], box[0]), max(roi[1], box[1]), max(roi[2], box[2]), min(roi[3], box[3]))
+                if _intersects(box, roi) and union != roi:
+                    roi, expanded = union, True
+        carried = [box for box in boxes if not _intersects(box, roi)]
+
+        if (roi[1] - roi[3]) * (roi[2] - roi[0]) > self.max_roi * size[0] * size[1]:
+            return MotionDecision(FULL, thumb)
+        return MotionDecision(ROI, thumb, (roi, carried))
+
+    def update(self, decision: MotionDecision, faces: List[Dict[str, Any]]):
+        """Ghi nhận kết quả của frame đã xử lý (roi hoặc full) làm mốc so sánh cho các frame sau"""
+        self.faces = faces
+        self._reference = decision.thumb
+        self._frames_since_full = 0 if decision.kind == FULL else self._frames_since_full + 1
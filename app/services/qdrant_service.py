@@ -1,240 +1,580 @@
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
 from app.config import config
+from app.services.local_index import LocalFaceIndex, aggregate_by_user
+from app.services.qdrant_transport import RetryingClient, client_options
 import uuid
 import os
+import threading
 import time
-from grpc import StatusCode
-import sys
+from typing import Iterator, Optional
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+QDRANT_HELP = """Vui lòng thực hiện các bước sau:
+1. Kiểm tra xem Qdrant container đã chạy chưa bằng lệnh: docker ps
+2. Nếu chưa, khởi động Qdrant server bằng lệnh: docker run -p 6333:6333 qdrant/qdrant
+3. Đợi khoảng 10 giây để server khởi động hoàn tất"""
+
+# Mỗi user có đúng một template chính; point cũ (một vector cho mỗi user) không có trường primary
+PRIMARY_FILTER = models.Filter(
+    must_not=[models.FieldCondition(key="primary", match=models.MatchValue(value=False))]
+)
+
+def collection_params(
+    quantization: str = config.QDRANT_QUANTIZATION,
+    hnsw_m: int = config.QDRANT_HNSW_M,
+    ef_construct: int = config.QDRANT_HNSW_EF_CONSTRUCT,
+    on_disk: bool = config.QDRANT_ON_DISK
+) -> dict:
+    """Tham số create_collection theo cấu hình, dùng khi tạo mới, khi migrate và trong benchmark"""
+    quantization_config = None
+    if quantization == "int8":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=config.QDRANT_QUANTIZATION_ALWAYS_RAM
+            )
+        )
+    return {
+        "vectors_config": models.VectorParams(size=128, distance=models.Distance.COSINE, on_disk=on_disk),
+        "hnsw_config": models.HnswConfigDiff(m=hnsw_m, ef_construct=ef_construct),
+        "quantization_config": quantization_config,
+        "on_disk_payload": on_disk
+    }
+
+def search_params(
+    quantization: str = config.QDRANT_QUANTIZATION,
+    hnsw_ef: int = config.QDRANT_SEARCH_EF,
+    rescore: bool = config.QDRANT_RESCORE
+) -> Optional[models.SearchParams]:
+    """Tham số tìm kiếm theo cấu hình, None để dùng mặc định của server"""
+    if not hnsw_ef and quantization == "none":
+        return None
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef or None,
+        quantization=models.QuantizationSearchParams(rescore=rescore) if quantization != "none" else None
+    )
 
 class QdrantService:
     def __init__(self):
-        try:
-            print("\n" + "="*80)
-            print("🔄 Đang kết nối đến Qdrant server...")
-            print(f"   - Host: {config.QDRANT_HOST}")
-            print(f"   - Port: {config.QDRANT_PORT}")
-            print("="*80 + "\n")
-            
-            self.client = QdrantClient(
-                host=config.QDRANT_HOST,
-                port=config.QDRANT_PORT,
-                prefer_grpc=False,
-                timeout=5.0
-            )
-            self.collection_name = config.QDRANT_COLLECTION
-            self._ensure_collection()
-        except Exception as e:
-            print("\n" + "="*80)
-            print("❌ LỖI: Không thể kết nối đến Qdrant server")
-            print("="*80)
-            print("Vui lòng thực hiện các bước sau:")
-            print("1. Kiểm tra xem Qdrant container đã chạy chưa bằng lệnh:")
-            print("   docker ps")
-            print("2. Nếu chưa, khởi động Qdrant server bằng lệnh:")
-            print("   docker run -p 6333:6333 qdrant/qdrant")
-            print("3. Đợi khoảng 10 giây để server khởi động hoàn tất")
-            print("4. Chạy lại chương trình")
-            print("="*80 + "\n")
-            sys.exit(1)
+        # Chỉ tạo client, không gọi mạng: kết nối và tạo collection nằm trong connect()/start()
+        self.client = RetryingClient(QdrantClient(**client_options()))
+        # Client async cho đường tìm kiếm, không chiếm thread của pool I/O
+        self.async_client = RetryingClient(AsyncQdrantClient(**client_options())) if config.QDRANT_ASYNC else None
+        self.collection_name = config.QDRANT_COLLECTION
+        self.search_params = search_params()
+        self.ready = False
+        self.healthy = False
+        self.last_health_check = None
+        self._health_stop = threading.Event()
+        self._health_thread = None
+        self.local_index = self._new_local_index() if config.LOCAL_INDEX_ENABLED else None
+        # Thay đổi local index của tiến trình này trong lúc đang nạp lại, None khi không nạp
+        self._index_lock = threading.Lock()
+        self._index_changes = None
+
+    def connect(self):
+        """Kiểm tra/tạo collection và nạp local index; lỗi được ném ra để nơi gọi quyết định thử lại"""
+        logger.info("Đang kết nối đến Qdrant server %s:%s", config.QDRANT_HOST, config.QDRANT_PORT)
+        self._ensure_collection()
+        if self.local_index is not None:
+            self.load_local_index()
+        self.ready = True
+        self.healthy = True
+        self.last_health_check = time.time()
 
     def _ensure_collection(self):
-        max_retries = 3
-        retry_delay = 2  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                print("\n" + "="*80)
-                print("🔄 Đang kiểm tra collection...")
-                print("="*80 + "\n")
-                
-                # Kiểm tra kết nối đến server
-                self.client.get_collections()
-                
-                # Tạo collection nếu chưa tồn tại
-                collections = self.client.get_collections().collections
-                collection_names = [collection.name for collection in collections]
-                
-                if self.collection_name not in collection_names:
-                    print(f"🔄 Đang tạo collection '{self.collection_name}'...")
-                    self.client.create_collection(
-                        collection_name=self.collection_name,
-                        vectors_config=models.VectorParams(size=128, distance=models.Distance.COSINE),
-                    )
-                    print(f"✅ Collection '{self.collection_name}' đã được tạo thành công")
-                else:
-                    print(f"ℹ️ Collection '{self.collection_name}' đã tồn tại")
-                return
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"⚠️ Lỗi kết nối đến Qdrant server (lần thử {attempt + 1}/{max_retries}):")
-                    print(f"   - Lỗi: {str(e)}")
-                    print(f"   - Đang thử lại sau {retry_delay} giây...")
-                    time.sleep(retry_delay)
-                else:
-                    print("\n" + "="*80)
-                    print("❌ LỖI: Không thể kết nối đến Qdrant server sau nhiều lần thử")
-                    print("="*80)
-                    print("Vui lòng thực hiện các bước sau:")
-                    print("1. Kiểm tra xem Qdrant container đã chạy chưa bằng lệnh:")
-                    print("   docker ps")
-                    print("2. Nếu chưa, khởi động Qdrant server bằng lệnh:")
-                    print("   docker run -p 6333:6333 qdrant/qdrant")
-                    print("3. Đợi khoảng 10 giây để server khởi động hoàn tất")
-                    print("4. Chạy lại chương trình")
-                    print("="*80 + "\n")
-                    sys.exit(1)
-
-    def add_user(self, name: str, face_encoding: list[float]) -> str:
-        user_id = str(uuid.uuid4())
+        logger.info("Đang kiểm tra collection '%s'", self.collection_name)
+        # Tạo collection nếu chưa tồn tại (tên có thể là alias sau khi migrate)
+        collections = self.client.get_collections().collections
+        collection_names = [collection.name for collection in collections]
+        collection_names += [alias.alias_name for alias in self.client.get_aliases().aliases]
+
+        if self.collection_name not in collection_names:
+            logger.info("Đang tạo collection '%s'", self.collection_name)
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                **collection_params()
+            )
+            logger.info("Collection '%s' đã được tạo thành công", self.collection_name)
+        else:
+            logger.info("Collection '%s' đã tồn tại", self.collection_name)
+        self.ensure_payload_indexes(self.collection_name)
+
+    def ensure_payload_indexes(self, collection_name: str):
+        """Index payload user_id (lọc/xóa template theo user) và name nếu được bật"""
+        fields = ["user_id"] + (["name"] if config.QDRANT_NAME_INDEX else [])
+        for field_name in fields:
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+
+    @staticmethod
+    def _new_local_index() -> LocalFaceIndex:
+        return LocalFaceIndex(
+            template_k=config.SEARCH_TEMPLATE_K,
+            aggregation=config.SEARCH_AGGREGATION,
+            aggregation_k=config.SEARCH_AGGREGATION_K
+        )
+
+    def load_local_index(self, batch_size: int = 1000):
+        """Nạp toàn bộ template từ collection vào một index mới bằng scroll rồi thay index đang dùng.
+
+        Tìm kiếm vẫn dùng index cũ trong lúc nạp; thay đổi của tiến trình này trong lúc đó được
+        áp dụng lại lên index mới trước khi thay thế để không bị mất.
+        """
+        logger.info("Đang nạp local index từ collection '%s'", self.collection_name)
+        index = self._new_local_index()
+        with self._index_lock:
+            self._index_changes = []
         try:
-            print("\n" + "="*80)
-            print(f"🔄 Đang thêm user {name}...")
-            print(f"   - ID: {user_id}")
-            print(f"   - Vector size: {len(face_encoding)}")
-            print("="*80 + "\n")
-            
-            # Kiểm tra kết nối trước khi thêm
-            try:
-                self.client.get_collections()
-            except Exception as e:
-                print(f"❌ Lỗi kết nối đến Qdrant: {str(e)}")
-                raise
-            
-            # Thêm user
+            batch = []
+            for template in self.iter_templates(batch_size=batch_size, with_vectors=True):
+                batch.append(template)
+                if len(batch) >= batch_size:
+                    self._add_to_local_index(index, batch)
+                    batch = []
+            self._add_to_local_index(index, batch)
+        except Exception:
+            with self._index_lock:
+                self._index_changes = None
+            raise
+        with self._index_lock:
+            for method, args in self._index_changes:
+                getattr(index, method)(*args)
+            self._index_changes = None
+            self.local_index = index
+        logger.info(
+            "Đã nạp %d users (%d templates) vào local index",
+            self.local_index.user_count(), len(self.local_index),
+            extra={"users": self.local_index.user_count(), "templates": len(self.local_index)}
+        )
+
+    def refresh_local_index(self, interval: float = config.LOCAL_INDEX_REFRESH_SECONDS):
+        """Nạp lại local index định kỳ để thấy các thay đổi không đi qua tiến trình này"""
+        while not self._health_stop.wait(interval):
+            if not self.ready:
+                continue
             try:
-                self.client.upsert(
-                    collection_name=self.collection_name,
-                    points=[
-                        models.PointStruct(
-                            id=user_id,
-                            vector=face_encoding,
-                            payload={"name": name}
-                        )
-                    ]
-                )
+                self.load_local_index()
             except Exception as e:
-                print(f"❌ Lỗi khi upsert user: {str(e)}")
-                raise
-            
-            # Kiểm tra xem user đã được thêm chưa
-            try:
-                search_result = self.client.search(
+                logger.warning("Không nạp lại được local index: %s", e)
+
+    def _update_local_index(self, method: str, *args):
+        """Cập nhật local index theo thao tác ghi, ghi lại thao tác nếu index đang được nạp lại"""
+        with self._index_lock:
+            getattr(self.local_index, method)(*args)
+            if self._index_changes is not None:
+                self._index_changes.append((method, args))
+
+    @staticmethod
+    def _add_to_local_index(index: LocalFaceIndex, templates: list[dict]):
+        index.add_many(
+            [template["template_id"] for template in templates],
+            [template["name"] for template in templates],
+            [template["face_encoding"] for template in templates],
+            [template["user_id"] for template in templates]
+        )
+
+    @staticmethod
+    def _template_id(user_id: str, index: int) -> str:
+        # Template đầu tiên dùng chính user_id làm point ID như dữ liệu một vector cũ,
+        # các template sau có ID cố định theo user và thứ tự để upsert lại không tạo bản trùng
+        return user_id if index == 0 else str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_id}/{index}"))
+
+    @classmethod
+    def _template_ids(cls, user_id: str, count: int) -> list[str]:
+        return [cls._template_id(user_id, i) for i in range(count)]
+
+    @staticmethod
+    def _is_point_id(value: str) -> bool:
+        if value.isdigit():
+            return True
+        try:
+            uuid.UUID(value)
+            return True
+        except ValueError:
+            return False
+
+    def _user_filter(self, user_ids: list[str]) -> models.Filter:
+        """Mọi template của các user: theo payload user_id, hoặc theo point ID với point cũ chưa có payload này"""
+        conditions = [models.FieldCondition(key="user_id", match=models.MatchAny(any=user_ids))]
+        point_ids = [self._parse_cursor(user_id) for user_id in user_ids if self._is_point_id(user_id)]
+        if point_ids:
+            conditions.append(models.HasIdCondition(has_id=point_ids))
+        return models.Filter(should=conditions)
+
+    def _upsert_templates(self, template_ids: list[str], vectors: list, payloads: list[dict], wait: bool):
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=models.Batch(ids=template_ids, vectors=vectors, payloads=payloads),
+            wait=wait
+        )
+        if self.local_index is not None:
+            self._update_local_index(
+                "add_many",
+                template_ids,
+                [payload["name"] for payload in payloads],
+                vectors,
+                [payload["user_id"] for payload in payloads]
+            )
+
+    def add_user(self, name: str, face_encodings: list[list[float]]) -> str:
+        # Một lần upsert với wait=True, không kiểm tra kết nối trước hay tìm kiếm lại sau khi ghi
+        return self.add_users([{"name": name, "face_encodings": face_encodings}])[0]
+
+    def add_users(self, users: list[dict], wait: bool = True) -> list[str]:
+        """Upsert nhiều user trong một request.
+
+        Mỗi phần tử gồm name, face_encodings (hoặc một face_encoding) và user_id (tùy chọn);
+        mỗi encoding được lưu thành một template riêng có payload user_id. User có user_id cho
+        trước được thay thế hoàn toàn: sau khi upsert, các template cũ không nằm trong lần ghi
+        này (kể cả template thêm bằng add_templates) bị xóa.
+        """
+        if not users:
+            return []
+        user_ids = [str(user.get("user_id") or uuid.uuid4()) for user in users]
+        replaced = [user_id for user_id, user in zip(user_ids, users) if user.get("user_id")]
+        template_ids, vectors, payloads = [], [], []
+        for user_id, user in zip(user_ids, users):
+            encodings = user.get("face_encodings") or [user["face_encoding"]]
+            for i, template_id in enumerate(self._template_ids(user_id, len(encodings))):
+                template_ids.append(template_id)
+                vectors.append(list(map(float, encodings[i])))
+                payloads.append({"user_id": user_id, "name": user["name"], "primary": i == 0})
+        try:
+            if replaced and self.local_index is not None:
+                for user_id in replaced:
+                    self._update_local_index("remove_user", user_id)
+            self._upsert_templates(template_ids, vectors, payloads, wait)
+            if replaced:
+                # Xóa sau khi upsert để user không biến mất giữa hai lệnh
+                self.client.delete(
                     collection_name=self.collection_name,
-                    query_vector=face_encoding,
-                    limit=1
+                    points_selector=models.FilterSelector(filter=models.Filter(
+                        must=[self._user_filter(replaced)],
+                        must_not=[models.HasIdCondition(has_id=template_ids)]
+                    )),
+                    wait=wait
                 )
-            except Exception as e:
-                print(f"❌ Lỗi khi tìm kiếm user: {str(e)}")
-                raise
-            
-            if search_result and search_result[0].id == user_id:
-                print(f"✅ Đã thêm user {name} thành công với ID: {user_id}")
-                print(f"   - Collection: {self.collection_name}")
-                print(f"   - Vector size: {len(face_encoding)}")
-                print(f"   - Score: {search_result[0].score}")
-            else:
-                print(f"⚠️ Không thể xác nhận user {name} đã được thêm")
-            
-            return user_id
+            logger.info("Đã thêm %d users (%d templates)", len(users), len(template_ids))
+            return user_ids
         except Exception as e:
-            print(f"❌ Lỗi khi thêm user: {str(e)}")
+            logger.error("Lỗi khi thêm users: %s", e)
             raise e
 
-    def delete_user(self, user_id: str) -> bool:
+    def add_templates(self, user_id: str, face_encodings: list[list[float]], wait: bool = True) -> Optional[dict]:
+        """Thêm template cho user đã có, trả về None nếu không tìm thấy user"""
+        user_id = str(user_id)
         try:
-            print("\n" + "="*80)
-            print(f"🔄 Đang xóa user với ID: {user_id}...")
-            print("="*80 + "\n")
-            
-            self.client.delete(
+            points, _ = self.client.scroll(
                 collection_name=self.collection_name,
-                points_selector=models.PointIdsList(
-                    points=[user_id]
-                )
+                scroll_filter=self._user_filter([user_id]),
+                limit=config.MAX_TEMPLATES_PER_USER + 1,
+                with_payload=["name"],
+                with_vectors=False
             )
-            
-            # Kiểm tra xem user đã bị xóa chưa
-            try:
-                self.client.retrieve(
+            if not points:
+                return None
+            if len(points) + len(face_encodings) > config.MAX_TEMPLATES_PER_USER:
+                raise ValueError(f"User đã có {len(points)} template, tối đa {config.MAX_TEMPLATES_PER_USER}")
+
+            name = points[0].payload.get("name", "Unknown") if points[0].payload else "Unknown"
+            # Cùng cách đặt ID với add_users, lấy các thứ tự chưa có template
+            existing = {str(point.id) for point in points}
+            template_ids = []
+            index = 1
+            while len(template_ids) < len(face_encodings):
+                template_id = self._template_id(user_id, index)
+                if template_id not in existing:
+                    template_ids.append(template_id)
+                index += 1
+            self._upsert_templates(
+                template_ids,
+                [list(map(float, face_encoding)) for face_encoding in face_encodings],
+                [{"user_id": user_id, "name": name, "primary": False} for _ in face_encodings],
+                wait
+            )
+            logger.info("Đã thêm %d template cho user %s", len(template_ids), user_id)
+            return {
+                "user_id": user_id,
+                "name": name,
+                "template_ids": template_ids,
+                "templates": len(points) + len(template_ids)
+            }
+        except Exception as e:
+            logger.error("Lỗi khi thêm template: %s", e)
+            raise e
+
+    def delete_user(self, user_id: str) -> bool:
+        try:
+            return bool(self.delete_users([user_id]))
+        except Exception as e:
+            logger.error("Lỗi khi xóa user: %s", e)
+            return False
+
+    def delete_users(self, user_ids: list[str], wait: bool = True) -> list[str]:
+        """Xóa mọi template của nhiều user trong một request, trả về các ID thực sự tồn tại trước khi xóa.
+
+        Sự tồn tại luôn lấy từ Qdrant bằng một lần scroll các template chính, vì local index chỉ
+        biết các user do tiến trình này thêm/nạp (bỏ qua khi QDRANT_FAST_WRITES, khi đó mọi ID
+        được coi là đã xóa và lệnh xóa theo filter được gửi vô điều kiện).
+        """
+        if not user_ids:
+            return []
+        user_ids = [str(user_id) for user_id in user_ids]
+        try:
+            if config.QDRANT_FAST_WRITES:
+                existing = user_ids
+            else:
+                points, _ = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=models.Filter(must=[self._user_filter(user_ids), PRIMARY_FILTER]),
+                    limit=len(user_ids),
+                    with_payload=["user_id"],
+                    with_vectors=False
+                )
+                found = {self._point_user_id(point) for point in points}
+                existing = [user_id for user_id in user_ids if user_id in found]
+
+            if existing:
+                self.client.delete(
                     collection_name=self.collection_name,
-                    ids=[user_id]
+                    points_selector=models.FilterSelector(filter=self._user_filter(existing)),
+                    wait=wait
                 )
-                print(f"⚠️ Không thể xác nhận user đã bị xóa")
-                return False
-            except Exception:
-                print(f"✅ Đã xóa user với ID: {user_id} thành công")
-                return True
+            if self.local_index is not None:
+                # Dọn cả các ID không còn trong Qdrant nhưng vẫn nằm trong local index
+                for user_id in user_ids:
+                    self._update_local_index("remove_user", user_id)
+            logger.info("Đã xóa %d/%d users", len(existing), len(user_ids))
+            return existing
         except Exception as e:
-            print(f"❌ Lỗi khi xóa user: {str(e)}")
-            return False
+            logger.error("Lỗi khi xóa users: %s", e)
+            raise e
+
+    def check_health(self) -> bool:
+        """Một lần gọi nhẹ tới Qdrant để kiểm tra kết nối, dùng cho probe định kỳ"""
+        try:
+            self.client.get_collection(self.collection_name)
+            self.healthy = True
+        except Exception as e:
+            if self.healthy:
+                logger.warning("Mất kết nối đến Qdrant: %s", e)
+            self.healthy = False
+        self.last_health_check = time.time()
+        return self.healthy
+
+    def start(self, interval: float = config.QDRANT_HEALTH_INTERVAL):
+        """Kết nối trong thread nền (thử lại với backoff) rồi probe định kỳ, không chặn khởi động"""
+        if self._health_thread is not None:
+            return
+
+        def run():
+            delay = 1.0
+            while not self.ready:
+                try:
+                    self.connect()
+                except Exception as e:
+                    self.last_health_check = time.time()
+                    # Hướng dẫn chỉ in ở lần lỗi đầu tiên
+                    logger.warning(
+                        "Chưa kết nối được Qdrant: %s, thử lại sau %.0f giây%s",
+                        e, delay, "\n" + QDRANT_HELP if delay == 1.0 else ""
+                    )
+                    if self._health_stop.wait(delay):
+                        return
+                    delay = min(delay * 2, 30.0)
+            if interval <= 0:
+                return
+            while not self._health_stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=run, name="qdrant-health", daemon=True)
+        self._health_thread.start()
+        if self.local_index is not None and config.LOCAL_INDEX_REFRESH_SECONDS > 0:
+            threading.Thread(target=self.refresh_local_index, name="local-index-refresh", daemon=True).start()
+
+    def stop_health_probe(self):
+        self._health_stop.set()
+
+    async def close(self):
+        """Dừng probe và đóng các kết nối tới Qdrant khi ứng dụng tắt"""
+        self.stop_health_probe()
+        self.client.close()
+        if self.async_client is not None:
+            await self.async_client.close()
+
+    @staticmethod
+    def _point_user_id(point) -> str:
+        # Point cũ chưa có payload user_id: chính point ID là user ID
+        if point.payload and point.payload.get("user_id"):
+            return point.payload["user_id"]
+        return str(point.id)
+
+    def _best_user(self, points) -> Optional[dict]:
+        """Gộp các template trả về từ Qdrant theo user, lấy user có điểm cao nhất"""
+        users = aggregate_by_user(
+            (
+                (self._point_user_id(point), point.payload.get("name", "Unknown"), point.score)
+                for point in points
+            ),
+            config.SEARCH_AGGREGATION,
+            config.SEARCH_AGGREGATION_K
+        )
+        return users[0] if users else None
 
     def search_user(self, face_encoding: list[float]) -> dict:
         try:
-            print("\n" + "="*80)
-            print("🔄 Đang tìm kiếm user...")
-            print("="*80 + "\n")
+            if self.local_index is not None:
+                return self.local_index.search_one(face_encoding)
             
+            # Số template lấy về cố định nên chi phí mỗi truy vấn không tăng theo số template mỗi user
             search_result = self.client.search(
                 collection_name=self.collection_name,
                 query_vector=face_encoding,
-                limit=1
+                search_params=self.search_params,
+                limit=config.SEARCH_TEMPLATE_K,
+                with_payload=["user_id", "name"]
             )
             
-            if not search_result:
-                print("ℹ️ Không tìm thấy user phù hợp")
+            best_match = self._best_user(search_result)
+            if not best_match:
+                logger.debug("Không tìm thấy user phù hợp")
                 return None
             
-            best_match = search_result[0]
-            print(f"✅ Tìm thấy user phù hợp:")
-            print(f"   - ID: {best_match.id}")
-            print(f"   - Tên: {best_match.payload['name']}")
-            print(f"   - Độ chính xác: {best_match.score}")
-            return {
-                "user_id": best_match.id,
-                "name": best_match.payload["name"],
-                "score": best_match.score
-            }
+            logger.debug("Tìm thấy user %s (%s), score %.4f", best_match["user_id"], best_match["name"], best_match["score"])
+            return best_match
         except Exception as e:
-            print(f"❌ Lỗi khi tìm kiếm user: {str(e)}")
+            logger.error("Lỗi khi tìm kiếm user: %s", e)
             raise e
 
-    def list_users(self) -> list[dict]:
+    def search_users_batch(self, face_encodings: list[list[float]]) -> list[dict]:
+        """Tìm user phù hợp nhất cho nhiều khuôn mặt trong một request tới Qdrant"""
+        if not face_encodings:
+            return []
         try:
-            print("\n" + "="*80)
-            print("🔄 Đang lấy danh sách users...")
-            print("="*80 + "\n")
+            if self.local_index is not None:
+                return [matches[0] if matches else None for matches in self.local_index.search(face_encodings)]
             
-            # Lấy tất cả points từ collection
-            points = self.client.scroll(
+            batch_results = self.client.search_batch(
                 collection_name=self.collection_name,
-                limit=100,
-                with_payload=True,
-                with_vectors=True
-            )[0]
-            
-            if not points:
-                print("ℹ️ Không có user nào trong collection")
-                return []
+                requests=self._search_requests(face_encodings)
+            )
             
-            users = []
-            for point in points:
-                try:
-                    user = {
-                        "user_id": str(point.id),
-                        "name": point.payload.get("name", "Unknown"),
-                        "face_encoding": point.vector
-                    }
-                    users.append(user)
-                except Exception as e:
-                    print(f"⚠️ Lỗi khi xử lý point {point.id}: {str(e)}")
-                    continue
+            # Giữ đúng thứ tự với face_encodings, None nếu không có kết quả
+            results = [self._best_user(search_result) for search_result in batch_results]
             
-            print(f"✅ Đã lấy danh sách {len(users)} users")
-            for user in users:
-                print(f"   - {user['name']} (ID: {user['user_id']})")
-            return users
+            logger.debug("Đã tìm kiếm %d khuôn mặt, %d có kết quả", len(results), sum(r is not None for r in results))
+            return results
         except Exception as e:
-            print(f"❌ Lỗi khi lấy danh sách users: {str(e)}")
-            raise e 
\ No newline at end of file
+            logger.error("Lỗi khi tìm kiếm user: %s", e)
+            raise e
+
+    def _search_requests(self, face_encodings: list[list[float]]) -> list[models.SearchRequest]:
+        return [
+            models.SearchRequest(
+                vector=face_encoding,
+                params=self.search_params,
+                limit=config.SEARCH_TEMPLATE_K,
+                with_payload=["user_id", "name"]
+            )
+            for face_encoding in face_encodings
+        ]
+
+    async def search_user_async(self, face_encoding: list[float]) -> Optional[dict]:
+        """search_user qua client async (QDRANT_ASYNC), không chiếm thread của pool I/O"""
+        try:
+            search_result = await self.async_client.search(
+                collection_name=self.collection_name,
+                query_vector=face_encoding,
+                search_params=self.search_params,
+                limit=config.SEARCH_TEMPLATE_K,
+                with_payload=["user_id", "name"]
+            )
+            return self._best_user(search_result)
+        except Exception as e:
+            logger.error("Lỗi khi tìm kiếm user: %s", e)
+            raise e
+
+    async def search_users_batch_async(self, face_encodings: list[list[float]]) -> list[dict]:
+        """search_users_batch qua client async (QDRANT_ASYNC)"""
+        if not face_encodings:
+            return []
+        try:
+            batch_results = await self.async_client.search_batch(
+                collection_name=self.collection_name,
+                requests=self._search_requests(face_encodings)
+            )
+            return [self._best_user(search_result) for search_result in batch_results]
+        except Exception as e:
+            logger.error("Lỗi khi tìm kiếm user: %s", e)
+            raise e
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]):
+        # Point ID của Qdrant là UUID hoặc số nguyên
+        if cursor is None:
+            return None
+        return int(cursor) if cursor.isdigit() else cursor
+
+    def _point_to_user(self, point, with_vectors: bool) -> dict:
+        user = {
+            "user_id": self._point_user_id(point),
+            "name": point.payload.get("name", "Unknown") if point.payload else "Unknown"
+        }
+        if with_vectors:
+            user["face_encoding"] = point.vector
+        return user
+
+    def list_users(self, limit: int = 100, cursor: Optional[str] = None, with_vectors: bool = False) -> tuple[list[dict], Optional[str]]:
+        """Một trang user theo cursor (offset của scroll), trả về (users, cursor trang tiếp theo).
+
+        Chỉ duyệt template chính nên mỗi user xuất hiện một lần; with_vectors trả về vector của template chính.
+        """
+        try:
+            points, next_offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=PRIMARY_FILTER,
+                limit=limit,
+                offset=self._parse_cursor(cursor),
+                with_payload=["user_id", "name"],
+                with_vectors=with_vectors
+            )
+            users = [self._point_to_user(point, with_vectors) for point in points]
+            return users, str(next_offset) if next_offset is not None else None
+        except Exception as e:
+            logger.error("Lỗi khi lấy danh sách users: %s", e)
+            raise e
+
+    def iter_users(self, batch_size: int = 1000, with_vectors: bool = False) -> Iterator[dict]:
+        """Duyệt toàn bộ user theo từng trang, bộ nhớ chỉ giữ một trang"""
+        cursor = None
+        while True:
+            users, cursor = self.list_users(limit=batch_size, cursor=cursor, with_vectors=with_vectors)
+            yield from users
+            if cursor is None:
+                return
+
+    def iter_templates(self, batch_size: int = 1000, with_vectors: bool = False) -> Iterator[dict]:
+        """Duyệt toàn bộ template (mọi point trong collection) theo từng trang"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["user_id", "name"],
+                with_vectors=with_vectors
+            )
+            for point in points:
+                template = self._point_to_user(point, with_vectors)
+                template["template_id"] = str(point.id)
+                yield template
+            if offset is None:
+                return
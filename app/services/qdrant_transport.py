@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import inspect
+import time
+import grpc
+import httpx
+from grpc import StatusCode
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from app.config import config
+from app.utils.logger import get_logger
+from app.utils.metrics import Counter
+
+logger = get_logger(__name__)
+
+qdrant_retries = Counter("face_qdrant_retries_total", "Số lần thử lại lời gọi Qdrant sau lỗi tạm thời", ["method"])
+
+# Lời gọi đọc, hoặc ghi với ID/điều kiện cố định: gửi lại không làm sai dữ liệu
+RETRYABLE_METHODS = {
+    "search", "search_batch", "scroll", "retrieve", "count",
+    "get_collection", "get_collections", "get_aliases",
+    "upsert", "delete"
+}
+
+TRANSIENT_GRPC_CODES = {StatusCode.UNAVAILABLE, StatusCode.DEADLINE_EXCEEDED, StatusCode.RESOURCE_EXHAUSTED}
+TRANSIENT_HTTP_STATUS = {429, 502, 503, 504}
+
+def client_options(transport: str = config.QDRANT_TRANSPORT, timeout: float = config.QDRANT_TIMEOUT) -> dict:
+    """Tham số chung cho QdrantClient/AsyncQdrantClient theo transport ("rest" hoặc "grpc")"""
+    if transport not in ("rest", "grpc"):
+        raise ValueError(f"QDRANT_TRANSPORT không hợp lệ: {transport}")
+    options = {
+        "host": config.QDRANT_HOST,
+        "port": config.QDRANT_PORT,
+        "grpc_port": config.QDRANT_GRPC_PORT,
+        "prefer_grpc": transport == "grpc",
+        "timeout": timeout
+    }
+    if transport == "rest":
+        # Giữ kết nối keep-alive cho các thread/coroutine gọi Qdrant thay vì mở kết nối mới mỗi request
+        # (mặc định của qdrant-client tắt keep-alive)
+        options["limits"] = httpx.Limits(
+            max_connections=config.QDRANT_THREADS * 2,
+            max_keepalive_connections=config.QDRANT_THREADS
+        )
+    return options
+
+def is_transient(error: Exception) -> bool:
+    """Lỗi mạng, timeout hoặc server tạm quá tải; lỗi do request (4xx khác) không được thử lại"""
+    if isinstance(error, grpc.RpcError):
+        return error.code() in TRANSIENT_GRPC_CODES
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in TRANSIENT_HTTP_STATUS
+    return isinstance(error, (ResponseHandlingException, httpx.TransportError, TimeoutError))
+
+class RetryingClient:
+    """Bọc QdrantClient hoặc AsyncQdrantClient: lời gọi trong RETRYABLE_METHODS được thử lại
+    tối đa retries lần với backoff tăng gấp đôi khi gặp lỗi tạm thời; các thuộc tính khác đi thẳng tới client.
+    """
+
+    def __init__(self, client, retries: int = config.QDRANT_RETRIES, backoff: float = config.QDRANT_RETRY_BACKOFF_MS / 1000):
+        self._client = client
+        self.retries = retries
+        self.backoff = backoff
+
+    def _delay(self, method: str, attempt: int, error: Exception) -> float:
+        delay = self.backoff * (2 ** attempt)
+        qdrant_retries.inc(method=method)
+        logger.warning("Lỗi tạm thời khi gọi Qdrant %s: %s, thử lại sau %.2f giây", method, error, delay)
+        return delay
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if name not in RETRYABLE_METHODS or not callable(attribute):
+            return attribute
+
+        if inspect.iscoroutinefunction(attribute):
+            @functools.wraps(attribute)
+            async def call_async(*args, **kwargs):
+                for attempt in range(self.retries + 1):
+                    try:
+                        return await attribute(*args, **kwargs)
+                    except Exception as e:
+                        if attempt == self.retries or not is_transient(e):
+                            raise
+                        await asyncio.sleep(self._delay(name, attempt, e))
+            return call_async
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            for attempt in range(self.retries + 1):
+                try:
+                    return attribute(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        raise
+                    time.sleep(self._delay(name, attempt, e))
+        return call
@@ -0,0 +1,200 @@
+import importlib
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from app.config import config
+from app.utils.face_utils import detect_and_encode_faces_batch
+
+# Một frame đã lấy mẫu: (chỉ số frame trong video, thời điểm tính bằng giây, ảnh RGB)
+Frame = Tuple[int, float, np.ndarray]
+
+def _cv2():
+    try:
+        return importlib.import_module("cv2")
+    except ImportError:
+        raise RuntimeError("Đọc video cần OpenCV: pip install opencv-python-headless") from None
+
+def read_frames(source: str, sample_fps: float = config.VIDEO_SAMPLE_FPS) -> Iterator[Frame]:
+    """Đọc file video hoặc URL RTSP, chỉ giải mã đầy đủ các frame được lấy mẫu.
+
+    Frame bị bỏ chỉ được grab (không chuyển màu/sao chép); sample_fps <= 0 lấy mọi frame.
+    Thời điểm theo FPS của video, hoặc theo đồng hồ nếu luồng không báo FPS (một số luồng RTSP).
+    """
+    cv2 = _cv2()
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Không mở được video: {source}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    interval = 1 / sample_fps if sample_fps > 0 else 0.0
+    started = time.monotonic()
+    next_timestamp = 0.0
+    index = -1
+    try:
+        while capture.grab():
+            index += 1
+            timestamp = index / fps if fps > 0 else time.monotonic() - started
+            if timestamp + 1e-6 < next_timestamp:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            next_timestamp = max(next_timestamp + interval, timestamp)
+            yield index, timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
+
+def batched(frames: Iterable[Frame], size: int) -> Iterator[List[Frame]]:
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def encode_frames(images: List[np.ndarray]) -> List[Optional[Tuple[List[list[float]], int]]]:
+    """Chạy trong worker process: (encoding các khuôn mặt đạt chất lượng, số khuôn mặt bị loại) của từng frame"""
+    results = []
+    for detection in detect_and_encode_faces_batch(images, quality=config.FACE_QUALITY_ENABLED):
+        if detection is None:
+            results.append(None)
+            continue
+        _, encodings, _, rejected = detection
+        results.append(([encoding for encoding in encodings if encoding is not None], sum(1 for reason in rejected if reason)))
+    return results
+
+class Timeline:
+    """Gộp các lần nhận diện thành đoạn xuất hiện của từng người.
+
+    Chỉ các đoạn đang mở (người xuất hiện trong gap_seconds gần nhất) được giữ trong bộ nhớ;
+    đoạn đóng được trả về ngay để ghi ra, nên bộ nhớ không tăng theo độ dài video.
+    """
+
+    def __init__(self, gap_seconds: float = config.VIDEO_SEGMENT_GAP_SECONDS):
+        self.gap_seconds = gap_seconds
+        self._open: Dict[str, dict] = {}
+
+    def add(self, timestamp: float, matches: List[dict]) -> List[dict]:
+        """Thêm kết quả một frame, trả về các đoạn vừa đóng"""
+        closed = self._close(lambda segment: timestamp - segment["end"] > self.gap_seconds)
+        for match in matches:
+            segment = self._open.get(match["user_id"])
+            if segment is None:
+                segment = self._open[match["user_id"]] = {
+                    "user_id": match["user_id"],
+                    "name": match["name"],
+                    "start": timestamp,
+                    "end": timestamp,
+                    "frames": 0,
+                    "best_score": match["score"]
+                }
+            # Cùng một người khớp nhiều khuôn mặt trong một frame chỉ tính một frame
+            if segment["frames"] == 0 or segment["end"] < timestamp:
+                segment["frames"] += 1
+            segment["end"] = timestamp
+            segment["best_score"] = max(segment["best_score"], match["score"])
+        return closed
+
+    def close_all(self) -> List[dict]:
+        return self._close(lambda segment: True)
+
+    def _close(self, should_close: Callable[[dict], bool]) -> List[dict]:
+        closed = [segment for segment in self._open.values() if should_close(segment)]
+        for segment in closed:
+            del self._open[segment["user_id"]]
+        return sorted(closed, key=lambda segment: segment["start"])
+
+class VideoRecognizer:
+    """Nhận diện offline một video: đọc/lấy mẫu frame, detect/encode song song, tìm kiếm theo batch.
+
+    Tiến trình chính giải mã batch tiếp theo trong khi worker detect/encode các batch trước;
+    số batch đang xử lý giới hạn ở processes + 1 nên bộ nhớ chỉ phụ thuộc kích thước batch và frame.
+    Kết quả được xử lý theo đúng thứ tự frame để timeline đúng thời gian.
+    """
+
+    def __init__(
+        self,
+        qdrant_service,
+        processes: int = config.VIDEO_PROCESSES,
+        batch_size: int = config.VIDEO_BATCH_SIZE,
+        gap_seconds: float = config.VIDEO_SEGMENT_GAP_SECONDS
+    ):
+        self.qdrant_service = qdrant_service
+        self.processes = max(processes, 1)
+        self.batch_size = max(batch_size, 1)
+        self.gap_seconds = gap_seconds
+        self.progress = {
+            "frames": 0,
+            "failed_frames": 0,
+            "faces": 0,
+            "matched_faces": 0,
+            "rejected_faces": 0,
+            "segments": 0,
+            "video_seconds": 0.0,
+            "elapsed_seconds": 0.0,
+            "fps": 0.0
+        }
+
+    def _collect(self, timestamps: List[float], results: list, timeline: Timeline, on_segment) -> None:
+        encodings = [encoding for result in results if result for encoding in result[0]]
+        matches = iter(self.qdrant_service.search_users_batch(encodings))
+        for timestamp, result in zip(timestamps, results):
+            self.progress["frames"] += 1
+            self.progress["video_seconds"] = timestamp
+            if result is None:
+                self.progress["failed_frames"] += 1
+                continue
+            frame_encodings, rejected = result
+            frame_matches = [match for match in (next(matches) for _ in frame_encodings) if match]
+            self.progress["faces"] += len(frame_encodings) + rejected
+            self.progress["rejected_faces"] += rejected
+            self.progress["matched_faces"] += len(frame_matches)
+            for segment in timeline.add(timestamp, frame_matches):
+                self.progress["segments"] += 1
+                on_segment(segment)
+
+    def run(
+        self,
+        frames: Iterable[Frame],
+        on_segment: Callable[[dict], None],
+        on_progress: Callable[[dict], None] = None
+    ) -> dict:
+        """Xử lý toàn bộ frames, gọi on_segment cho mỗi đoạn xuất hiện; trả về thống kê và FPS xử lý"""
+        start = time.perf_counter()
+        timeline = Timeline(self.gap_seconds)
+
+        def report():
+            elapsed = time.perf_counter() - start
+            self.progress["elapsed_seconds"] = round(elapsed, 2)
+            self.progress["fps"] = round(self.progress["frames"] / elapsed, 2) if elapsed else 0.0
+            if on_progress:
+                on_progress(self.progress)
+
+        with ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            pending = deque()
+            for batch in batched(frames, self.batch_size):
+                if len(pending) > self.processes:
+                    timestamps, future = pending.popleft()
+                    self._collect(timestamps, future.result(), timeline, on_segment)
+                    report()
+                pending.append((
+                    [timestamp for _, timestamp, _ in batch],
+                    executor.submit(encode_frames, [image for _, _, image in batch])
+                ))
+            while pending:
+                timestamps, future = pending.popleft()
+                self._collect(timestamps, future.result(), timeline, on_segment)
+                report()
+
+        for segment in timeline.close_all():
+            self.progress["segments"] += 1
+            on_segment(segment)
+        report()
+        return self.progress
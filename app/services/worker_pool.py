@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from fastapi import HTTPException
+from app.config import config
+from app.utils.metrics import Gauge, begin_stage_capture, end_stage_capture, record_stage_timings
+
+class WorkerError(Exception):
+    """Lỗi HTTP từ worker process, có thể pickle để chuyển về tiến trình chính"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _invoke(fn, *args, **kwargs):
+    """Chạy job trong worker, trả về (kết quả, thời gian từng giai đoạn đo được trong job)"""
+    begin_stage_capture()
+    try:
+        return fn(*args, **kwargs), end_stage_capture()
+    except HTTPException as e:
+        # HTTPException tạo bằng keyword không pickle được
+        raise WorkerError(e.status_code, e.detail) from None
+    finally:
+        end_stage_capture()
+
+class WorkerPool:
+    """Chạy detect/encode trên process pool và lời gọi Qdrant trên thread pool, ngoài event loop"""
+
+    def __init__(
+        self,
+        processes: int = config.WORKER_PROCESSES,
+        queue_depth: int = config.WORKER_QUEUE_DEPTH,
+        overload_policy: str = config.WORKER_OVERLOAD_POLICY,
+        io_threads: int = config.QDRANT_THREADS
+    ):
+        if overload_policy not in ("reject", "queue"):
+            raise ValueError(f"WORKER_OVERLOAD_POLICY không hợp lệ: {overload_policy}")
+        self.processes = processes
+        self.capacity = max(processes, 1) + queue_depth
+        self.overload_policy = overload_policy
+        self.io_threads = io_threads
+        self.in_flight = 0
+        self._slots = None
+        self._cpu_executor: Executor = None
+        self._io_executor: Executor = None
+
+    def _get_cpu_executor(self) -> Executor:
+        # Tạo executor khi cần để import module không khởi động tiến trình con
+        if self._cpu_executor is None:
+            if self.processes > 0:
+                # spawn tránh fork tiến trình đang có thread của uvicorn/qdrant-client
+                self._cpu_executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._cpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-cpu")
+        return self._cpu_executor
+
+    def _get_io_executor(self) -> Executor:
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix="qdrant-io")
+        return self._io_executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Số job CPU đang chờ (không tính các job đang chạy)"""
+        return max(self.in_flight - max(self.processes, 1), 0)
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        """Chạy hàm CPU-bound trong process pool với giới hạn số job đang chờ"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        if self.overload_policy == "reject" and self._slots.locked():
+            raise HTTPException(status_code=503, detail="Server đang quá tải, vui lòng thử lại sau")
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                result, timings = await loop.run_in_executor(self._get_cpu_executor(), partial(_invoke, fn, *args, **kwargs))
+                record_stage_timings(timings)
+                return result
+            except WorkerError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
+            finally:
+                self.in_flight -= 1
+
+    async def warm_up(self, fn) -> list:
+        """Chạy fn một lần trên mỗi worker (khởi động tiến trình, nạp model) trước request đầu tiên"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_cpu_executor()
+        # Job khởi động không được tính vào metric thời gian các giai đoạn
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, partial(_invoke, fn)) for _ in range(max(self.processes, 1))
+        ))
+        return [result for result, _ in results]
+
+    async def run_io(self, fn, *args, **kwargs):
+        """Chạy lời gọi I/O đồng bộ (Qdrant) trong thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_io_executor(), partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        for executor in (self._cpu_executor, self._io_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._cpu_executor = None
+        self._io_executor = None
+
+# Dùng chung cho toàn bộ tiến trình để các router không tạo pool riêng
+worker_pool = WorkerPool()
+
+Gauge("face_worker_queue_depth", "Số job detect/encode đang chờ worker", lambda: worker_pool.queue_depth)
+Gauge("face_worker_in_flight", "Số job detect/encode đang chạy hoặc chờ", lambda: worker_pool.in_flight)
@@ -2,7 +2,8 @@
 const API_BASE_URL = '/api/v1';
 const ENDPOINTS = {
     USERS: `${API_BASE_URL}/web/users`,
-    SEARCH: `${API_BASE_URL}/web/users/search`
+    SEARCH: `${API_BASE_URL}/web/users/search`,
+    STREAM: `${API_BASE_URL}/web/ws/recognize`
 };
 
 // Utility functions
@@ -99,26 +100,51 @@ document.getElementById('searchForm').addEventListener('submit', async (e) => {
 });
 
 // List users handling
-async function loadUserList() {
+const USER_PAGE_SIZE = 50;
+let nextUserCursor = null;
+
+function renderUserRows(users) {
+    return users.map(user => `
+        <tr>
+            <td>${user.user_id}</td>
+            <td>${user.name}</td>
+            <td>
+                <button class="btn btn-danger btn-sm" onclick="deleteUser('${user.user_id}')">
+                    Xóa
+                </button>
+            </td>
+        </tr>
+    `).join('');
+}
+
+// Tải từng trang theo cursor, không lấy vector encoding
+async function loadUserList(append = false) {
     const tbody = document.getElementById('userListBody');
-    tbody.innerHTML = '<tr><td colspan="3" class="text-center">Đang tải...</td></tr>';
+    const loadMoreBtn = document.getElementById('loadMoreUsers');
+    if (!append) {
+        nextUserCursor = null;
+        tbody.innerHTML = '<tr><td colspan="3" class="text-center">Đang tải...</td></tr>';
+    }
+
+    const params = new URLSearchParams({ limit: USER_PAGE_SIZE });
+    if (append && nextUserCursor) {
+        params.set('cursor', nextUserCursor);
+    }
 
     try {
-        const response = await fetch(ENDPOINTS.USERS);
+        const response = await fetch(`${ENDPOINTS.USERS}/?${params}`);
         const users = await response.json();
 
         if (response.ok) {
-            tbody.innerHTML = users.map(user => `
-                <tr>
-                    <td>${user.user_id}</td>
-                    <td>${user.name}</td>
-                    <td>
-                        <button class="btn btn-danger btn-sm" onclick="deleteUser('${user.user_id}')">
-                            Xóa
-                        </button>
-                    </td>
-                </tr>
-            `).join('');
+            nextUserCursor = response.headers.get('X-Next-Cursor');
+            if (append) {
+                tbody.insertAdjacentHTML('beforeend', renderUserRows(users));
+            } else {
+                tbody.innerHTML = renderUserRows(users);
+            }
+            if (loadMoreBtn) {
+                loadMoreBtn.style.display = nextUserCursor ? 'inline-block' : 'none';
+            }
         } else {
             tbody.innerHTML = `<tr><td colspan="3" class="text-center text-danger">${users.detail || 'Có lỗi xảy ra'}</td></tr>`;
         }
@@ -158,7 +184,8 @@ document.getElementById('searchImage').addEventListener('change', function() {
 });
 
 // Refresh list button
-document.getElementById('refreshList').addEventListener('click', loadUserList);
+document.getElementById('refreshList').addEventListener('click', () => loadUserList());
+document.getElementById('loadMoreUsers').addEventListener('click', () => loadUserList(true));
 
 // Load initial user list
 loadUserList();
@@ -179,6 +206,10 @@ const TARGET_FPS = 30;
 const MAX_RETRIES = 3;
 const RETRY_DELAY = 1000;
 
+// Gửi frame qua WebSocket thay vì upload multipart từng frame
+const USE_WEBSOCKET = true;
+let socket = null;
+
 // Initialize camera elements
 function initCameraElements() {
     video = document.getElementById('video');
@@ -479,6 +510,49 @@ async function processRealTime() {
     isProcessing = false;
 }
 
+function getStreamUrl() {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    return `${protocol}//${window.location.host}${ENDPOINTS.STREAM}`;
+}
+
+// Mở kết nối WebSocket; server chỉ xử lý frame mới nhất nên client chỉ cần gửi đều
+function openStream() {
+    return new Promise((resolve, reject) => {
+        const ws = new WebSocket(getStreamUrl());
+        ws.binaryType = 'arraybuffer';
+        ws.onopen = () => resolve(ws);
+        ws.onerror = () => reject(new Error('Không thể kết nối WebSocket'));
+        ws.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.faces && Array.isArray(data.faces)) {
+                drawFaceBoxes(data.faces);
+            } else if (data.error) {
+                console.error('Stream error:', data.error);
+            }
+        };
+        ws.onclose = () => {
+            if (socket === ws) {
+                socket = null;
+            }
+        };
+    });
+}
+
+function sendStreamFrame() {
+    if (!socket || socket.readyState !== WebSocket.OPEN || !video || !canvas || !context) return;
+    // Không chồng thêm frame khi frame trước chưa gửi xong
+    if (socket.bufferedAmount > 0) return;
+
+    canvas.width = video.videoWidth;
+    canvas.height = video.videoHeight;
+    context.drawImage(video, 0, 0, canvas.width, canvas.height);
+    canvas.toBlob((blob) => {
+        if (blob && socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(blob);
+        }
+    }, 'image/jpeg');
+}
+
 async function startRealTime() {
     if (isRealTimeRunning) return;
     
@@ -497,7 +571,18 @@ async function startRealTime() {
         }
         
         isRealTimeRunning = true;
-        realTimeInterval = setInterval(processRealTime, 1000 / TARGET_FPS);
+        if (USE_WEBSOCKET && 'WebSocket' in window) {
+            try {
+                socket = await openStream();
+                realTimeInterval = setInterval(sendStreamFrame, 1000 / TARGET_FPS);
+            } catch (err) {
+                console.warn('WebSocket không khả dụng, chuyển sang upload từng frame:', err);
+                socket = null;
+            }
+        }
+        if (!realTimeInterval) {
+            realTimeInterval = setInterval(processRealTime, 1000 / TARGET_FPS);
+        }
         
         // Update UI
         const startBtn = document.getElementById('startRealTime');
@@ -519,6 +604,10 @@ function stopRealTime() {
         clearInterval(realTimeInterval);
         realTimeInterval = null;
     }
+    if (socket) {
+        socket.close();
+        socket = null;
+    }
     
     // Xóa class realtime để ẩn canvas
     const container = document.querySelector('.camera-container');
@@ -0,0 +1,50 @@
+from typing import List, Optional, Tuple
+
+def box_iou(box_a: Tuple[int, int, int, int], box_b: Tuple[int, int, int, int]) -> float:
+    """IoU của hai bbox dạng (top, right, bottom, left)"""
+    top, right = max(box_a[0], box_b[0]), min(box_a[1], box_b[1])
+    bottom, left = min(box_a[2], box_b[2]), max(box_a[3], box_b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+def match_boxes(boxes: List[Tuple[int, int, int, int]], reference_boxes: List[Tuple[int, int, int, int]], iou_threshold: float) -> List[Optional[int]]:
+    """Ghép tham lam mỗi bbox với bbox tham chiếu có IoU cao nhất, trả về chỉ số hoặc None"""
+    pairs = sorted(
+        (
+            (box_iou(box, reference), i, j)
+            for i, box in enumerate(boxes)
+            for j, reference in enumerate(reference_boxes)
+        ),
+        reverse=True
+    )
+    matches = [None] * len(boxes)
+    used = set()
+    for iou, i, j in pairs:
+        if iou < iou_threshold:
+            break
+        if matches[i] is None and j not in used:
+            matches[i] = j
+            used.add(j)
+    return matches
+
+def scale_boxes(
+    boxes: List[Tuple[int, int, int, int]],
+    factor: float,
+    width: Optional[int] = None,
+    height: Optional[int] = None
+) -> List[Tuple[int, int, int, int]]:
+    """Nhân toạ độ bbox với factor, cắt theo kích thước ảnh nếu biết"""
+    if factor == 1.0:
+        return list(boxes)
+    scaled = []
+    for top, right, bottom, left in boxes:
+        top, right, bottom, left = (int(round(v * factor)) for v in (top, right, bottom, left))
+        if width is not None and height is not None:
+            top, left = max(top, 0), max(left, 0)
+            bottom, right = min(bottom, height), min(right, width)
+        scaled.append((top, right, bottom, left))
+    return scaled
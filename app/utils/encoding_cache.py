@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from app.config import config
+
+# Giá trị cache: (face_locations, encodings) của một ảnh
+CachedDetection = Tuple[List[Tuple[int, int, int, int]], List[list[float]]]
+
+def _entry_size(value: CachedDetection) -> int:
+    face_locations, encodings = value
+    return 256 + len(face_locations) * 64 + sum(len(encoding) * 8 for encoding in encodings)
+
+class EncodingCache:
+    """Cache LRU theo hash nội dung ảnh cho kết quả detect/encode.
+
+    Tầng bộ nhớ giới hạn bởi max_bytes; tầng đĩa (tùy chọn) lưu mỗi entry thành
+    một file .npz trong disk_dir và xóa file cũ nhất khi vượt disk_max_bytes.
+    get_memory/put_memory không chạm đĩa nên gọi được trên event loop; get_disk/put_disk
+    đọc/ghi file và phải chạy trên thread I/O.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = "", disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, CachedDetection]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Tổng kích thước file trên đĩa, đếm dần theo mỗi lần ghi; None đến lần ghi đầu tiên
+        self._disk_bytes = None
+        self._disk_lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    @staticmethod
+    def make_key(data: bytes, params: str) -> str:
+        """Khóa gồm hash nội dung ảnh và các tham số phát hiện/encode"""
+        digest = hashlib.sha256(data)
+        digest.update(params.encode())
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npz")
+
+    def get(self, key: str) -> Optional[CachedDetection]:
+        value = self.get_memory(key)
+        return value if value is not None else self.get_disk(key)
+
+    def put(self, key: str, value: CachedDetection):
+        self.put_memory(key, value)
+        self.put_disk(key, value)
+
+    def get_memory(self, key: str) -> Optional[CachedDetection]:
+        """Chỉ tra tầng bộ nhớ; không tính là miss vì còn tầng đĩa"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            return value
+
+    def get_disk(self, key: str) -> Optional[CachedDetection]:
+        """Tra tầng đĩa sau khi get_memory trượt, entry tìm thấy được đưa lên tầng bộ nhớ"""
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self.put_memory(key, value)
+        return value
+
+    def put_disk(self, key: str, value: CachedDetection):
+        self._write_disk(key, value)
+
+    def put_memory(self, key: str, value: CachedDetection):
+        size = _entry_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= _entry_size(self._entries.pop(key))
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _entry_size(evicted)
+                self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[CachedDetection]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with np.load(path) as data:
+                face_locations = [tuple(int(v) for v in location) for location in data["locations"]]
+                encodings = [list(encoding) for encoding in data["encodings"]]
+            os.utime(path)
+            return face_locations, encodings
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: CachedDetection):
+        if not self.disk_dir:
+            return
+        face_locations, encodings = value
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    locations=np.asarray(face_locations, dtype=np.int32).reshape(-1, 4),
+                    encodings=np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+                )
+            size = os.path.getsize(tmp_path)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        if self.disk_max_bytes <= 0:
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += size - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def _scan_disk(self) -> Tuple[list, int]:
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return files, total
+
+    def _trim_disk(self):
+        """Quét thư mục một lần khi vượt giới hạn và xóa xuống 90% để không phải quét ở mỗi lần ghi"""
+        files, total = self._scan_disk()
+        target = self.disk_max_bytes * 0.9
+        # Xóa entry ít được dùng nhất (mtime cũ nhất) đến khi đủ chỗ
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        }
+
+encoding_cache = EncodingCache(
+    max_bytes=config.ENCODING_CACHE_MB * 1024 * 1024,
+    disk_dir=config.ENCODING_CACHE_DIR,
+    disk_max_bytes=config.ENCODING_CACHE_DISK_MB * 1024 * 1024
+)
@@ -0,0 +1,141 @@
+import importlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+from app.config import config
+
+Box = Tuple[int, int, int, int]
+
+_face_recognition = None
+
+def face_recognition_module():
+    """Import face_recognition (nạp model dlib) ở lần dùng đầu tiên, tiến trình chỉ điều phối không phải nạp"""
+    global _face_recognition
+    if _face_recognition is None:
+        _face_recognition = importlib.import_module("face_recognition")
+    return _face_recognition
+
+class FaceDetector:
+    """Phát hiện khuôn mặt, trả về bbox (top, right, bottom, left)"""
+
+    name = "base"
+    # Gom nhiều frame vào một lần gọi nhanh hơn gọi từng frame (chỉ đúng với CNN)
+    batched = False
+
+    def locate(self, image: np.ndarray, upsample: int) -> List[Box]:
+        raise NotImplementedError
+
+    def locate_batch(self, images: List[np.ndarray], upsample: int) -> List[List[Box]]:
+        return [self.locate(image, upsample) for image in images]
+
+class HogDetector(FaceDetector):
+    """HOG trên CPU: nhanh, bỏ sót mặt nghiêng hoặc nhỏ"""
+
+    name = "hog"
+
+    def locate(self, image: np.ndarray, upsample: int) -> List[Box]:
+        return face_recognition_module().face_locations(image, number_of_times_to_upsample=upsample, model="hog")
+
+class CnnDetector(FaceDetector):
+    """CNN (MMOD) của dlib: chính xác hơn HOG, chậm hơn nhiều nếu không có GPU.
+
+    Nhiều frame được phát hiện trong một lần gọi batch_face_locations; dlib yêu cầu các ảnh
+    trong một batch cùng kích thước nên frame được gom theo kích thước trước.
+    """
+
+    name = "cnn"
+    batched = True
+
+    def __init__(self, batch_size: int = config.FACE_DETECTOR_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def locate(self, image: np.ndarray, upsample: int) -> List[Box]:
+        return face_recognition_module().face_locations(image, number_of_times_to_upsample=upsample, model="cnn")
+
+    def locate_batch(self, images: List[np.ndarray], upsample: int) -> List[List[Box]]:
+        groups: Dict[tuple, List[int]] = defaultdict(list)
+        for i, image in enumerate(images):
+            groups[image.shape].append(i)
+
+        results: List[List[Box]] = [[] for _ in images]
+        for indices in groups.values():
+            if len(indices) == 1:
+                results[indices[0]] = self.locate(images[indices[0]], upsample)
+                continue
+            batch = face_recognition_module().batch_face_locations(
+                [images[i] for i in indices],
+                number_of_times_to_upsample=upsample,
+                batch_size=self.batch_size
+            )
+            for i, boxes in zip(indices, batch):
+                results[i] = list(boxes)
+        return results
+
+class FaceEncoder:
+    """Tính vector 128 chiều cho các khuôn mặt đã phát hiện trên một ảnh"""
+
+    name = "base"
+
+    def encode(self, image: np.ndarray, face_locations: List[Box]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+class DlibEncoder(FaceEncoder):
+    """ResNet của dlib; num_jitters > 1 lấy trung bình trên các bản biến đổi ngẫu nhiên (chậm hơn tương ứng).
+
+    landmark_model "small" (5 điểm) nhanh hơn, "large" (68 điểm) căn chỉnh khuôn mặt kỹ hơn.
+    """
+
+    name = "dlib"
+
+    def __init__(self, num_jitters: int = config.FACE_ENCODER_JITTERS, landmark_model: str = config.FACE_LANDMARK_MODEL):
+        if num_jitters < 1:
+            raise ValueError(f"FACE_ENCODER_JITTERS phải >= 1: {num_jitters}")
+        if landmark_model not in ("small", "large"):
+            raise ValueError(f"FACE_LANDMARK_MODEL không hợp lệ: {landmark_model}")
+        self.num_jitters = num_jitters
+        self.landmark_model = landmark_model
+
+    def encode(self, image: np.ndarray, face_locations: List[Box]) -> List[np.ndarray]:
+        return face_recognition_module().face_encodings(
+            image,
+            face_locations,
+            num_jitters=self.num_jitters,
+            model=self.landmark_model
+        )
+
+DETECTORS = {"hog": HogDetector, "cnn": CnnDetector}
+
+def create_detector(name: str = config.FACE_DETECTOR, **kwargs) -> FaceDetector:
+    if name not in DETECTORS:
+        raise ValueError(f"FACE_DETECTOR không hợp lệ: {name} (hỗ trợ: {', '.join(DETECTORS)})")
+    return DETECTORS[name](**kwargs)
+
+def detector_batches(name: str = config.FACE_DETECTOR) -> bool:
+    """Detector có lợi khi nhiều frame nằm trong một job worker; HOG xử lý từng frame nên mỗi frame một job"""
+    return getattr(DETECTORS.get(name), "batched", False)
+
+def create_encoder(**kwargs) -> FaceEncoder:
+    return DlibEncoder(**kwargs)
+
+# Backend theo cấu hình của tiến trình, tạo ở lần dùng đầu tiên (cả trong worker process)
+_detector = None
+_encoder = None
+
+def default_detector() -> FaceDetector:
+    global _detector
+    if _detector is None:
+        _detector = create_detector()
+    return _detector
+
+def default_encoder() -> FaceEncoder:
+    global _encoder
+    if _encoder is None:
+        _encoder = create_encoder()
+    return _encoder
+
+def backend_params() -> str:
+    """Mô tả backend đang dùng, encoding từ backend khác nhau không được dùng lẫn trong cache"""
+    return (
+        f"detector={config.FACE_DETECTOR};jitters={config.FACE_ENCODER_JITTERS};"
+        f"landmarks={config.FACE_LANDMARK_MODEL}"
+    )
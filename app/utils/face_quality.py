@@ -0,0 +1,97 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from app.config import config
+from app.utils.face_backends import face_recognition_module
+
+Box = Tuple[int, int, int, int]
+
+# Lý do loại khuôn mặt, theo thứ tự kiểm tra (rẻ trước, đắt sau)
+TOO_SMALL = "too_small"
+BLURRY = "blurry"
+POSE = "pose"
+
+SHARPNESS_SIZE = 64
+
+def sharpness(image: np.ndarray, face_location: Box) -> float:
+    """Phương sai Laplacian của khuôn mặt thu về SHARPNESS_SIZE x SHARPNESS_SIZE thang xám.
+
+    Thu về kích thước cố định để ngưỡng không phụ thuộc kích thước khuôn mặt;
+    ảnh mờ (chuyển động, lệch nét) có ít cạnh nên phương sai thấp.
+    """
+    top, right, bottom, left = face_location
+    height, width = image.shape[:2]
+    crop = image[max(top, 0):min(bottom, height), max(left, 0):min(right, width)]
+    if crop.size == 0:
+        return 0.0
+    gray = np.asarray(
+        Image.fromarray(crop).convert("L").resize((SHARPNESS_SIZE, SHARPNESS_SIZE), Image.BILINEAR),
+        dtype=np.float32
+    )
+    laplacian = gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1] - 4 * gray[1:-1, 1:-1]
+    return float(laplacian.var())
+
+def yaw_ratio(landmarks: dict) -> Optional[float]:
+    """Độ lệch ngang của đầu mũi so với điểm giữa hai mắt, chia cho khoảng cách hai mắt (0 = nhìn thẳng)"""
+    if not all(landmarks.get(part) for part in ("left_eye", "right_eye", "nose_tip")):
+        return None
+    left_eye = np.mean(landmarks["left_eye"], axis=0)
+    right_eye = np.mean(landmarks["right_eye"], axis=0)
+    nose = np.mean(landmarks["nose_tip"], axis=0)
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    if eye_distance == 0:
+        return None
+    return float(abs(nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance)
+
+class FaceQualityGate:
+    """Loại khuôn mặt không đáng encode trước khi gọi encoder: quá nhỏ, mờ hoặc quay ngang quá nhiều.
+
+    Kích thước và độ nét chỉ tốn vài phép tính trên bbox; landmark 5 điểm (cho kiểm tra góc mặt)
+    chỉ chạy cho các khuôn mặt đã qua hai bước đầu. Ngưỡng bằng 0 tắt bước tương ứng.
+    """
+
+    def __init__(
+        self,
+        min_size: int = config.FACE_QUALITY_MIN_SIZE,
+        min_sharpness: float = config.FACE_QUALITY_MIN_SHARPNESS,
+        max_yaw: float = config.FACE_QUALITY_MAX_YAW
+    ):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+
+    def check(self, image: np.ndarray, face_locations: List[Box]) -> List[Optional[str]]:
+        """Lý do loại cho từng khuôn mặt, None nếu khuôn mặt đạt"""
+        reasons: List[Optional[str]] = []
+        for top, right, bottom, left in face_locations:
+            if self.min_size > 0 and min(bottom - top, right - left) < self.min_size:
+                reasons.append(TOO_SMALL)
+            elif self.min_sharpness > 0 and sharpness(image, (top, right, bottom, left)) < self.min_sharpness:
+                reasons.append(BLURRY)
+            else:
+                reasons.append(None)
+
+        if self.max_yaw > 0:
+            passed = [i for i, reason in enumerate(reasons) if reason is None]
+            if passed:
+                all_landmarks = face_recognition_module().face_landmarks(
+                    image, [face_locations[i] for i in passed], model="small"
+                )
+                for i, landmarks in zip(passed, all_landmarks):
+                    ratio = yaw_ratio(landmarks)
+                    if ratio is not None and ratio > self.max_yaw:
+                        reasons[i] = POSE
+        return reasons
+
+    def params(self) -> str:
+        """Mô tả ngưỡng đang dùng, kết quả với ngưỡng khác không được dùng lẫn trong cache"""
+        return f"quality_size={self.min_size};quality_sharpness={self.min_sharpness};quality_yaw={self.max_yaw}"
+
+# Ngưỡng theo cấu hình của tiến trình, tạo ở lần dùng đầu tiên (cả trong worker process)
+_gate = None
+
+def default_quality_gate() -> FaceQualityGate:
+    global _gate
+    if _gate is None:
+        _gate = FaceQualityGate()
+    return _gate
@@ -1,28 +1,126 @@
+import io
 import os
+import time
 import numpy as np
-import face_recognition
+from PIL import Image
 from fastapi import HTTPException
-from typing import List, Tuple
+from app.config import config
+from typing import List, Optional, Tuple, Union
+from app.utils.box_utils import match_boxes, scale_boxes
+from app.utils.face_backends import FaceDetector, FaceEncoder, backend_params, default_detector, default_encoder
+from app.utils.face_quality import FaceQualityGate, default_quality_gate
+from app.utils.metrics import timed
 
-def get_average_face_encoding(image_path: str, face_location: Tuple[int, int, int, int] = None) -> list[float]:
+# Ảnh đầu vào: đường dẫn file, bytes đọc từ upload hoặc mảng RGB đã giải mã
+ImageSource = Union[str, bytes, np.ndarray]
+
+def resize_image(image: np.ndarray, scale: float) -> np.ndarray:
+    height, width = image.shape[:2]
+    size = (max(int(width * scale), 1), max(int(height * scale), 1))
+    return np.array(Image.fromarray(image).resize(size, Image.BILINEAR))
+
+def decode_image(image: ImageSource, max_size: int = config.MAX_INPUT_SIZE) -> Tuple[np.ndarray, float]:
+    """Giải mã ảnh thành mảng RGB, thu nhỏ một lần nếu cạnh dài vượt quá max_size.
+
+    Trả về (ảnh, tỉ lệ đã thu nhỏ so với ảnh gốc) để quy đổi bbox về toạ độ gốc.
+    """
+    with timed("decode"):
+        return _decode_image(image, max_size)
+
+def _decode_image(image: ImageSource, max_size: int) -> Tuple[np.ndarray, float]:
+    if isinstance(image, np.ndarray):
+        decoded = image
+        longest = max(image.shape[:2])
+    else:
+        source = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+        with Image.open(source) as pil_image:
+            longest = max(pil_image.size)
+            if max_size > 0 and longest > max_size:
+                # JPEG được giải mã trực tiếp ở độ phân giải thấp hơn (1/2, 1/4, 1/8)
+                pil_image.draft("RGB", (max_size, max_size))
+            decoded = np.array(pil_image.convert("RGB"))
+
+    if max_size > 0 and max(decoded.shape[:2]) > max_size:
+        decoded = resize_image(decoded, max_size / max(decoded.shape[:2]))
+    return decoded, max(decoded.shape[:2]) / longest
+
+def load_image(image: ImageSource) -> np.ndarray:
+    """Giải mã ảnh thành mảng RGB, đọc trực tiếp từ bộ nhớ nếu đầu vào là bytes"""
+    return decode_image(image)[0]
+
+def locate_faces(
+    image: np.ndarray,
+    scale: float = config.DETECTION_SCALE,
+    upsample: int = config.DETECTION_UPSAMPLE,
+    detector: FaceDetector = None
+) -> List[Tuple[int, int, int, int]]:
+    """Phát hiện khuôn mặt trên bản thu nhỏ của ảnh rồi quy đổi bbox về toạ độ của image"""
+    return locate_faces_batch([image], scale, upsample, detector)[0]
+
+def locate_faces_batch(
+    images: List[np.ndarray],
+    scale: float = config.DETECTION_SCALE,
+    upsample: int = config.DETECTION_UPSAMPLE,
+    detector: FaceDetector = None
+) -> List[List[Tuple[int, int, int, int]]]:
+    """Phát hiện khuôn mặt trên nhiều ảnh trong một lần gọi detector (CNN xử lý cả batch)"""
+    detector = detector or default_detector()
+    with timed("detect"):
+        if scale >= 1.0:
+            return detector.locate_batch(images, upsample)
+        small_locations = detector.locate_batch([resize_image(image, scale) for image in images], upsample)
+        return [
+            scale_boxes(locations, 1 / scale, image.shape[1], image.shape[0])
+            for image, locations in zip(images, small_locations)
+        ]
+
+def read_image_files(path: str) -> List[bytes]:
+    """Đọc nội dung một file ảnh hoặc tất cả file ảnh trong thư mục"""
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(path, filename)
+            for filename in sorted(os.listdir(path))
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg'))
+        ]
+    else:
+        paths = [path]
+    contents = []
+    for file_path in paths:
+        with open(file_path, "rb") as f:
+            contents.append(f.read())
+    return contents
+
+def first_face_encodings(detections: List[Optional[Tuple[list, list]]]) -> List[list[float]]:
+    """Encoding của khuôn mặt đầu tiên trong mỗi ảnh đã detect/encode (mỗi ảnh một template)"""
+    encodings = [list(detection[1][0]) for detection in detections if detection and detection[1]]
+    if not encodings:
+        raise HTTPException(status_code=400, detail="Không tìm thấy khuôn mặt trong ảnh")
+    return encodings
+
+def average_first_faces(detections: List[Optional[Tuple[list, list]]]) -> list[float]:
+    """Encoding trung bình của khuôn mặt đầu tiên trong mỗi ảnh đã detect/encode"""
+    return list(np.mean(first_face_encodings(detections), axis=0))
+
+def get_average_face_encoding(image: ImageSource, face_location: Tuple[int, int, int, int] = None) -> list[float]:
     """Lấy encoding trung bình từ tất cả ảnh trong thư mục hoặc từ một khuôn mặt cụ thể"""
     encodings = []
     
-    if os.path.isdir(image_path):
-        for filename in os.listdir(image_path):
+    if isinstance(image, str) and os.path.isdir(image):
+        # Enroll từ thư mục: mỗi file ảnh là một mẫu của cùng một người
+        for filename in os.listdir(image):
             if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                image = face_recognition.load_image_file(os.path.join(image_path, filename))
-                face_encodings = face_recognition.face_encodings(image)
+                face_image = load_image(os.path.join(image, filename))
+                face_encodings = encode_faces(face_image, locate_faces(face_image)[:1])
                 if face_encodings:
                     encodings.append(face_encodings[0])
     else:
-        image = face_recognition.load_image_file(image_path)
+        image, input_scale = decode_image(image)
         if face_location:
-            # Lấy encoding từ khuôn mặt cụ thể
-            face_encodings = face_recognition.face_encodings(image, [face_location])
+            # Lấy encoding từ khuôn mặt cụ thể (toạ độ theo ảnh gốc)
+            face_encodings = encode_faces(image, scale_boxes([face_location], input_scale))
         else:
             # Lấy encoding từ khuôn mặt đầu tiên
-            face_encodings = face_recognition.face_encodings(image)
+            face_encodings = encode_faces(image, locate_faces(image)[:1])
         if face_encodings:
             encodings.append(face_encodings[0])
     
@@ -31,11 +129,158 @@ def get_average_face_encoding(image_path: str, face_location: Tuple[int, int, in
     
     return list(np.mean(encodings, axis=0))
 
-def detect_faces(image_path: str) -> List[Tuple[int, int, int, int]]:
+def detect_faces(image: ImageSource) -> List[Tuple[int, int, int, int]]:
     """Phát hiện tất cả khuôn mặt trong ảnh và trả về vị trí của chúng"""
     try:
-        image = face_recognition.load_image_file(image_path)
-        face_locations = face_recognition.face_locations(image)
-        return face_locations
+        image, input_scale = decode_image(image)
+        return scale_boxes(locate_faces(image), 1 / input_scale)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi khi phát hiện khuôn mặt: {str(e)}")
+
+def encode_faces(
+    image: np.ndarray,
+    face_locations: List[Tuple[int, int, int, int]],
+    encoder: FaceEncoder = None
+) -> List[list[float]]:
+    """Tính encoding cho tất cả khuôn mặt đã phát hiện trong một lần gọi encoder"""
+    if not face_locations:
+        return []
+    with timed("encode"):
+        face_encodings = (encoder or default_encoder()).encode(image, face_locations)
+        return [list(encoding) for encoding in face_encodings]
+
+def detect_and_encode_faces(image: ImageSource) -> Tuple[List[Tuple[int, int, int, int]], List[list[float]]]:
+    """Giải mã ảnh một lần, phát hiện tất cả khuôn mặt và tính encoding cho từng khuôn mặt"""
+    try:
+        image, input_scale = decode_image(image)
+        face_locations = locate_faces(image)
+        return scale_boxes(face_locations, 1 / input_scale), encode_faces(image, face_locations)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Lỗi khi phát hiện khuôn mặt: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Lỗi khi phát hiện khuôn mặt: {str(e)}")
+
+def detect_and_encode_untracked_faces(
+    image: ImageSource,
+    tracked_boxes: List[Tuple[int, int, int, int]],
+    iou_threshold: float,
+    quality_gate: FaceQualityGate = None
+) -> Tuple[List[Tuple[int, int, int, int]], List[Optional[list[float]]], List[Optional[int]], List[Optional[str]]]:
+    """Phát hiện khuôn mặt nhưng chỉ encode những khuôn mặt không trùng với bbox đang được theo dõi.
+
+    Trả về (face_locations, encodings, tracked, rejected): encodings[i] là None và tracked[i]
+    là chỉ số trong tracked_boxes nếu khuôn mặt i được dùng lại danh tính cũ; rejected[i] là
+    lý do nếu khuôn mặt i không qua quality_gate (khi đó cũng không được encode).
+    """
+    try:
+        image, input_scale = decode_image(image)
+        return _encode_untracked_faces(image, input_scale, locate_faces(image), tracked_boxes, iou_threshold, quality_gate)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi khi phát hiện khuôn mặt: {str(e)}")
+
+def _encode_untracked_faces(
+    image: np.ndarray,
+    input_scale: float,
+    face_locations: List[Tuple[int, int, int, int]],
+    tracked_boxes: List[Tuple[int, int, int, int]],
+    iou_threshold: float,
+    quality_gate: FaceQualityGate = None
+) -> Tuple[List[Tuple[int, int, int, int]], List[Optional[list[float]]], List[Optional[int]], List[Optional[str]]]:
+    # bbox trả về và bbox đang theo dõi đều theo toạ độ ảnh gốc
+    original_locations = scale_boxes(face_locations, 1 / input_scale)
+    tracked = match_boxes(original_locations, tracked_boxes, iou_threshold)
+    untracked = [i for i, match in enumerate(tracked) if match is None]
+    rejected: List[Optional[str]] = [None] * len(face_locations)
+    if quality_gate is not None and untracked:
+        # Khuôn mặt đang theo dõi dùng lại danh tính nên không cần kiểm tra
+        with timed("quality"):
+            reasons = quality_gate.check(image, [face_locations[i] for i in untracked])
+        for i, reason in zip(untracked, reasons):
+            rejected[i] = reason
+    new_indices = [i for i in untracked if rejected[i] is None]
+    new_encodings = dict(zip(new_indices, encode_faces(image, [face_locations[i] for i in new_indices])))
+    encodings = [new_encodings.get(i) for i in range(len(face_locations))]
+    return original_locations, encodings, tracked, rejected
+
+def _detection_region(
+    image: np.ndarray,
+    input_scale: float,
+    region: Optional[Tuple[Tuple[int, int, int, int], List[Tuple[int, int, int, int]]]]
+) -> Tuple[np.ndarray, Tuple[int, int], List[Tuple[int, int, int, int]]]:
+    """Phần ảnh cần phát hiện, độ lệch (top, left) của nó và các bbox giữ nguyên, theo toạ độ ảnh đã giải mã"""
+    if region is None:
+        return image, (0, 0), []
+    roi, carried = region
+    top, right, bottom, left = scale_boxes([roi], input_scale, image.shape[1], image.shape[0])[0]
+    return image[top:bottom, left:right], (top, left), scale_boxes(carried, input_scale, image.shape[1], image.shape[0])
+
+def _locate_in_regions(inputs: List[tuple]) -> List[List[Tuple[int, int, int, int]]]:
+    """Phát hiện trên các phần ảnh từ _detection_region rồi quy bbox về toạ độ ảnh đã giải mã"""
+    all_locations = locate_faces_batch([image for image, _, _ in inputs])
+    return [
+        [(top + dy, right + dx, bottom + dy, left + dx) for top, right, bottom, left in locations] + carried
+        for (_, (dy, dx), carried), locations in zip(inputs, all_locations)
+    ]
+
+def detect_and_encode_faces_batch(
+    images: List[ImageSource],
+    tracked_boxes: List[Optional[List[Tuple[int, int, int, int]]]] = None,
+    iou_threshold: float = 0.5,
+    quality: bool = False,
+    regions: List[Optional[Tuple[Tuple[int, int, int, int], List[Tuple[int, int, int, int]]]]] = None
+) -> List[Optional[Tuple[List[Tuple[int, int, int, int]], List[Optional[list[float]]], List[Optional[int]], List[Optional[str]]]]]:
+    """Xử lý nhiều frame trong một job; frame lỗi trả về None thay vì làm hỏng cả batch.
+
+    Các frame giải mã được phát hiện khuôn mặt trong một lần gọi detector để backend CNN chạy theo batch.
+    quality=True kiểm tra chất lượng (FACE_QUALITY_*) trước khi encode, dùng khi nhận diện.
+    regions[i] = (roi, carried) giới hạn phát hiện trong roi và thêm nguyên các bbox carried (toạ độ ảnh gốc).
+    """
+    if tracked_boxes is None:
+        tracked_boxes = [None] * len(images)
+    if regions is None:
+        regions = [None] * len(images)
+    quality_gate = default_quality_gate() if quality else None
+    decoded = []
+    for image in images:
+        try:
+            decoded.append(decode_image(image))
+        except Exception:
+            decoded.append(None)
+
+    valid = [i for i, item in enumerate(decoded) if item is not None]
+    inputs = {i: _detection_region(decoded[i][0], decoded[i][1], regions[i]) for i in valid}
+    try:
+        locations = dict(zip(valid, _locate_in_regions([inputs[i] for i in valid])))
+    except Exception:
+        # Một frame làm hỏng cả batch: phát hiện lại từng frame để chỉ bỏ frame lỗi
+        locations = {}
+        for i in valid:
+            try:
+                locations[i] = _locate_in_regions([inputs[i]])[0]
+            except Exception:
+                pass
+
+    results = []
+    for i, boxes in enumerate(tracked_boxes):
+        if i not in locations:
+            results.append(None)
+            continue
+        image, input_scale = decoded[i]
+        try:
+            results.append(_encode_untracked_faces(image, input_scale, locations[i], boxes or [], iou_threshold, quality_gate))
+        except Exception:
+            results.append(None)
+    return results
+
+def detection_params() -> str:
+    """Chuỗi mô tả tham số phát hiện/encode, dùng làm một phần khóa cache"""
+    return (
+        f"scale={config.DETECTION_SCALE};upsample={config.DETECTION_UPSAMPLE};max_size={config.MAX_INPUT_SIZE};"
+        f"{backend_params()}"
+    )
+
+def warm_up() -> float:
+    """Chạy detect và encode một lần trên ảnh nhỏ để nạp model trước request đầu tiên, trả về số giây"""
+    start = time.perf_counter()
+    image = np.zeros((160, 160, 3), dtype=np.uint8)
+    locate_faces(image)
+    encode_faces(image, [(20, 140, 140, 20)])
+    return time.perf_counter() - start
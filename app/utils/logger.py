@@ -0,0 +1,40 @@
+import json
+import logging
+import sys
+from app.config import config
+
+# Thuộc tính có sẵn của LogRecord; các trường khác (truyền qua extra=...) được ghi riêng trong log JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Mỗi bản ghi là một dòng JSON, kèm các trường truyền qua extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging(level: str = config.LOG_LEVEL, log_format: str = config.LOG_FORMAT):
+    """Cấu hình logger "app" một lần cho cả tiến trình (kể cả worker process)"""
+    logger = logging.getLogger("app")
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(name)
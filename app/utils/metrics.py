@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Bucket (giây) cho thời gian từng giai đoạn nhận diện
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["Metric"] = []
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class Metric:
+    """Metric theo định dạng text của Prometheus, giá trị tách theo bộ nhãn"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        return iter(())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, list(zip(self.labelnames, key)), value
+
+class Gauge(Metric):
+    """Gauge đặt giá trị trực tiếp, hoặc đọc từ function tại thời điểm scrape"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float] = None):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self):
+        yield self.name, [], self._function() if self._function else self._value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Mỗi bộ nhãn: [số lần rơi vào từng bucket (không cộng dồn) + bucket +Inf, tổng, số lần]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + [("le", _format_value(bound))], cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+def render_metrics() -> str:
+    """Toàn bộ metric đã đăng ký theo định dạng text exposition của Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+stage_seconds = Histogram(
+    "face_stage_seconds",
+    "Thời gian từng giai đoạn nhận diện (upload_read, decode, detect, quality, encode, vector_search, serialize)",
+    ["stage"]
+)
+faces_per_frame = Histogram(
+    "face_faces_per_frame",
+    "Số khuôn mặt phát hiện trong mỗi frame",
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32)
+)
+face_matches = Counter(
+    "face_matches_total",
+    "Số khuôn mặt nhận diện được (match), không (unknown) hoặc bị loại trước khi encode (rejected)",
+    ["result"]
+)
+faces_encoded = Counter("face_encoded_total", "Số khuôn mặt đã encode")
+quality_rejections = Counter("face_quality_rejected_total", "Số khuôn mặt bị loại trước khi encode theo lý do", ["reason"])
+
+def _encoder_seconds_saved() -> float:
+    # Thời gian encode trung bình mỗi khuôn mặt nhân với số khuôn mặt đã bỏ qua
+    encoded = faces_encoded.value()
+    if not encoded:
+        return 0.0
+    rejected = sum(value for _, _, value in quality_rejections.samples())
+    return rejected * stage_seconds.sum(stage="encode") / encoded
+
+encoder_seconds_saved = Gauge(
+    "face_quality_encoder_seconds_saved",
+    "Ước tính thời gian encode tiết kiệm được nhờ loại khuôn mặt kém chất lượng",
+    _encoder_seconds_saved
+)
+
+# Bộ đệm thời gian của job worker đang chạy trên thread hiện tại
+_capture = threading.local()
+
+@contextmanager
+def timed(stage: str):
+    """Đo thời gian một giai đoạn.
+
+    Trong job của worker pool, thời gian được giữ lại để trả về tiến trình chính cùng kết quả
+    (histogram của worker process không được scrape); ngoài ra ghi thẳng vào histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        buffer = getattr(_capture, "timings", None)
+        if buffer is not None:
+            buffer.append((stage, elapsed))
+        else:
+            stage_seconds.observe(elapsed, stage=stage)
+
+def begin_stage_capture():
+    _capture.timings = []
+
+def end_stage_capture() -> List[Tuple[str, float]]:
+    timings = getattr(_capture, "timings", None) or []
+    _capture.timings = None
+    return timings
+
+def record_stage_timings(timings: List[Tuple[str, float]]):
+    for stage, elapsed in timings:
+        stage_seconds.observe(elapsed, stage=stage)
@@ -0,0 +1,92 @@
+"""Đo tốc độ ghi sự kiện chấm công liên tục và độ trễ truy vấn khi store đã có nhiều sự kiện.
+
+Sự kiện được sinh cho --users người rải đều trong --days ngày và đưa vào AttendanceRecorder
+(cửa sổ chống trùng 0 để mọi sự kiện đều được ghi) từ --producers thread. Tốc độ ghi tính
+đến khi thread nền đã ghi xong toàn bộ hàng đợi. Sau đó đo truy vấn theo người trong một
+ngày, một trang sự kiện của một ngày và bảng tổng hợp theo ngày.
+
+Ví dụ:
+    python -m benchmarks.bench_attendance --events 1000000 --flush-sizes 100 500 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app.services.attendance_service import AttendanceRecorder, AttendanceStore, day_range
+
+FIRST_DAY = "2024-01-01"
+
+
+def ingest(store: AttendanceStore, events: np.ndarray, producers: int, flush_size: int) -> float:
+    recorder = AttendanceRecorder(store, dedup_seconds=0, min_score=0, flush_size=flush_size, queue_size=len(events))
+    recorder.start()
+    chunks = np.array_split(events, producers)
+
+    def produce(chunk):
+        for user, timestamp in chunk:
+            recorder.record(f"user-{int(user)}", f"user {int(user)}", 0.95, "live", float(timestamp))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.flush()
+    elapsed = time.perf_counter() - start
+    recorder.stop()
+    return len(events) / elapsed
+
+
+def time_query(fn, repeat: int) -> str:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return f"{statistics.median(timings):>8.2f} {float(np.percentile(timings, 99)):>8.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--flush-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    first_start, _ = day_range(FIRST_DAY)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'flush size':>10} {'events':>9} {'events/s':>10}")
+        for flush_size in args.flush_sizes:
+            store = AttendanceStore(os.path.join(directory, f"ingest_{flush_size}.db"))
+            events = np.column_stack([
+                rng.integers(0, args.users, args.events),
+                np.sort(first_start + rng.random(args.events) * args.days * 86400)
+            ])
+            print(f"{flush_size:>10} {args.events:>9} {ingest(store, events, args.producers, flush_size):>10.0f}")
+
+        # Truy vấn trên store lớn nhất vừa ghi
+        store = AttendanceStore(os.path.join(directory, f"ingest_{args.flush_sizes[-1]}.db"))
+        day = time.strftime("%Y-%m-%d", time.localtime(first_start + args.days // 2 * 86400))
+        start, end = day_range(day)
+        users = [f"user-{int(user)}" for user in rng.integers(0, args.users, args.repeat)]
+        user_iter = iter(users * 2)
+        print(f"\n{'query':>24} {'p50 ms':>8} {'p99 ms':>8}")
+        print(f"{'user in one day':>24} {time_query(lambda: store.query(next(user_iter), start, end), args.repeat)}")
+        print(f"{'user all time':>24} {time_query(lambda: store.query(next(user_iter), limit=1000), args.repeat)}")
+        print(f"{'day page (1000)':>24} {time_query(lambda: store.query(start=start, end=end, limit=1000), args.repeat)}")
+        print(f"{'day summary':>24} {time_query(lambda: store.daily_summary(day), min(args.repeat, 10))}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
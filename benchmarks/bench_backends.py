@@ -0,0 +1,101 @@
+"""So sánh các backend detector/encoder: thời gian mỗi frame, recall phát hiện và độ lệch encoding.
+
+Detector được đo theo từng frame và theo batch (--batch frame mỗi lần gọi, CNN dùng
+batch_face_locations); recall tính so với detector --reference với IoU >= --iou.
+Encoder (số jitter, model landmark) được đo trên bbox của detector tham chiếu; độ lệch
+là khoảng cách L2 trung bình so với encoder mặc định (1 jitter, landmark "small"), nên
+so với ngưỡng khớp của ứng dụng.
+
+Ví dụ:
+    python -m benchmarks.bench_backends --images path/to/frames --batch 8
+    python -m benchmarks.bench_backends --images frames --detectors hog --jitters 1 5 10 --landmarks small large
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.config import config
+from app.utils.box_utils import match_boxes
+from app.utils.face_backends import DETECTORS, create_detector, create_encoder
+from benchmarks.bench_detection_scale import load_image_set
+
+
+def time_ms(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Thư mục frame cố định (nên cùng kích thước để CNN chạy theo batch)")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTORS), default=list(DETECTORS))
+    parser.add_argument("--reference", choices=list(DETECTORS), default="cnn", help="Detector dùng làm chuẩn để tính recall")
+    parser.add_argument("--upsample", type=int, default=config.DETECTION_UPSAMPLE)
+    parser.add_argument("--batch", type=int, default=8, help="Số frame mỗi lần gọi ở chế độ batch")
+    parser.add_argument("--jitters", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--landmarks", nargs="+", choices=["small", "large"], default=["small", "large"])
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = [image for _, image in load_image_set(args.images)]
+    if not images:
+        parser.error(f"Không có ảnh trong {args.images}")
+
+    reference_detector = create_detector(args.reference)
+    reference = [reference_detector.locate(image, args.upsample) for image in images]
+    total_faces = sum(len(boxes) for boxes in reference)
+    print(f"{len(images)} frame, {total_faces} khuôn mặt theo {args.reference}")
+
+    print(f"{'detector':>9} {'mode':>6} {'ms/frame':>9} {'p50 ms':>8} {'recall':>7} {'extra':>6}")
+    for name in args.detectors:
+        detector = create_detector(name)
+        detector.locate(images[0], args.upsample)
+        found = extra = 0
+        for image, expected in zip(images, reference):
+            boxes = detector.locate(image, args.upsample)
+            matched = sum(match is not None for match in match_boxes(expected, boxes, args.iou))
+            found += matched
+            extra += len(boxes) - matched
+        recall = found / total_faces if total_faces else 1.0
+
+        single = [t for image in images for t in time_ms(lambda: detector.locate(image, args.upsample), args.repeat)]
+        batches = [images[start:start + args.batch] for start in range(0, len(images), args.batch)]
+        batched = []
+        for batch in batches:
+            batched.extend(t / len(batch) for t in time_ms(lambda: detector.locate_batch(batch, args.upsample), args.repeat))
+        for mode, timings in (("frame", single), ("batch", batched)):
+            print(
+                f"{name:>9} {mode:>6} {statistics.mean(timings):>9.1f} {statistics.median(timings):>8.1f} "
+                f"{recall:>7.3f} {extra:>6}"
+            )
+
+    faces = [(image, [box]) for image, boxes in zip(images, reference) for box in boxes]
+    if not faces:
+        return
+    baseline_encoder = create_encoder(num_jitters=1, landmark_model="small")
+    baseline = [np.asarray(baseline_encoder.encode(image, boxes)[0]) for image, boxes in faces]
+
+    print(f"\n{'jitters':>8} {'landmarks':>10} {'ms/face':>8} {'p50 ms':>8} {'L2 drift':>9}")
+    for landmark_model in args.landmarks:
+        for num_jitters in args.jitters:
+            encoder = create_encoder(num_jitters=num_jitters, landmark_model=landmark_model)
+            timings = []
+            drift = []
+            for (image, boxes), expected in zip(faces, baseline):
+                timings.extend(time_ms(lambda: encoder.encode(image, boxes), args.repeat))
+                drift.append(float(np.linalg.norm(np.asarray(encoder.encode(image, boxes)[0]) - expected)))
+            print(
+                f"{num_jitters:>8} {landmark_model:>10} {statistics.mean(timings):>8.1f} "
+                f"{statistics.median(timings):>8.1f} {statistics.mean(drift):>9.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""So sánh recall@1 và độ trễ tìm kiếm giữa các cấu hình lưu trữ của collection.
+
+Mỗi cấu hình (lượng tử hóa int8, HNSW m/ef_construct, on-disk, ef khi tìm kiếm) được
+dựng thành một collection riêng từ cùng gallery ngẫu nhiên; recall@1 so với kết quả
+tìm kiếm chính xác bằng numpy. Chế độ --qdrant memory của qdrant-client luôn tìm kiếm
+chính xác và bỏ qua HNSW/quantization, nên chỉ có ý nghĩa khi chạy với server thật.
+
+Ví dụ:
+    python -m benchmarks.bench_collection_config --sizes 10000 100000 --qdrant server
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.config import config
+from app.services.qdrant_service import collection_params, search_params
+from benchmarks.bench_local_index import run_queries
+
+COLLECTION = "bench_collection_config"
+
+# (tên, tham số collection_params, danh sách ef khi tìm kiếm)
+CONFIGS = [
+    ("float32 m16", {"quantization": "none", "hnsw_m": 16, "ef_construct": 100}, [0, 128]),
+    ("float32 m32", {"quantization": "none", "hnsw_m": 32, "ef_construct": 200}, [0, 128]),
+    ("int8 m16", {"quantization": "int8", "hnsw_m": 16, "ef_construct": 100}, [0, 128]),
+    ("int8 m16 disk", {"quantization": "int8", "hnsw_m": 16, "ef_construct": 100, "on_disk": True}, [0, 128]),
+]
+
+
+def build_collection(client: QdrantClient, params: dict, gallery: np.ndarray, ids: list[str], batch_size: int = 1000):
+    client.recreate_collection(
+        collection_name=COLLECTION,
+        # Gallery nhỏ vẫn được dựng HNSW thay vì chỉ quét tuần tự
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1000),
+        **collection_params(**params)
+    )
+    for start in range(0, len(gallery), batch_size):
+        client.upsert(
+            collection_name=COLLECTION,
+            points=models.Batch(ids=ids[start:start + batch_size], vectors=gallery[start:start + batch_size].tolist()),
+            wait=True
+        )
+    # Đợi optimizer dựng xong index trước khi đo
+    while client.get_collection(COLLECTION).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--qdrant", choices=["memory", "server"], default="server")
+    args = parser.parse_args()
+
+    if args.qdrant == "memory":
+        client = QdrantClient(":memory:")
+    else:
+        client = QdrantClient(host=config.QDRANT_HOST, port=config.QDRANT_PORT, timeout=120.0)
+
+    rng = np.random.default_rng(42)
+    print(f"{'size':>8} {'config':>16} {'ef':>5} {'recall@1':>9} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>8}")
+    for size in args.sizes:
+        gallery = rng.normal(size=(size, 128)).astype(np.float32)
+        ids = [str(uuid.uuid4()) for _ in range(size)]
+        queries = gallery[rng.integers(0, size, args.queries)] + rng.normal(scale=0.3, size=(args.queries, 128)).astype(np.float32)
+        normalized = gallery / np.linalg.norm(gallery, axis=1, keepdims=True)
+        expected = [ids[row] for row in np.argmax(queries @ normalized.T, axis=1)]
+
+        for name, params, ef_values in CONFIGS:
+            build_collection(client, params, gallery, ids)
+            for ef in ef_values:
+                params_for_search = search_params(quantization=params["quantization"], hnsw_ef=ef)
+                found = []
+
+                def search(query):
+                    result = client.search(
+                        collection_name=COLLECTION,
+                        query_vector=query.tolist(),
+                        search_params=params_for_search,
+                        limit=1,
+                        with_payload=False
+                    )
+                    found.append(str(result[0].id) if result else None)
+
+                result = run_queries(search, queries)
+                recall = sum(a == b for a, b in zip(found, expected)) / len(expected)
+                print(
+                    f"{size:>8} {name:>16} {ef or 'auto':>5} {recall:>9.3f} "
+                    f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['qps']:>8.0f}"
+                )
+        client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Đo độ trễ và recall của phát hiện khuôn mặt ở nhiều tỉ lệ thu nhỏ.
+
+Recall được tính so với kết quả phát hiện ở độ phân giải gốc (scale 1.0,
+upsample mặc định): một khuôn mặt tham chiếu được tính là tìm thấy nếu có bbox
+với IoU >= --iou sau khi quy đổi về toạ độ gốc.
+
+Ví dụ:
+    python -m benchmarks.bench_detection_scale --images path/to/frames --scales 1.0 0.75 0.5 0.25
+"""
+import argparse
+import os
+import statistics
+import time
+
+from app.config import config
+from app.utils.box_utils import match_boxes
+from app.utils.face_utils import decode_image, locate_faces
+
+
+def load_image_set(directory: str) -> list:
+    images = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            image, _ = decode_image(os.path.join(directory, filename), max_size=0)
+            images.append((filename, image))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Thư mục ảnh cố định dùng để đo")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.25])
+    parser.add_argument("--upsample", type=int, nargs="+", default=[config.DETECTION_UPSAMPLE])
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_image_set(args.images)
+    if not images:
+        parser.error(f"Không có ảnh trong {args.images}")
+    reference = {filename: locate_faces(image, scale=1.0, upsample=config.DETECTION_UPSAMPLE) for filename, image in images}
+    total_faces = sum(len(boxes) for boxes in reference.values())
+    print(f"{len(images)} ảnh, {total_faces} khuôn mặt tham chiếu")
+
+    print(f"{'scale':>6} {'upsample':>9} {'p50 ms':>8} {'mean ms':>8} {'recall':>7} {'extra':>6}")
+    for upsample in args.upsample:
+        for scale in args.scales:
+            timings = []
+            found = 0
+            extra = 0
+            for filename, image in images:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    boxes = locate_faces(image, scale=scale, upsample=upsample)
+                    timings.append((time.perf_counter() - start) * 1000)
+                matches = match_boxes(reference[filename], boxes, args.iou)
+                found += sum(match is not None for match in matches)
+                extra += len(boxes) - sum(match is not None for match in matches)
+            recall = found / total_faces if total_faces else 1.0
+            print(f"{scale:>6.2f} {upsample:>9} {statistics.median(timings):>8.1f} {statistics.mean(timings):>8.1f} {recall:>7.3f} {extra:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""So sánh độ trễ và QPS tìm kiếm giữa LocalFaceIndex và Qdrant.
+
+Gallery là các encoding 128 chiều ngẫu nhiên. Qdrant có thể là server thật
+(--qdrant server, dùng QDRANT_HOST/QDRANT_PORT trong config) hoặc chế độ
+in-memory của qdrant-client (--qdrant memory).
+
+Ví dụ:
+    python -m benchmarks.bench_local_index --sizes 1000 10000 100000 --qdrant server
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.config import config
+from app.services.local_index import LocalFaceIndex
+
+COLLECTION = "bench_local_index"
+
+
+def percentile(timings: list[float], q: float) -> float:
+    return float(np.percentile(timings, q))
+
+
+def run_queries(search, queries: np.ndarray) -> dict:
+    timings = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        search(query)
+        timings.append((time.perf_counter() - query_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(timings),
+        "p99_ms": percentile(timings, 99),
+        "qps": len(queries) / elapsed
+    }
+
+
+def build_qdrant(mode: str, gallery: np.ndarray, batch_size: int = 1000) -> QdrantClient:
+    if mode == "memory":
+        client = QdrantClient(":memory:")
+    else:
+        client = QdrantClient(host=config.QDRANT_HOST, port=config.QDRANT_PORT, timeout=60.0)
+    client.recreate_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=gallery.shape[1], distance=models.Distance.COSINE)
+    )
+    for start in range(0, len(gallery), batch_size):
+        chunk = gallery[start:start + batch_size]
+        client.upsert(
+            collection_name=COLLECTION,
+            points=models.Batch(
+                ids=[str(uuid.uuid4()) for _ in chunk],
+                vectors=chunk.tolist(),
+                payloads=[{"name": f"user {start + i}"} for i in range(len(chunk))]
+            ),
+            wait=True
+        )
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--qdrant", choices=["none", "memory", "server"], default="none")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'size':>8} {'backend':>8} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>10}")
+    for size in args.sizes:
+        gallery = rng.normal(size=(size, 128)).astype(np.float32)
+        queries = gallery[rng.integers(0, size, args.queries)] + rng.normal(scale=0.05, size=(args.queries, 128)).astype(np.float32)
+
+        index = LocalFaceIndex()
+        index.add_many([str(i) for i in range(size)], [f"user {i}" for i in range(size)], gallery)
+        rows = [("local", run_queries(index.search_one, queries))]
+
+        if args.qdrant != "none":
+            client = build_qdrant(args.qdrant, gallery)
+            rows.append(("qdrant", run_queries(
+                lambda query: client.search(collection_name=COLLECTION, query_vector=query.tolist(), limit=1),
+                queries
+            )))
+            client.delete_collection(COLLECTION)
+
+        for backend, result in rows:
+            print(f"{size:>8} {backend:>8} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['qps']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
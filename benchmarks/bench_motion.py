@@ -0,0 +1,117 @@
+"""Đo số frame được motion gate bỏ qua và thời gian CPU tiết kiệm được theo loại cảnh.
+
+Mỗi cảnh là một chuỗi frame JPEG (--frames frame, kích thước --size) dựng từ ảnh nền
+(--background hoặc nền tổng hợp) và ảnh khuôn mặt (--face hoặc một hình oval tổng hợp):
+  idle    không có ai, nền đứng yên, chỉ có nhiễu cảm biến và nhiễu nén
+  person  một người đứng trước camera, chỉ lắc nhẹ trong một vùng nhỏ
+  busy    camera lia liên tục và nhiều người đi qua, toàn bộ frame thay đổi
+Mỗi frame chạy như một phiên WebSocket: không có gate (giải mã, phát hiện, encode mọi frame)
+và có gate (so sánh ảnh thu nhỏ, bỏ qua hoặc chỉ phát hiện vùng thay đổi). Thời gian là CPU
+time của tiến trình (time.process_time), không tính thời gian chờ.
+
+Ví dụ:
+    python -m benchmarks.bench_motion --frames 200 --size 640 480
+    python -m benchmarks.bench_motion --background lobby.jpg --face person.jpg --scenes idle person
+"""
+import argparse
+import io
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+from app.services.motion_gate import SKIPPED, MotionGate
+from app.utils.face_utils import detect_and_encode_faces_batch
+
+
+def jpeg(image: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def load_rgb(path: str, size) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.array(image.convert("RGB").resize(size, Image.BILINEAR))
+
+
+def scene_frames(scene: str, background: np.ndarray, face: np.ndarray, count: int, rng) -> list:
+    height, width = background.shape[:2]
+    size = face.shape[0]
+    frames = []
+    for i in range(count):
+        if scene == "busy":
+            frame = np.roll(background, shift=(i * 40) % width, axis=1)
+            for _ in range(4):
+                top, left = rng.integers(0, height - size), rng.integers(0, width - size)
+                frame[top:top + size, left:left + size] = face
+        else:
+            frame = background.copy()
+        if scene == "person":
+            # Người đứng giữa khung hình, lắc ngang vài pixel mỗi frame
+            top, left = (height - size) // 2, (width - size) // 2 + int(10 * np.sin(i / 3))
+            frame[top:top + size, left:left + size] = face
+        noise = rng.normal(0, 2, frame.shape)
+        frames.append(jpeg(np.clip(frame + noise, 0, 255).astype(np.uint8)))
+    return frames
+
+
+def run(frames: list, gate: MotionGate = None) -> tuple:
+    decisions = Counter()
+    faces = []
+    start = time.process_time()
+    for frame in frames:
+        decision = gate.check(frame) if gate else None
+        if decision is not None:
+            decisions[decision.kind] += 1
+            if decision.kind == SKIPPED:
+                continue
+        detection = detect_and_encode_faces_batch(
+            [frame], [[face["bbox"] for face in faces]], 0.4, regions=[decision.region if decision else None]
+        )[0]
+        faces = [{"bbox": box} for box in detection[0]] if detection else []
+        if gate:
+            gate.update(decision, faces)
+    return (time.process_time() - start) * 1000 / len(frames), decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--size", type=int, nargs=2, default=[640, 480], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--background", help="Ảnh nền (mặc định: nền tổng hợp)")
+    parser.add_argument("--face", help="Ảnh khuôn mặt dán vào giữa khung hình")
+    parser.add_argument("--scenes", nargs="+", choices=["idle", "person", "busy"], default=["idle", "person", "busy"])
+    args = parser.parse_args()
+
+    width, height = args.size
+    if args.background:
+        background = load_rgb(args.background, (width, height))
+    else:
+        y, x = np.mgrid[0:height, 0:width]
+        background = np.stack([x * 255 // width, y * 255 // height, (x + y) % 64 * 4], axis=-1).astype(np.uint8)
+    rng = np.random.default_rng(42)
+    if args.face:
+        face = load_rgb(args.face, (height // 3, height // 3))
+    else:
+        y, x = np.mgrid[-1:1:complex(0, height // 3), -1:1:complex(0, height // 3)]
+        inside = (x / 0.7) ** 2 + y ** 2 < 1
+        face = np.where(inside[..., None], [224, 172, 140], [40, 40, 40]).astype(np.uint8)
+        for eye_x in (-0.3, 0.3):
+            face[((x - eye_x) ** 2 + (y + 0.2) ** 2) < 0.01] = 30
+
+    print(f"{'scene':>7} {'frames':>7} {'skipped':>8} {'roi':>5} {'full':>5} {'no gate ms':>11} {'gate ms':>8} {'CPU saved':>10}")
+    for scene in args.scenes:
+        frames = scene_frames(scene, background, face, args.frames, rng)
+        run(frames[:2])
+        baseline_ms, _ = run(frames)
+        gated_ms, decisions = run(frames, MotionGate())
+        print(
+            f"{scene:>7} {len(frames):>7} {decisions[SKIPPED]:>8} {decisions['roi']:>5} {decisions['full']:>5} "
+            f"{baseline_ms:>11.2f} {gated_ms:>8.2f} {1 - gated_ms / baseline_ms:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
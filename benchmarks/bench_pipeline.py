@@ -0,0 +1,285 @@
+"""Benchmark tái lập được cho toàn bộ pipeline qua API, dùng Qdrant in-memory.
+
+Ứng dụng FastAPI chạy trong tiến trình với QdrantClient(":memory:") thay cho server;
+gallery được nạp bằng encoding ngẫu nhiên theo từng kích thước. Các kịch bản:
+    users_search      POST /api/v1/users/search
+    web_users_search  POST /api/v1/web/users/search
+    enroll            POST /api/v1/users/ (một ảnh)
+    enroll_batch      POST /api/v1/users/batch (100 encoding mỗi request)
+    list_users        GET /api/v1/users/ duyệt hết gallery theo cursor
+
+Ảnh truy vấn là các biến thể (độ sáng, nhiễu) của --image (mặc định chân dung public domain
+trong benchmarks/fixtures) để không trúng cache. Request đầu tiên của mỗi kịch bản ảnh phải
+thành công và mọi request enroll phải trả về 2xx, nếu không benchmark dừng ngay vì khi đó
+chỉ đo được nhánh lỗi "không tìm thấy khuôn mặt". Kết quả ghi ra file JSON kèm commit hiện
+tại; --compare in ra chênh lệch so với một lần chạy trước.
+
+Ví dụ:
+    python -m benchmarks.bench_pipeline --sizes 100 1000 10000 100000
+    python -m benchmarks.bench_pipeline --image path/to/portrait.jpg --compare benchmarks/results/pipeline_abc1234.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+SCENARIOS = ["users_search", "web_users_search", "enroll", "enroll_batch", "list_users"]
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "portrait.jpg")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def make_images(portrait_path: str, count: int, seed: int) -> list[bytes]:
+    """Các biến thể JPEG khác nhau của ảnh chân dung"""
+    rng = np.random.default_rng(seed)
+    base = np.array(Image.open(portrait_path).convert("RGB"), dtype=np.int16)
+    images = []
+    for _ in range(count):
+        variant = base + int(rng.integers(-20, 21)) + rng.integers(-4, 5, size=base.shape, dtype=np.int16)
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(variant, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def summarize(scenario: str, size: int, timings: list[float], errors: int, elapsed: float, items: int = None) -> dict:
+    return {
+        "scenario": scenario,
+        "gallery_size": size,
+        "requests": len(timings),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings, 99)), 3),
+        "mean_ms": round(float(np.mean(timings)), 3),
+        "throughput_per_s": round((items or len(timings)) / elapsed, 2)
+    }
+
+
+def check_response(scenario: str, response):
+    if response.status_code >= 300:
+        raise SystemExit(f"{scenario}: HTTP {response.status_code} {response.text[:200]}")
+
+
+def run_requests(
+    scenario: str,
+    send,
+    payloads: list,
+    concurrency: int,
+    warmup: int = 0,
+    strict: bool = False
+) -> tuple[list[float], int, float]:
+    """Gửi payload với số luồng đồng thời cho trước, trả về (độ trễ ms, số lỗi, tổng thời gian).
+
+    warmup payload đầu tiên được gửi trước và không tính (khởi động worker, cache của thư viện).
+    Request đầu tiên phải thành công; strict dừng benchmark ở bất kỳ response nào không phải 2xx.
+    """
+    responses = [send(payload) for payload in payloads[:warmup]]
+    payloads = payloads[warmup:]
+
+    def timed(payload):
+        start = time.perf_counter()
+        response = send(payload)
+        return (time.perf_counter() - start) * 1000, response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, payloads))
+    elapsed = time.perf_counter() - start
+    responses += [response for _, response in results]
+    # Request đầu tiên lỗi nghĩa là chỉ đo được nhánh lỗi (ví dụ ảnh không có khuôn mặt)
+    for response in responses if strict else responses[:1]:
+        check_response(scenario, response)
+    return [timing for timing, _ in results], sum(response.status_code >= 400 for _, response in results), elapsed
+
+
+def fill_gallery(qdrant_service, size: int, rng: np.random.Generator, batch_size: int = 1000):
+    """Xóa collection rồi nạp size user với encoding ngẫu nhiên"""
+    qdrant_service.client.delete_collection(qdrant_service.collection_name)
+    qdrant_service._ensure_collection()
+    for start in range(0, size, batch_size):
+        count = min(batch_size, size - start)
+        encodings = rng.normal(size=(count, 128)).astype(np.float32)
+        qdrant_service.add_users([
+            {"name": f"user {start + i}", "face_encoding": encoding.tolist()}
+            for i, encoding in enumerate(encodings)
+        ])
+
+
+def wait_ready(client, timeout: float = 120.0):
+    """Đợi ứng dụng kết nối Qdrant và khởi động xong các worker"""
+    deadline = time.monotonic() + timeout
+    while client.get("/health/ready").status_code != 200:
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Ứng dụng chưa sẵn sàng sau {timeout:.0f} giây: {client.get('/health/ready').json()}")
+        time.sleep(0.1)
+
+
+def run_size(client, qdrant_service, size: int, args, rng: np.random.Generator) -> list[dict]:
+    fill_gallery(qdrant_service, size, rng)
+    if qdrant_service.local_index is not None:
+        qdrant_service.load_local_index()
+    results = []
+    concurrency = args.concurrency
+
+    if "users_search" in args.scenarios:
+        images = make_images(args.image, args.requests + args.warmup, seed=size)
+        timings, errors, elapsed = run_requests(
+            "users_search",
+            lambda image: client.post("/api/v1/users/search", files={"image_path": ("query.jpg", image, "image/jpeg")}),
+            images, concurrency, args.warmup
+        )
+        results.append(summarize("users_search", size, timings, errors, elapsed))
+
+    if "web_users_search" in args.scenarios:
+        images = make_images(args.image, args.requests + args.warmup, seed=size + 1)
+        timings, errors, elapsed = run_requests(
+            "web_users_search",
+            lambda image: client.post("/api/v1/web/users/search", files={"image_path": ("query.jpg", image, "image/jpeg")}),
+            images, concurrency, args.warmup
+        )
+        results.append(summarize("web_users_search", size, timings, errors, elapsed))
+
+    if "enroll" in args.scenarios:
+        images = make_images(args.image, args.requests + args.warmup, seed=size + 2)
+        timings, errors, elapsed = run_requests(
+            "enroll",
+            lambda image: client.post(
+                "/api/v1/users/",
+                data={"name": "bench"},
+                files={"image_path": ("enroll.jpg", image, "image/jpeg")}
+            ),
+            images, concurrency, args.warmup, strict=True
+        )
+        results.append(summarize("enroll", size, timings, errors, elapsed))
+
+    if "enroll_batch" in args.scenarios:
+        batches = [
+            {"users": [{"name": "bench", "face_encoding": encoding.tolist()} for encoding in rng.normal(size=(100, 128))]}
+            for _ in range(max(args.requests // 10, 1))
+        ]
+        timings, errors, elapsed = run_requests(
+            "enroll_batch",
+            lambda batch: client.post("/api/v1/users/batch", json=batch),
+            batches, concurrency
+        )
+        results.append(summarize("enroll_batch", size, timings, errors, elapsed, items=100 * len(batches)))
+
+    if "list_users" in args.scenarios:
+        # Duyệt tuần tự vì mỗi trang cần cursor của trang trước
+        timings, errors, users = [], 0, 0
+        cursor = None
+        start = time.perf_counter()
+        while True:
+            page_start = time.perf_counter()
+            response = client.get("/api/v1/users/", params={"limit": 1000} | ({"cursor": cursor} if cursor else {}))
+            timings.append((time.perf_counter() - page_start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+                break
+            users += len(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        results.append(summarize("list_users", size, timings, errors, time.perf_counter() - start, items=users))
+
+    return results
+
+
+def print_results(results: list[dict], baseline: dict = None):
+    print(f"{'scenario':>17} {'gallery':>8} {'req':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per s':>9} {'Δp50':>7}")
+    for row in results:
+        reference = (baseline or {}).get((row["scenario"], row["gallery_size"]))
+        delta = f"{row['p50_ms'] / reference['p50_ms'] - 1:+.0%}" if reference and reference["p50_ms"] else ""
+        print(
+            f"{row['scenario']:>17} {row['gallery_size']:>8} {row['requests']:>5} {row['errors']:>4} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['throughput_per_s']:>9.1f} {delta:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="Ảnh chân dung có một khuôn mặt (mặc định: benchmarks/fixtures/portrait.jpg)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=50, help="Số request cho mỗi kịch bản và kích thước gallery")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--warmup", type=int, default=3, help="Số request không tính ở đầu mỗi kịch bản")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="Giữ cache encoding (mặc định tắt để đo đủ pipeline)")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định benchmarks/results/pipeline_<commit>.json)")
+    parser.add_argument("--compare", help="File JSON của lần chạy trước để so sánh p50")
+    args = parser.parse_args()
+
+    # Cấu hình phải được đặt trước khi import ứng dụng
+    if not args.cache:
+        os.environ["ENCODING_CACHE_MB"] = "0"
+        os.environ["ENCODING_CACHE_DIR"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("QDRANT_HEALTH_INTERVAL", "0")
+
+    from qdrant_client import QdrantClient
+    import app.services.qdrant_service as qdrant_module
+
+    memory_client = QdrantClient(":memory:")
+    qdrant_module.QdrantClient = lambda *args, **kwargs: memory_client
+
+    from fastapi.testclient import TestClient
+    from app.config import config
+    from app.main import app
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    with TestClient(app) as client:
+        wait_ready(client)
+        qdrant_service = app.state.face_service.qdrant_service
+        for size in args.sizes:
+            results.extend(run_size(client, qdrant_service, size, args, rng))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(row["scenario"], row["gallery_size"]): row for row in json.load(f)["results"]}
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join("benchmarks", "results", f"pipeline_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "image": os.path.basename(args.image),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "warmup": args.warmup,
+                "seed": args.seed,
+                "cache": args.cache,
+                "worker_processes": config.WORKER_PROCESSES,
+                "local_index": config.LOCAL_INDEX_ENABLED,
+                "detection_scale": config.DETECTION_SCALE
+            },
+            "results": results
+        }, f, indent=2)
+    print(f"Kết quả: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Đo chi phí của bước kiểm tra chất lượng và thời gian encode tiết kiệm được trên frame kém chất lượng.
+
+Từ mỗi ảnh trong --images tạo các biến thể: ảnh gốc, ảnh thu nhỏ (khuôn mặt ở xa, --far-scale)
+và ảnh mờ (Gaussian bán kính --blur). Với mỗi biến thể, các khuôn mặt được phát hiện một lần rồi
+đo: thời gian kiểm tra chất lượng mỗi khuôn mặt, số khuôn mặt bị loại theo lý do và thời gian
+encode khi không có/có bước kiểm tra. Ảnh gốc cho biết tỉ lệ loại nhầm khuôn mặt tốt.
+
+Ví dụ:
+    python -m benchmarks.bench_quality --images path/to/frames
+    python -m benchmarks.bench_quality --images frames --min-size 60 --min-sharpness 30 --max-yaw 0.4
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from app.config import config
+from app.utils.face_quality import FaceQualityGate
+from app.utils.face_utils import encode_faces, locate_faces, resize_image
+from benchmarks.bench_detection_scale import load_image_set
+
+
+def timed_ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def variants(image: np.ndarray, far_scale: float, blur: float) -> dict:
+    return {
+        "original": image,
+        "far": resize_image(image, far_scale),
+        "blurred": np.array(Image.fromarray(image).filter(ImageFilter.GaussianBlur(blur)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Thư mục ảnh có khuôn mặt rõ, nhìn thẳng")
+    parser.add_argument("--far-scale", type=float, default=0.3)
+    parser.add_argument("--blur", type=float, default=4.0)
+    parser.add_argument("--min-size", type=int, default=config.FACE_QUALITY_MIN_SIZE)
+    parser.add_argument("--min-sharpness", type=float, default=config.FACE_QUALITY_MIN_SHARPNESS)
+    parser.add_argument("--max-yaw", type=float, default=config.FACE_QUALITY_MAX_YAW)
+    parser.add_argument("--upsample", type=int, default=2, help="Upsample khi phát hiện để tìm được cả khuôn mặt nhỏ")
+    args = parser.parse_args()
+
+    images = [image for _, image in load_image_set(args.images)]
+    if not images:
+        parser.error(f"Không có ảnh trong {args.images}")
+    gate = FaceQualityGate(args.min_size, args.min_sharpness, args.max_yaw)
+    encode_faces(images[0], locate_faces(images[0])[:1])
+
+    print(
+        f"{'variant':>9} {'faces':>6} {'rejected':>9} {'reasons':>24} {'gate ms/face':>13} "
+        f"{'encode ms':>10} {'gated ms':>9} {'saved':>6}"
+    )
+    for name in ("original", "far", "blurred"):
+        faces = rejected = 0
+        reasons = Counter()
+        gate_ms = encode_ms = gated_ms = 0.0
+        for image in images:
+            frame = variants(image, args.far_scale, args.blur)[name]
+            locations = locate_faces(frame, upsample=args.upsample)
+            if not locations:
+                continue
+            faces += len(locations)
+            encode_ms += timed_ms(lambda: encode_faces(frame, locations))
+            frame_reasons = []
+            check_ms = timed_ms(lambda: frame_reasons.extend(gate.check(frame, locations)))
+            gate_ms += check_ms
+            accepted = [location for location, reason in zip(locations, frame_reasons) if reason is None]
+            gated_ms += check_ms + timed_ms(lambda: encode_faces(frame, accepted))
+            reasons.update(reason for reason in frame_reasons if reason is not None)
+            rejected += len(locations) - len(accepted)
+
+        summary = ",".join(f"{reason}={count}" for reason, count in sorted(reasons.items())) or "-"
+        saved = 1 - gated_ms / encode_ms if encode_ms else 0.0
+        print(
+            f"{name:>9} {faces:>6} {rejected:>9} {summary:>24} {gate_ms / max(faces, 1):>13.2f} "
+            f"{encode_ms:>10.1f} {gated_ms:>9.1f} {saved:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
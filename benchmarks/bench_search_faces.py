@@ -0,0 +1,74 @@
+"""Đo độ trễ mỗi frame của pipeline nhận diện theo số khuôn mặt trong ảnh.
+
+So sánh cách cũ (detect_faces + get_average_face_encoding cho từng khuôn mặt,
+giải mã ảnh N+1 lần) với detect_and_encode_faces (giải mã một lần, encode một lần).
+
+Ví dụ:
+    python -m benchmarks.bench_search_faces --image path/to/portrait.jpg --faces 1 2 4 8
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.utils.face_utils import detect_faces, get_average_face_encoding, detect_and_encode_faces
+
+
+def make_group_image(portrait: np.ndarray, face_count: int) -> np.ndarray:
+    """Ghép ảnh chân dung thành lưới để tạo ảnh nhóm có face_count khuôn mặt"""
+    cols = int(np.ceil(np.sqrt(face_count)))
+    rows = int(np.ceil(face_count / cols))
+    height, width = portrait.shape[:2]
+    canvas = np.full((rows * height, cols * width, 3), 255, dtype=np.uint8)
+    for i in range(face_count):
+        r, c = divmod(i, cols)
+        canvas[r * height:(r + 1) * height, c * width:(c + 1) * width] = portrait
+    return canvas
+
+
+def legacy_pipeline(image_path: str) -> int:
+    face_locations = detect_faces(image_path)
+    for face_location in face_locations:
+        get_average_face_encoding(image_path, face_location)
+    return len(face_locations)
+
+
+def single_pass_pipeline(image_path: str) -> int:
+    face_locations, _ = detect_and_encode_faces(image_path)
+    return len(face_locations)
+
+
+def measure(fn, image_path: str, repeat: int) -> tuple[float, int]:
+    timings = []
+    detected = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        detected = fn(image_path)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), detected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", required=True, help="Ảnh chân dung có đúng một khuôn mặt")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    portrait = np.array(Image.open(args.image).convert("RGB"))
+    print(f"{'faces':>6} {'detected':>9} {'legacy ms':>10} {'single ms':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for face_count in args.faces:
+            image_path = os.path.join(tmp_dir, f"group_{face_count}.jpg")
+            Image.fromarray(make_group_image(portrait, face_count)).save(image_path, quality=90)
+            legacy_ms, detected = measure(legacy_pipeline, image_path, args.repeat)
+            single_ms, _ = measure(single_pass_pipeline, image_path, args.repeat)
+            print(f"{face_count:>6} {detected:>9} {legacy_ms:>10.1f} {single_ms:>10.1f} {legacy_ms / single_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
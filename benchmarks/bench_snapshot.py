@@ -0,0 +1,78 @@
+"""Đo thời gian sao lưu/khôi phục gallery bằng snapshot so với duyệt JSON qua list_users.
+
+Gallery ngẫu nhiên được nạp vào collection QDRANT_COLLECTION_bench (không đụng dữ liệu
+thật), sau đó đo: duyệt toàn bộ user theo trang 100 với vector (cách sao lưu cũ), xuất
+snapshot, nạp lại snapshot (--replace) với số request song song khác nhau, và nạp local
+index từ file so với scroll Qdrant.
+
+Ví dụ:
+    python -m benchmarks.bench_snapshot --sizes 10000 100000 --parallel 1 4 8
+    python -m benchmarks.bench_snapshot --sizes 10000 --qdrant memory
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def timed_seconds(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--qdrant", choices=["memory", "server"], default="server")
+    args = parser.parse_args()
+
+    # Cấu hình phải được đặt trước khi import ứng dụng
+    os.environ["QDRANT_COLLECTION"] = os.environ.get("QDRANT_COLLECTION", "face_encodings") + "_bench"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app.services.qdrant_service as qdrant_module
+    if args.qdrant == "memory":
+        from qdrant_client import QdrantClient
+        memory_client = QdrantClient(":memory:")
+        qdrant_module.QdrantClient = lambda *args, **kwargs: memory_client
+
+    from app.services.gallery_snapshot import export_snapshot, import_snapshot, load_snapshot_index
+    from app.services.local_index import LocalFaceIndex
+
+    qdrant_service = qdrant_module.QdrantService()
+    qdrant_service.connect()
+    qdrant_service.local_index = LocalFaceIndex()
+    rng = np.random.default_rng(42)
+
+    print(f"{'size':>8} {'step':>24} {'seconds':>8} {'per s':>10}")
+    for size in args.sizes:
+        qdrant_service.client.delete_collection(qdrant_service.collection_name)
+        qdrant_service._ensure_collection()
+        for start in range(0, size, args.batch_size):
+            count = min(args.batch_size, size - start)
+            qdrant_service.add_users([
+                {"name": f"user {start + i}", "face_encoding": encoding.tolist()}
+                for i, encoding in enumerate(rng.normal(size=(count, 128)).astype(np.float32))
+            ])
+
+        def report(step: str, seconds: float):
+            print(f"{size:>8} {step:>24} {seconds:>8.2f} {size / seconds:>10.0f}")
+
+        report("list_users json (100)", timed_seconds(lambda: sum(1 for _ in qdrant_service.iter_users(100, True))))
+        with tempfile.TemporaryDirectory() as path:
+            report("export snapshot", timed_seconds(lambda: export_snapshot(qdrant_service, path, args.batch_size)))
+            for parallel in args.parallel:
+                report(f"import parallel={parallel}", timed_seconds(lambda: import_snapshot(
+                    qdrant_service, path, batch_size=args.batch_size, parallel=parallel, replace=True
+                )))
+            report("local index from scroll", timed_seconds(qdrant_service.load_local_index))
+            report("local index from file", timed_seconds(lambda: load_snapshot_index(LocalFaceIndex(), path)))
+    qdrant_service.client.delete_collection(qdrant_service.collection_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""So sánh độ trễ và QPS tìm kiếm Qdrant theo transport (REST/gRPC) và client (sync/async).
+
+Gallery ngẫu nhiên được nạp vào collection bench_local_index, sau đó mỗi cấu hình chạy
+--queries truy vấn với --concurrency request đồng thời: client sync chạy trên
+ThreadPoolExecutor (như pool I/O của FaceService), client async dùng asyncio.gather
+giới hạn bởi semaphore. Các client được tạo bằng client_options() và RetryingClient
+như QdrantService nên bao gồm keep-alive, timeout và retry. Với --qdrant memory chỉ
+so sánh được sync/async vì qdrant-client in-memory không đi qua mạng.
+
+Ví dụ:
+    python -m benchmarks.bench_transport --size 100000 --concurrency 1 8 32
+    python -m benchmarks.bench_transport --size 10000 --qdrant memory
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from app.services.qdrant_transport import RetryingClient, client_options
+from benchmarks.bench_local_index import COLLECTION, build_qdrant, percentile
+
+
+def summarize(timings: list[float], elapsed: float) -> str:
+    return f"{statistics.median(timings):>8.2f} {percentile(timings, 99):>8.2f} {len(timings) / elapsed:>10.0f}"
+
+
+def timed_search(client, query: np.ndarray) -> float:
+    start = time.perf_counter()
+    client.search(collection_name=COLLECTION, query_vector=query.tolist(), limit=5)
+    return (time.perf_counter() - start) * 1000
+
+
+async def timed_search_async(client, query: np.ndarray, semaphore: asyncio.Semaphore) -> float:
+    async with semaphore:
+        start = time.perf_counter()
+        await client.search(collection_name=COLLECTION, query_vector=query.tolist(), limit=5)
+        return (time.perf_counter() - start) * 1000
+
+
+def run_sync(client, queries: np.ndarray, concurrency: int) -> str:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda query: timed_search(client, query), queries[:concurrency]))
+        start = time.perf_counter()
+        timings = list(executor.map(lambda query: timed_search(client, query), queries))
+    return summarize(timings, time.perf_counter() - start)
+
+
+async def run_async(client, queries: np.ndarray, concurrency: int) -> str:
+    semaphore = asyncio.Semaphore(concurrency)
+    await asyncio.gather(*(timed_search_async(client, query, semaphore) for query in queries[:concurrency]))
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(timed_search_async(client, query, semaphore) for query in queries))
+    return summarize(timings, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--transports", nargs="+", choices=["rest", "grpc"], default=["rest", "grpc"])
+    parser.add_argument("--qdrant", choices=["memory", "server"], default="server")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    gallery = rng.normal(size=(args.size, 128)).astype(np.float32)
+    queries = gallery[rng.integers(0, args.size, args.queries)] + rng.normal(scale=0.05, size=(args.queries, 128)).astype(np.float32)
+
+    loader = build_qdrant(args.qdrant, gallery)
+
+    if args.qdrant == "memory":
+        # Client async in-memory có dữ liệu riêng nên dùng chung collection đã nạp
+        async_loader = AsyncQdrantClient(":memory:")
+        async_loader._client.collections = loader._client.collections
+        clients = {"memory": (RetryingClient(loader), RetryingClient(async_loader))}
+    else:
+        clients = {
+            transport: (
+                RetryingClient(QdrantClient(**client_options(transport))),
+                RetryingClient(AsyncQdrantClient(**client_options(transport)))
+            )
+            for transport in args.transports
+        }
+
+    print(f"{'transport':>9} {'client':>6} {'conc':>5} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>10}")
+    for transport, (sync_client, async_client) in clients.items():
+        for concurrency in args.concurrency:
+            print(f"{transport:>9} {'sync':>6} {concurrency:>5} {run_sync(sync_client, queries, concurrency)}")
+
+        # Mọi mức đồng thời chạy trên cùng một event loop để tái dùng kết nối của client async
+        async def run_all():
+            return [await run_async(async_client, queries, concurrency) for concurrency in args.concurrency]
+
+        for concurrency, row in zip(args.concurrency, asyncio.run(run_all())):
+            print(f"{transport:>9} {'async':>6} {concurrency:>5} {row}")
+
+    loader.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
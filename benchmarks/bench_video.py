@@ -0,0 +1,55 @@
+"""Đo tốc độ xử lý video offline theo số tiến trình, kích thước batch và tần số lấy mẫu.
+
+Mỗi cấu hình chạy VideoRecognizer trên cùng file --video và báo số frame đã xử lý mỗi
+giây, tốc độ so với thời gian thực (giây video / giây xử lý) và bộ nhớ đỉnh của tiến trình
+chính (không tăng theo độ dài video). Tìm kiếm dùng collection hiện tại của Qdrant
+(--qdrant server) hoặc collection rỗng trong bộ nhớ (--qdrant memory, chỉ đo detect/encode).
+
+Ví dụ:
+    python -m benchmarks.bench_video --video recordings/gate.mp4 --processes 1 4 8 --batch-sizes 1 4
+    python -m benchmarks.bench_video --video gate.mp4 --sample-fps 1 5 0 --qdrant memory
+"""
+import argparse
+import resource
+
+from app.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, config.VIDEO_PROCESSES])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[config.VIDEO_BATCH_SIZE])
+    parser.add_argument("--sample-fps", type=float, nargs="+", default=[config.VIDEO_SAMPLE_FPS])
+    parser.add_argument("--qdrant", choices=["memory", "server"], default="server")
+    args = parser.parse_args()
+
+    import app.services.qdrant_service as qdrant_module
+    if args.qdrant == "memory":
+        from qdrant_client import QdrantClient
+        memory_client = QdrantClient(":memory:")
+        qdrant_module.QdrantClient = lambda *args, **kwargs: memory_client
+    from app.services.video_worker import VideoRecognizer, read_frames
+
+    qdrant_service = qdrant_module.QdrantService()
+    qdrant_service.connect()
+
+    print(
+        f"{'sample fps':>10} {'processes':>9} {'batch':>6} {'frames':>7} {'faces':>6} "
+        f"{'frame/s':>8} {'x realtime':>10} {'peak MB':>8}"
+    )
+    for sample_fps in args.sample_fps:
+        for processes in args.processes:
+            for batch_size in args.batch_sizes:
+                recognizer = VideoRecognizer(qdrant_service, processes=processes, batch_size=batch_size)
+                progress = recognizer.run(read_frames(args.video, sample_fps), lambda segment: None)
+                realtime = progress["video_seconds"] / progress["elapsed_seconds"] if progress["elapsed_seconds"] else 0.0
+                peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print(
+                    f"{sample_fps:>10g} {processes:>9} {batch_size:>6} {progress['frames']:>7} {progress['faces']:>6} "
+                    f"{progress['fps']:>8.1f} {realtime:>10.1f} {peak_mb:>8.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,22 @@ from fastapi.testclient import TestClient
 from app.main import app
 import os
 import shutil
+import time
 import uuid
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def running_app():
+    # Chạy lifespan (tạo FaceService dùng chung) và đợi kết nối Qdrant, nạp model xong
+    with client:
+        deadline = time.monotonic() + 60
+        while client.get("/health/ready").status_code != 200:
+            if time.monotonic() > deadline:
+                pytest.fail("Ứng dụng chưa sẵn sàng, kiểm tra Qdrant server")
+            time.sleep(0.1)
+        yield
+
 # Tạo thư mục test tạm thời
 TEST_IMAGES_DIR = "test_images"
 TEST_USER_DIR = os.path.join(TEST_IMAGES_DIR, "test_user")
@@ -0,0 +1,63 @@
+from app.services.attendance_service import AttendanceRecorder, AttendanceStore, day_range
+
+def make_recorder(tmp_path, **kwargs) -> AttendanceRecorder:
+    options = {"dedup_seconds": 60, "min_score": 0.9, "flush_size": 100, "flush_interval": 0.01}
+    options.update(kwargs)
+    return AttendanceRecorder(AttendanceStore(str(tmp_path / "attendance.db")), **options)
+
+def test_same_user_is_recorded_once_per_window(tmp_path):
+    recorder = make_recorder(tmp_path)
+    recorder.start()
+    assert recorder.record("u1", "An", 0.95, "live", timestamp=1000.0)
+    assert not recorder.record("u1", "An", 0.97, "live", timestamp=1030.0)
+    assert not recorder.record("u2", "Binh", 0.5, "live", timestamp=1030.0)
+    assert recorder.record("u1", "An", 0.96, "live", timestamp=1061.0)
+    recorder.stop()
+
+    events, cursor = AttendanceStore(str(tmp_path / "attendance.db")).query(user_id="u1")
+    assert [event["timestamp"] for event in events] == [1000.0, 1061.0]
+    assert cursor is None
+
+def test_window_survives_restart(tmp_path):
+    recorder = make_recorder(tmp_path, dedup_seconds=3600)
+    recorder.start()
+    assert recorder.record("u1", "An", 0.95, "search")
+    recorder.stop()
+    restarted = make_recorder(tmp_path, dedup_seconds=3600)
+    restarted.start()
+    assert not restarted.record("u1", "An", 0.95, "search")
+    restarted.stop()
+
+def test_record_does_not_touch_sqlite_before_start(tmp_path):
+    # record() chạy trên event loop: chỉ start() (trong lifespan) mới mở SQLite
+    recorder = make_recorder(tmp_path)
+    assert recorder.record("u1", "An", 0.95, "live", timestamp=1000.0)
+    assert not (tmp_path / "attendance.db").exists()
+
+    recorder.start()
+    recorder.flush()
+    recorder.stop()
+    events, _ = AttendanceStore(str(tmp_path / "attendance.db")).query(user_id="u1")
+    assert [event["timestamp"] for event in events] == [1000.0]
+
+def test_range_queries_by_day_and_cursor(tmp_path):
+    store = AttendanceStore(str(tmp_path / "attendance.db"))
+    day_start, day_end = day_range("2024-03-01")
+    store.append_many(
+        [(f"u{i % 3}", f"user {i % 3}", day_start + i * 600, 0.95, "live") for i in range(20)]
+        + [("u0", "user 0", day_end + 60, 0.95, "live")]
+    )
+
+    events, cursor = store.query(start=day_start, end=day_end, limit=8)
+    pages = [events]
+    while cursor:
+        events, cursor = store.query(start=day_start, end=day_end, limit=8, cursor=cursor)
+        pages.append(events)
+    timestamps = [event["timestamp"] for page in pages for event in page]
+    assert [len(page) for page in pages] == [8, 8, 4]
+    assert timestamps == sorted(timestamps) and len(set(timestamps)) == 20
+
+    summary = {row["user_id"]: row for row in store.daily_summary("2024-03-01")}
+    assert summary["u0"]["events"] == 7
+    assert summary["u1"]["first_seen"] == day_start + 600
+    assert len(store.query(user_id="u0")[0]) == 8
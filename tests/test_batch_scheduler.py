@@ -0,0 +1,52 @@
+import asyncio
+from app.services.batch_scheduler import BatchScheduler
+
+def test_requests_in_window_share_one_batch():
+    calls = []
+
+    async def process_batch(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    async def scenario():
+        scheduler = BatchScheduler(process_batch, max_batch_size=8, max_wait_ms=50)
+        results = await asyncio.gather(*(scheduler.submit(i) for i in range(5)))
+        await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(scenario())
+    assert results == [0, 10, 20, 30, 40]
+    assert calls == [[0, 1, 2, 3, 4]]
+    stats = scheduler.stats.snapshot(scheduler.queue_depth)
+    assert stats["batches"] == 1
+    assert stats["frames"] == 5
+    assert stats["batch_size_histogram"]["le_8"] == 1
+
+def test_batch_is_split_at_max_size():
+    calls = []
+
+    async def process_batch(items):
+        calls.append(len(items))
+        return items
+
+    async def scenario():
+        scheduler = BatchScheduler(process_batch, max_batch_size=2, max_wait_ms=50)
+        await asyncio.gather(*(scheduler.submit(i) for i in range(5)))
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert calls == [2, 2, 1]
+
+def test_errors_are_returned_to_their_own_request():
+    async def process_batch(items):
+        return [ValueError("bad frame") if item == "bad" else item for item in items]
+
+    async def scenario():
+        scheduler = BatchScheduler(process_batch, max_batch_size=4, max_wait_ms=20)
+        results = await asyncio.gather(scheduler.submit("ok"), scheduler.submit("bad"), return_exceptions=True)
+        await scheduler.stop()
+        return results
+
+    ok, bad = asyncio.run(scenario())
+    assert ok == "ok"
+    assert isinstance(bad, ValueError)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from app.services import qdrant_service as qdrant_module
+from app.services.collection_migration import migrate_collection
+
+@pytest.fixture
+def qdrant_service(monkeypatch):
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(qdrant_module, "QdrantClient", lambda *args, **kwargs: client)
+    service = qdrant_module.QdrantService()
+    service.connect()
+    return service
+
+def users(service, count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    return service.add_users([
+        {"name": f"user {seed}-{i}", "face_encodings": rng.normal(size=(2, 128)).tolist()} for i in range(count)
+    ])
+
+@pytest.mark.parametrize("migrations", [1, 2])
+def test_writes_during_migration_are_carried_over(qdrant_service, migrations):
+    # Lần 2 đi theo nhánh alias đã tồn tại
+    for _ in range(migrations - 1):
+        migrate_collection(qdrant_service, batch_size=8)
+    user_ids = users(qdrant_service, 20, seed=0)
+    renamed = user_ids[10]
+    added = []
+
+    def write_while_copying(copied):
+        # Ghi sau khi đã chép hết: point bị xóa/sửa đều đã có trong collection mới
+        if copied == 2 * len(user_ids):
+            qdrant_service.delete_users([user_ids[0], user_ids[15]])
+            added.extend(users(qdrant_service, 2, seed=1))
+            qdrant_service.add_users([{"user_id": renamed, "name": "renamed", "face_encodings": [[1.0] * 128]}])
+
+    migrate_collection(qdrant_service, batch_size=8, on_progress=write_while_copying)
+    listed = {user["user_id"]: user["name"] for user in qdrant_service.iter_users()}
+    expected = set(user_ids) - {user_ids[0], user_ids[15]} | set(added)
+    assert set(listed) == expected
+    assert listed[renamed] == "renamed"
+    # User đổi tên chỉ còn một template
+    assert qdrant_service.client.count(qdrant_service.collection_name).count == 2 * len(expected) - 1
+    point = qdrant_service.client.retrieve(qdrant_service.collection_name, ids=[renamed], with_vectors=True)[0]
+    assert np.allclose(point.vector, 1 / np.sqrt(128))
+
+@pytest.mark.parametrize("crash_at", ["delete_collection", "update_collection_aliases"])
+def test_interrupted_first_migration_resumes(qdrant_service, monkeypatch, crash_at):
+    client = qdrant_service.client
+    alias = qdrant_service.collection_name
+    user_ids = users(qdrant_service, 5, seed=2)
+    original = getattr(client, crash_at)
+
+    def crash(*args, **kwargs):
+        operations = kwargs.get("change_aliases_operations", [])
+        if crash_at == "delete_collection" or any(
+            getattr(operation, "create_alias", None) and operation.create_alias.alias_name == alias for operation in operations
+        ):
+            raise RuntimeError("crash")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(client, crash_at, crash)
+    with pytest.raises(RuntimeError):
+        migrate_collection(qdrant_service, batch_size=2)
+    monkeypatch.setattr(client, crash_at, original)
+
+    # Ứng dụng khởi động lại trước khi chạy tiếp: tên có thể bị tạo lại thành collection rỗng
+    qdrant_service._ensure_collection()
+    added = users(qdrant_service, 1, seed=3)
+    result = migrate_collection(qdrant_service, batch_size=2)
+
+    aliases = {item.alias_name: item.collection_name for item in client.get_aliases().aliases}
+    assert aliases == {alias: result["collection"]}
+    assert {user["user_id"] for user in qdrant_service.iter_users()} == set(user_ids + added)
+    assert client.count(alias).count == 2 * len(user_ids + added)
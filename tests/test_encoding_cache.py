@@ -0,0 +1,50 @@
+from app.utils.encoding_cache import EncodingCache
+
+DETECTION = ([(10, 60, 60, 10)], [[0.1] * 128])
+
+def test_same_bytes_and_params_hit_cache():
+    cache = EncodingCache(max_bytes=1024 * 1024)
+    key = cache.make_key(b"image", "scale=1.0")
+    assert cache.get(key) is None
+    cache.put(key, DETECTION)
+    assert cache.get(key) == DETECTION
+    assert cache.make_key(b"image", "scale=0.5") != key
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EncodingCache(max_bytes=3000)
+    keys = [cache.make_key(bytes([i]), "") for i in range(3)]
+    cache.put(keys[0], DETECTION)
+    cache.put(keys[1], DETECTION)
+    cache.get(keys[0])
+    cache.put(keys[2], DETECTION)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == DETECTION
+    assert cache.stats()["evictions"] == 1
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    key = EncodingCache.make_key(b"image", "")
+    EncodingCache(max_bytes=0, disk_dir=str(tmp_path)).put(key, DETECTION)
+
+    cache = EncodingCache(max_bytes=1024 * 1024, disk_dir=str(tmp_path))
+    face_locations, encodings = cache.get(key)
+    assert face_locations == DETECTION[0]
+    assert encodings[0][0] == 0.1
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_tier_trims_without_scanning_on_every_put(tmp_path, monkeypatch):
+    from app.utils import encoding_cache as cache_module
+    scans = []
+    scandir = cache_module.os.scandir
+    monkeypatch.setattr(cache_module.os, "scandir", lambda path: scans.append(path) or scandir(path))
+
+    cache = EncodingCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=20000)
+    for i in range(40):
+        cache.put(cache.make_key(bytes([i]), ""), DETECTION)
+    total = sum(path.stat().st_size for path in tmp_path.glob("*.npz"))
+    assert 0 < total <= 20000
+    # Chỉ quét khi ghi lần đầu và khi vượt giới hạn, không phải ở mỗi lần ghi
+    assert len(scans) <= 20
+    assert cache.stats()["evictions"] > 0
@@ -0,0 +1,31 @@
+import inspect
+import os
+import pytest
+from fastapi import HTTPException
+from app.api import endpoints
+from app.config import config
+
+@pytest.fixture
+def state_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "ENROLL_STATE_DIR", str(tmp_path))
+    return os.path.realpath(tmp_path)
+
+@pytest.mark.parametrize("job_name", ["../../tmp/x", "a/b", "..", "", "x" * 65, "tên"])
+def test_state_path_rejects_unsafe_job_name(state_dir, job_name):
+    # job_name là tên file checkpoint, không được thoát khỏi ENROLL_STATE_DIR
+    with pytest.raises(HTTPException) as error:
+        endpoints._state_path(job_name)
+    assert error.value.status_code == 400
+
+def test_state_path_stays_in_state_dir(state_dir):
+    assert endpoints._state_path("ok_name-1") == os.path.join(state_dir, "ok_name-1.jsonl")
+
+def test_state_path_rejects_symlink_out_of_state_dir(state_dir, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    os.symlink(outside / "x.jsonl", os.path.join(state_dir, "link.jsonl"))
+    with pytest.raises(HTTPException):
+        endpoints._state_path("link")
+
+def test_bulk_enroll_ignores_server_paths():
+    # Enroll từ thư mục trên server chỉ làm qua CLI, API bắt buộc upload file zip
+    assert "source" not in inspect.signature(endpoints.bulk_enroll).parameters
@@ -0,0 +1,18 @@
+import threading
+from app.services import enrollment_service
+from app.services.enrollment_service import EnrollmentJobs
+
+def test_finished_jobs_are_evicted_after_ttl(monkeypatch, tmp_path):
+    release = threading.Event()
+    monkeypatch.setattr(enrollment_service.BulkEnrollment, "run", lambda self, source: release.wait(5))
+    jobs = EnrollmentJobs(ttl=0)
+    job_id = jobs.start(None, str(tmp_path), str(tmp_path / "job.jsonl"))
+    # Job đang chạy không bị xóa dù ttl = 0
+    assert jobs.get(job_id) is not None
+
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == f"enroll-{job_id}":
+            thread.join(5)
+    assert jobs.get(job_id) is None
+    assert not jobs._jobs
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app.utils import face_backends
+from app.utils.face_backends import CnnDetector, DlibEncoder, create_detector
+
+def test_cnn_batches_frames_of_the_same_size(monkeypatch):
+    calls = []
+
+    def batch_face_locations(images, number_of_times_to_upsample=1, batch_size=128):
+        calls.append(("batch", len(images), batch_size))
+        return [[(0, image.shape[1], image.shape[0], 0)] for image in images]
+
+    def face_locations(image, number_of_times_to_upsample=1, model="hog"):
+        calls.append(("single", model))
+        return [(1, 2, 3, 0)]
+
+    monkeypatch.setattr(face_backends, "_face_recognition", SimpleNamespace(
+        batch_face_locations=batch_face_locations,
+        face_locations=face_locations
+    ))
+    images = [np.zeros((40, 60, 3), np.uint8), np.zeros((30, 30, 3), np.uint8), np.zeros((40, 60, 3), np.uint8)]
+    results = CnnDetector(batch_size=4).locate_batch(images, upsample=0)
+
+    assert results == [[(0, 60, 40, 0)], [(1, 2, 3, 0)], [(0, 60, 40, 0)]]
+    assert sorted(calls) == [("batch", 2, 4), ("single", "cnn")]
+
+def test_invalid_backend_settings_are_rejected():
+    with pytest.raises(ValueError):
+        create_detector("mtcnn")
+    with pytest.raises(ValueError):
+        DlibEncoder(num_jitters=0)
+    with pytest.raises(ValueError):
+        DlibEncoder(landmark_model="medium")
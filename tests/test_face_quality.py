@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+import numpy as np
+from PIL import Image, ImageFilter
+from app.utils import face_backends
+from app.utils.face_quality import BLURRY, POSE, TOO_SMALL, FaceQualityGate, sharpness
+
+def textured_image(size: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+def test_sharpness_drops_when_blurred():
+    image = textured_image()
+    blurred = np.array(Image.fromarray(image).filter(ImageFilter.GaussianBlur(4)))
+    box = (20, 180, 180, 20)
+    assert sharpness(image, box) > 10 * sharpness(blurred, box)
+
+def test_gate_reports_reason_per_face(monkeypatch):
+    calls = []
+
+    def face_landmarks(image, face_locations=None, model="large"):
+        calls.append(len(face_locations))
+        # Khuôn mặt đầu nhìn thẳng, khuôn mặt sau có mũi lệch hẳn về một bên
+        return [
+            {"left_eye": [(40, 50)], "right_eye": [(80, 50)], "nose_tip": [(nose_x, 70)]}
+            for nose_x in (62, 95)[:len(face_locations)]
+        ]
+
+    monkeypatch.setattr(face_backends, "_face_recognition", SimpleNamespace(face_landmarks=face_landmarks))
+    image = textured_image()
+    image[100:200, 100:200] = 128
+    gate = FaceQualityGate(min_size=40, min_sharpness=15, max_yaw=0.5)
+    reasons = gate.check(image, [(0, 90, 90, 0), (0, 120, 20, 100), (100, 200, 200, 100), (0, 95, 95, 5)])
+
+    assert reasons == [None, TOO_SMALL, BLURRY, POSE]
+    # Landmark chỉ chạy một lần cho các khuôn mặt đã qua kiểm tra kích thước và độ nét
+    assert calls == [2]
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from app.config import config
+from app.services import face_service as face_service_module
+from app.services.face_service import FaceService
+from app.services.worker_pool import WorkerPool
+from app.utils.encoding_cache import EncodingCache
+
+class RecordingPool:
+    """Thay worker pool, ghi lại số ảnh của mỗi job detect/encode"""
+
+    def __init__(self):
+        self.jobs = []
+
+    async def run_cpu(self, fn, images, *args):
+        self.jobs.append(len(images))
+        return [([], [], [], []) for _ in images]
+
+    async def run_io(self, fn, *args):
+        self.jobs.append("io")
+        return fn(*args)
+
+@pytest.mark.parametrize("detector, jobs", [("hog", [1, 1, 1]), ("cnn", [3])])
+def test_detect_and_encode_splits_batch_per_frame(monkeypatch, detector, jobs):
+    monkeypatch.setattr(config, "ATTENDANCE_ENABLED", False)
+    monkeypatch.setattr(config, "FACE_DETECTOR", detector)
+    service = FaceService()
+    service.worker_pool = RecordingPool()
+    frames = [np.zeros((8, 8, 3), np.uint8) for _ in range(3)]
+
+    results = asyncio.run(service._detect_and_encode(frames))
+    # HOG: mỗi frame một job để các worker chạy song song; CNN: cả batch trong một job
+    assert service.worker_pool.jobs == jobs
+    assert len(results) == 3
+
+def fake_detect(images, *args):
+    return [([(0, 1, 1, 0)], [[0.0] * 128], [None], [None]) for _ in images]
+
+async def no_matches(encodings):
+    return [None] * len(encodings)
+
+def test_batch_larger_than_free_slots_keeps_admitted_frames(monkeypatch):
+    monkeypatch.setattr(config, "ATTENDANCE_ENABLED", False)
+    monkeypatch.setattr(config, "FACE_DETECTOR", "hog")
+    monkeypatch.setattr(face_service_module, "detect_and_encode_faces_batch", fake_detect)
+    service = FaceService()
+    # Một worker, một chỗ chờ: khi một job đang chạy chỉ còn một slot trống
+    service.worker_pool = WorkerPool(processes=0, queue_depth=1, overload_policy="reject", io_threads=1)
+    service._search_users = no_matches
+    release = threading.Event()
+    frames = [np.zeros((8, 8, 3), np.uint8) for _ in range(3)]
+
+    async def scenario():
+        busy = asyncio.create_task(service.worker_pool.run_cpu(release.wait))
+        await asyncio.sleep(0.05)
+        batch = asyncio.create_task(service.search_faces_batch(frames))
+        await asyncio.sleep(0.05)
+        release.set()
+        await busy
+        return await batch
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        service.worker_pool.shutdown()
+    assert isinstance(results[0], list) and len(results[0]) == 1
+    assert [result.status_code for result in results[1:]] == [503, 503]
+
+def test_disk_cache_runs_on_io_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "ATTENDANCE_ENABLED", False)
+    monkeypatch.setattr(config, "FACE_DETECTOR", "hog")
+    service = FaceService()
+    service.worker_pool = RecordingPool()
+    service.encoding_cache = EncodingCache(max_bytes=0, disk_dir=str(tmp_path))
+    frames = [b"frame-1", b"frame-2"]
+
+    asyncio.run(service._detect_and_encode(frames))
+    # Một lần đọc đĩa cho các ảnh trượt bộ nhớ, rồi một lần ghi sau khi encode
+    assert service.worker_pool.jobs == ["io", 1, 1, "io"]
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+    service.worker_pool.jobs.clear()
+    asyncio.run(service._detect_and_encode(frames))
+    assert service.worker_pool.jobs == ["io"]
@@ -0,0 +1,44 @@
+from app.services.face_tracker import FaceTracker
+from app.utils.box_utils import box_iou, match_boxes
+
+MATCH = {"user_id": "id-1", "name": "An", "score": 0.97}
+
+def test_match_boxes_pairs_by_highest_iou():
+    boxes = [(10, 60, 60, 10), (100, 160, 160, 100)]
+    references = [(102, 162, 162, 102), (12, 62, 62, 12)]
+    assert match_boxes(boxes, references, 0.5) == [1, 0]
+    assert match_boxes(boxes, [(300, 350, 350, 300)], 0.5) == [None, None]
+    assert box_iou(boxes[0], boxes[0]) == 1.0
+
+def test_identified_face_is_reused_until_refresh():
+    tracker = FaceTracker(iou_threshold=0.4, refresh_frames=3, min_score=0.9, max_missed=2)
+    box = (10, 60, 60, 10)
+    faces = tracker.update([box], [None], [MATCH])
+    track_id = faces[0]["track_id"]
+
+    for _ in range(3):
+        reusable = tracker.reusable_tracks()
+        assert len(reusable) == 1
+        faces = tracker.update([box], [reusable[0]], [None])
+        assert faces[0]["name"] == "An"
+        assert faces[0]["track_id"] == track_id
+
+    # Sau refresh_frames frame phải encode lại
+    assert tracker.reusable_tracks() == []
+    assert tracker.encoded_faces == 1
+    assert tracker.reused_faces == 3
+
+def test_low_confidence_and_unknown_faces_are_not_reused():
+    tracker = FaceTracker(min_score=0.9)
+    tracker.update([(10, 60, 60, 10), (100, 160, 160, 100)], [None, None], [{**MATCH, "score": 0.5}, None])
+    assert tracker.reusable_tracks() == []
+
+def test_moved_face_keeps_track_and_lost_track_expires():
+    tracker = FaceTracker(iou_threshold=0.4, max_missed=1)
+    first = tracker.update([(10, 60, 60, 10)], [None], [MATCH])[0]
+    moved = tracker.update([(14, 64, 64, 14)], [None], [MATCH])[0]
+    assert moved["track_id"] == first["track_id"]
+
+    tracker.update([], [], [])
+    tracker.update([], [], [])
+    assert tracker.tracks == []
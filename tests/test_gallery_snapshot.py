@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from app.services import qdrant_service as qdrant_module
+from app.services.gallery_snapshot import export_snapshot, import_snapshot, load_snapshot_index, read_snapshot
+from app.services.local_index import LocalFaceIndex
+
+@pytest.fixture
+def qdrant_service(monkeypatch):
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(qdrant_module, "QdrantClient", lambda *args, **kwargs: client)
+    service = qdrant_module.QdrantService()
+    service.connect()
+    return service
+
+def test_snapshot_round_trip(qdrant_service, tmp_path):
+    rng = np.random.default_rng(0)
+    user_ids = qdrant_service.add_users([
+        {"name": f"user {i}", "face_encodings": rng.normal(size=(2, 128)).tolist()} for i in range(30)
+    ])
+    # Point cũ chỉ có name, user_id là point ID
+    qdrant_service.client.upsert(qdrant_service.collection_name, points=[
+        models.PointStruct(id=7, vector=rng.normal(size=128).tolist(), payload={"name": "legacy"})
+    ])
+
+    result = export_snapshot(qdrant_service, str(tmp_path), batch_size=16)
+    manifest, rows, embeddings = read_snapshot(str(tmp_path))
+    assert result["templates"] == manifest["templates"] == len(rows) == 61
+    assert embeddings.dtype == np.float32 and embeddings.shape == (61, 128)
+    assert ["7", "7", "legacy", True] in [list(row) for row in rows]
+
+    query = qdrant_service.client.retrieve(qdrant_service.collection_name, ids=[user_ids[3]], with_vectors=True)[0].vector
+    import_snapshot(qdrant_service, str(tmp_path), batch_size=20, parallel=2, replace=True)
+    assert qdrant_service.client.count(qdrant_service.collection_name).count == 61
+    assert qdrant_service.search_user(query)["user_id"] == user_ids[3]
+    assert len(qdrant_service.list_users(limit=100)[0]) == 31
+
+    local_index = LocalFaceIndex()
+    assert load_snapshot_index(local_index, str(tmp_path)) == 61
+    assert local_index.user_count() == 31
+    assert local_index.search_one(query)["user_id"] == user_ids[3]
@@ -0,0 +1,65 @@
+import numpy as np
+from app.services.local_index import LocalFaceIndex
+
+def random_encodings(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, 128)).astype(np.float32)
+
+def test_search_returns_exact_match_first():
+    index = LocalFaceIndex(initial_capacity=2)
+    encodings = random_encodings(10)
+    index.add_many([f"id-{i}" for i in range(10)], [f"user {i}" for i in range(10)], encodings)
+    assert len(index) == 10
+
+    results = index.search(encodings[[3, 7]], top_k=3)
+    assert [matches[0]["user_id"] for matches in results] == ["id-3", "id-7"]
+    assert abs(results[0][0]["score"] - 1.0) < 1e-5
+    assert results[0][0]["score"] >= results[0][1]["score"] >= results[0][2]["score"]
+
+def test_remove_keeps_remaining_rows_searchable():
+    index = LocalFaceIndex()
+    encodings = random_encodings(5)
+    index.add_many([f"id-{i}" for i in range(5)], [f"user {i}" for i in range(5)], encodings)
+
+    assert index.remove("id-1")
+    assert not index.remove("id-1")
+    assert len(index) == 4
+    assert index.search_one(encodings[4])["user_id"] == "id-4"
+    assert index.search_one(encodings[1])["user_id"] != "id-1"
+
+def test_add_existing_id_updates_in_place():
+    index = LocalFaceIndex()
+    encodings = random_encodings(2)
+    index.add("id-0", "old name", encodings[0])
+    index.add("id-0", "new name", encodings[1])
+    assert len(index) == 1
+    assert index.search_one(encodings[1])["name"] == "new name"
+
+def test_empty_index_has_no_matches():
+    index = LocalFaceIndex()
+    assert index.search_one(random_encodings(1)[0]) is None
+
+def test_templates_are_grouped_by_user():
+    index = LocalFaceIndex()
+    encodings = random_encodings(4)
+    index.add_many(["t-0", "t-1", "t-2", "t-3"], ["An", "An", "An", "Binh"], encodings, ["u-a", "u-a", "u-a", "u-b"])
+    assert len(index) == 4
+    assert index.user_count() == 2
+    assert index.template_count("u-a") == 3
+
+    matches = index.search(encodings[[1]], top_k=5)[0]
+    assert [match["user_id"] for match in matches] == ["u-a", "u-b"]
+    assert abs(matches[0]["score"] - 1.0) < 1e-5
+
+    assert index.remove_user("u-a") == 3
+    assert "u-a" not in index
+    assert index.search_one(encodings[1])["user_id"] == "u-b"
+
+def test_mean_aggregation_averages_best_templates():
+    index = LocalFaceIndex(aggregation="mean", aggregation_k=2)
+    base = random_encodings(1)[0]
+    other = random_encodings(1, seed=1)[0]
+    index.add_many(["t-0", "t-1"], ["An", "An"], [base, other], ["u-a", "u-a"])
+
+    match = index.search_one(base)
+    expected = (1.0 + float(np.dot(base, other) / np.linalg.norm(base) / np.linalg.norm(other))) / 2
+    assert abs(match["score"] - expected) < 1e-5
@@ -0,0 +1,37 @@
+import asyncio
+from app.services.worker_pool import WorkerPool
+from app.utils.metrics import Counter, Histogram, render_metrics, stage_seconds, timed
+
+def timed_job(value: int) -> int:
+    with timed("test_worker_stage"):
+        return value * 2
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Độ trễ thử nghiệm", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="decode")
+    histogram.observe(0.5, stage="decode")
+    histogram.observe(5.0, stage="decode")
+
+    lines = render_metrics().splitlines()
+    assert "# TYPE test_latency_seconds histogram" in lines
+    assert 'test_latency_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="decode",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="decode"} 3' in lines
+
+def test_counter_is_split_by_label():
+    counter = Counter("test_matches_total", "Số lần khớp thử nghiệm", ["result"])
+    counter.inc(result="match")
+    counter.inc(2, result="unknown")
+    assert counter.value(result="match") == 1
+    assert 'test_matches_total{result="unknown"} 2' in render_metrics().splitlines()
+
+def test_worker_stage_timings_are_recorded_once_in_parent():
+    for processes in (0, 1):
+        before = stage_seconds.count(stage="test_worker_stage")
+        pool = WorkerPool(processes=processes, queue_depth=1)
+        try:
+            assert asyncio.run(pool.run_cpu(timed_job, 21)) == 42
+        finally:
+            pool.shutdown()
+        assert stage_seconds.count(stage="test_worker_stage") == before + 1
@@ -0,0 +1,50 @@
+import io
+import numpy as np
+from PIL import Image
+from app.services.motion_gate import FULL, ROI, SKIPPED, MotionDecision, MotionGate
+
+def jpeg(image: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+def background() -> np.ndarray:
+    # Nền có họa tiết nhẹ và nhiễu nén JPEG, không phải ảnh đồng màu
+    y, x = np.mgrid[0:240, 0:320]
+    return np.stack([(x // 2) % 256, (y // 2) % 256, np.full_like(x, 90)], axis=-1).astype(np.uint8)
+
+def process(gate: MotionGate, frame: np.ndarray, faces: list) -> MotionDecision:
+    decision = gate.check(jpeg(frame))
+    if decision.kind != SKIPPED:
+        gate.update(decision, faces)
+    return decision
+
+def test_idle_frames_reuse_previous_result():
+    gate = MotionGate(refresh_frames=5)
+    faces = [{"bbox": (20, 80, 80, 20), "name": "An"}]
+    frame = background()
+    assert process(gate, frame, faces).kind == FULL
+    kinds = [process(gate, frame, faces).kind for _ in range(6)]
+    # Sau refresh_frames frame không đổi vẫn xử lý lại đầy đủ một lần
+    assert kinds == [SKIPPED] * 5 + [FULL]
+    assert gate.faces == faces
+
+def test_local_change_detects_only_changed_region():
+    gate = MotionGate(roi_margin=0.05)
+    still_face = {"bbox": (20, 80, 80, 20), "name": "An"}
+    touched_face = {"bbox": (150, 270, 210, 210), "name": "Binh"}
+    frame = background()
+    process(gate, frame, [still_face, touched_face])
+
+    moved = frame.copy()
+    moved[170:230, 240:300] = 255
+    decision = process(gate, moved, [still_face, touched_face])
+    assert decision.kind == ROI
+    roi, carried = decision.region
+    top, right, bottom, left = roi
+    # Vùng bao trọn khuôn mặt bị chạm vào, khuôn mặt đứng yên được giữ nguyên
+    assert top <= 150 and left <= 210 and bottom >= 230 and right >= 300
+    assert carried == [(20, 80, 80, 20)]
+
+    scene = 255 - frame
+    assert process(gate, scene, []).kind == FULL
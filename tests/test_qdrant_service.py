@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from app.config import config
+from app.services import qdrant_service as qdrant_module
+
+@pytest.fixture
+def workers(monkeypatch):
+    # Hai worker dùng chung một Qdrant, mỗi worker có local index riêng
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(qdrant_module, "QdrantClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(config, "LOCAL_INDEX_ENABLED", True)
+    services = [qdrant_module.QdrantService(), qdrant_module.QdrantService()]
+    for service in services:
+        service.connect()
+    return services
+
+def test_delete_users_added_by_another_worker(workers):
+    worker_a, worker_b = workers
+    client = worker_a.client
+    rng = np.random.default_rng(0)
+    user_id = worker_a.add_user("An", rng.normal(size=(2, 128)).tolist())
+    assert user_id not in worker_b.local_index
+
+    assert worker_b.delete_users([user_id]) == [user_id]
+    assert client.count(worker_a.collection_name).count == 0
+    assert worker_b.delete_users([user_id]) == []
+
+def test_reload_sees_other_workers_and_keeps_own_writes(workers):
+    worker_a, worker_b = workers
+    rng = np.random.default_rng(1)
+    encodings = rng.normal(size=(3, 128))
+    kept, deleted = worker_a.add_users([
+        {"name": "An", "face_encodings": encodings[:1].tolist()},
+        {"name": "Binh", "face_encodings": encodings[1:2].tolist()}
+    ])
+    assert kept not in worker_b.local_index
+
+    # Worker b ghi trong lúc đang nạp lại: thao tác phải còn trong index mới
+    scroll = worker_b.iter_templates
+    added = []
+
+    def iter_templates(*args, **kwargs):
+        for i, template in enumerate(scroll(*args, **kwargs)):
+            if i == 0:
+                worker_b.delete_users([deleted])
+                added.extend(worker_b.add_users([{"name": "Chi", "face_encodings": encodings[2:].tolist()}]))
+            yield template
+
+    worker_b.iter_templates = iter_templates
+    worker_b.load_local_index()
+    assert worker_b.search_user(encodings[0])["user_id"] == kept
+    assert deleted not in worker_b.local_index
+    assert worker_b.search_user(encodings[2])["user_id"] == added[0]
+
+def test_add_users_replaces_existing_templates(workers):
+    service, _ = workers
+    client = service.client
+    rng = np.random.default_rng(2)
+    user_id = service.add_user("An", rng.normal(size=(2, 128)).tolist())
+    extra = service.add_templates(user_id, rng.normal(size=(2, 128)).tolist())
+    assert set(extra["template_ids"]) == set(service._template_ids(user_id, 4)[2:])
+
+    encoding = rng.normal(size=128)
+    assert service.add_users([{"user_id": user_id, "name": "An mới", "face_encodings": [encoding.tolist()]}]) == [user_id]
+    assert client.count(service.collection_name).count == 1
+    assert len(service.local_index) == 1
+    match = service.search_user(encoding)
+    assert match["user_id"] == user_id and match["name"] == "An mới"
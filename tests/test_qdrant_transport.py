@@ -0,0 +1,53 @@
+import asyncio
+import httpx
+import pytest
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from app.services.qdrant_transport import RetryingClient, client_options
+
+class FlakyClient:
+    def __init__(self, error: Exception, failures: int = 1):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def search(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return ["hit"]
+
+    def recreate_collection(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+class AsyncFlakyClient(FlakyClient):
+    async def search(self, **kwargs):
+        return FlakyClient.search(self, **kwargs)
+
+def test_transient_errors_are_retried():
+    client = FlakyClient(ResponseHandlingException(httpx.ConnectError("refused")), failures=2)
+    assert RetryingClient(client, retries=2, backoff=0).search(collection_name="c") == ["hit"]
+    assert client.calls == 3
+
+def test_request_errors_and_unsafe_methods_are_not_retried():
+    client = FlakyClient(UnexpectedResponse(400, "Bad Request", b"", httpx.Headers()))
+    with pytest.raises(UnexpectedResponse):
+        RetryingClient(client, retries=2, backoff=0).search(collection_name="c")
+    assert client.calls == 1
+
+    client = FlakyClient(ResponseHandlingException(httpx.ConnectError("refused")))
+    with pytest.raises(ResponseHandlingException):
+        RetryingClient(client, retries=2, backoff=0).recreate_collection(collection_name="c")
+    assert client.calls == 1
+
+def test_async_client_gives_up_after_retries():
+    client = AsyncFlakyClient(ResponseHandlingException(httpx.ReadTimeout("timeout")), failures=5)
+    with pytest.raises(ResponseHandlingException):
+        asyncio.run(RetryingClient(client, retries=2, backoff=0).search(collection_name="c"))
+    assert client.calls == 3
+
+def test_client_options_per_transport():
+    assert client_options("grpc")["prefer_grpc"] and "limits" not in client_options("grpc")
+    assert not client_options("rest")["prefer_grpc"] and "limits" in client_options("rest")
+    with pytest.raises(ValueError):
+        client_options("http3")
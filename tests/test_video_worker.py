@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from app.services.video_worker import Timeline, read_frames
+
+def match(user_id: str, score: float = 0.95) -> dict:
+    return {"user_id": user_id, "name": user_id.upper(), "score": score}
+
+def test_timeline_merges_appearances_within_gap():
+    timeline = Timeline(gap_seconds=2.0)
+    closed = []
+    closed += timeline.add(0.0, [match("a")])
+    closed += timeline.add(1.0, [match("a", 0.97), match("a"), match("b")])
+    closed += timeline.add(2.5, [match("a")])
+    assert closed == []
+    # b không xuất hiện quá 2 giây: đoạn của b đóng, a vẫn mở
+    closed += timeline.add(3.5, [])
+    assert [(segment["user_id"], segment["start"], segment["end"]) for segment in closed] == [("b", 1.0, 1.0)]
+    closed += timeline.add(7.0, [match("a")])
+    closed += timeline.close_all()
+
+    segments = [(segment["user_id"], segment["start"], segment["end"], segment["frames"]) for segment in closed]
+    assert segments == [("b", 1.0, 1.0, 1), ("a", 0.0, 2.5, 3), ("a", 7.0, 7.0, 1)]
+    assert closed[1]["best_score"] == 0.97
+
+def test_read_frames_samples_by_video_time(tmp_path):
+    cv2 = pytest.importorskip("cv2")
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+    for i in range(30):
+        writer.write(np.full((32, 32, 3), i * 8, np.uint8))
+    writer.release()
+
+    frames = list(read_frames(path, sample_fps=4))
+    assert [index for index, _, _ in frames] == [0, 3, 5, 8, 10, 13, 15, 18, 20, 23, 25, 28]
+    assert frames[1][1] == pytest.approx(0.3)
+    assert frames[0][2].shape == (32, 32, 3)
+    assert len(list(read_frames(path, sample_fps=0))) == 30
@@ -0,0 +1,34 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.api.dependencies import get_search_scheduler
+from app.api.web_endpoints import router
+from app.config import config
+
+class EchoScheduler:
+    """Thay scheduler thật: mỗi frame trả về một khuôn mặt cố định"""
+
+    async def submit(self, item):
+        return [{"bbox": (1, 2, 3, 4), "name": "An", "score": 0.9}]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "MOTION_GATE_ENABLED", False)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_search_scheduler] = lambda: EchoScheduler()
+    return TestClient(app)
+
+def test_binary_frames_are_recognized(client):
+    with client.websocket_connect("/web/ws/recognize") as websocket:
+        websocket.send_bytes(b"frame")
+        assert websocket.receive_json()["faces"][0]["name"] == "An"
+
+def test_text_message_closes_with_unsupported_data(client, caplog):
+    with client.websocket_connect("/web/ws/recognize") as websocket:
+        websocket.send_text("hello")
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+    assert exc_info.value.code == 1003
+    assert "Task exception was never retrieved" not in caplog.text
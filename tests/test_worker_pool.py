@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.services.worker_pool import WorkerPool
+
+def raise_not_found():
+    raise HTTPException(status_code=400, detail="Không tìm thấy khuôn mặt trong ảnh")
+
+def test_run_cpu_in_process_pool():
+    pool = WorkerPool(processes=1, queue_depth=0, overload_policy="reject", io_threads=1)
+    try:
+        assert asyncio.run(pool.run_cpu(pow, 2, 10)) == 1024
+    finally:
+        pool.shutdown()
+
+def test_http_errors_keep_status_code():
+    pool = WorkerPool(processes=0, queue_depth=0, overload_policy="reject", io_threads=1)
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(pool.run_cpu(raise_not_found))
+        assert exc_info.value.status_code == 400
+    finally:
+        pool.shutdown()
+
+def test_reject_policy_returns_503_when_full():
+    pool = WorkerPool(processes=0, queue_depth=0, overload_policy="reject", io_threads=1)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.create_task(pool.run_cpu(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run_cpu(pow, 2, 2)
+        release.set()
+        await busy
+        return exc_info.value.status_code
+
+    try:
+        assert asyncio.run(scenario()) == 503
+    finally:
+        pool.shutdown()
+
+def test_queue_policy_waits_for_free_slot():
+    pool = WorkerPool(processes=0, queue_depth=0, overload_policy="queue", io_threads=1)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.create_task(pool.run_cpu(release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(pool.run_cpu(pow, 2, 3))
+        await asyncio.sleep(0.05)
+        assert not queued.done()
+        release.set()
+        await busy
+        return await queued
+
+    try:
+        assert asyncio.run(scenario()) == 8
+    finally:
+        pool.shutdown()
+
+def test_warm_up_runs_once_per_worker():
+    pool = WorkerPool(processes=2, queue_depth=0, overload_policy="reject", io_threads=1)
+    try:
+        assert asyncio.run(pool.warm_up(int)) == [0, 0]
+    finally:
+        pool.shutdown()